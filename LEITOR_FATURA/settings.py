@@ -212,6 +212,116 @@ DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 CONTACT_EMAIL = env('CONTACT_EMAIL', 'alpsistemascg@gmail.com')
 WHATSAPP_NUMBER = env('WHATSAPP_NUMBER', '')
 PIX_KEY = env('PIX_KEY', 'alpsistemascg@gmail.com')
+# Envio das faturas por e-mail: uma conexão SMTP por worker, até EMAIL_ENVIO_CONCORRENCIA workers.
+EMAIL_ENVIO_CONCORRENCIA = int(env('EMAIL_ENVIO_CONCORRENCIA', 4))
+EMAIL_ENVIO_TIMEOUT = float(env('EMAIL_ENVIO_TIMEOUT', 5))
+# Processamento de faturas: com True os lotes ficam na fila e são processados pelo
+# worker (python manage.py processar_lotes); com False são processados na própria requisição.
+PROCESSAMENTO_EM_SEGUNDO_PLANO = env_bool('PROCESSAMENTO_EM_SEGUNDO_PLANO', True)
+# Quantidade de faturas de um mesmo lote enviadas à IA simultaneamente.
+LLM_MAX_CONCORRENCIA = int(env('LLM_MAX_CONCORRENCIA', 4))
+# Orçamento de tokens (tiktoken) do texto da fatura enviado à IA; 0 envia o texto inteiro.
+LLM_LIMITE_TOKENS_TEXTO = int(env('LLM_LIMITE_TOKENS_TEXTO', 2500))
+# Cliente HTTP da IA, compartilhado pelo processo (pool de conexões keep-alive).
+LLM_TIMEOUT = float(env('LLM_TIMEOUT', 80))
+LLM_TIMEOUT_CONEXAO = float(env('LLM_TIMEOUT_CONEXAO', 10))
+LLM_POOL_MAX_CONEXOES = int(env('LLM_POOL_MAX_CONEXOES', 10))
+LLM_POOL_MAX_KEEPALIVE = int(env('LLM_POOL_MAX_KEEPALIVE', 10))
+LLM_POOL_KEEPALIVE_EXPIRACAO = float(env('LLM_POOL_KEEPALIVE_EXPIRACAO', 60))
+# Endpoint compatível com a API da OpenAI (ex.: o simulador em http://127.0.0.1:8765/v1); vazio usa o provedor.
+LLM_BASE_URL = env('LLM_BASE_URL', '').strip()
+# Simulador local da IA (testes de carga/regressão sem chave): com True o cliente da IA não sai do
+# processo. Respostas são reproduzidas por hash do prompt a partir de LLM_SIMULADOR_GRAVACOES
+# (modo 'reproduzir') ou gravadas a partir de LLM_SIMULADOR_UPSTREAM (modo 'gravar').
+LLM_SIMULADOR = env_bool('LLM_SIMULADOR', False)
+LLM_SIMULADOR_MODO = env('LLM_SIMULADOR_MODO', 'reproduzir').strip().lower()
+LLM_SIMULADOR_GRAVACOES = env('LLM_SIMULADOR_GRAVACOES', '') or str(BASE_DIR / '.cache' / 'llm_gravacoes')
+LLM_SIMULADOR_UPSTREAM = env('LLM_SIMULADOR_UPSTREAM', 'https://api.openai.com/v1').strip()
+# Latência simulada (mediana e p99, em ms) e proporção (0 a 1) de erros 500 e de respostas 429.
+LLM_SIMULADOR_LATENCIA_MS = float(env('LLM_SIMULADOR_LATENCIA_MS', 0))
+LLM_SIMULADOR_LATENCIA_P99_MS = float(env('LLM_SIMULADOR_LATENCIA_P99_MS', 0))
+LLM_SIMULADOR_TAXA_ERRO = float(env('LLM_SIMULADOR_TAXA_ERRO', 0))
+LLM_SIMULADOR_TAXA_LIMITE = float(env('LLM_SIMULADOR_TAXA_LIMITE', 0))
+LLM_SIMULADOR_SEMENTE = int(env('LLM_SIMULADOR_SEMENTE', '') or 0) or None
+# Upload das faturas: cada PDF é gravado uma vez em disco durante o envio (com SHA-256) e
+# recusado assim que passa dos limites abaixo.
+FILE_UPLOAD_HANDLERS = [
+    'app.core.uploads.FaturaUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_FATURA_MAX_BYTES = int(env('UPLOAD_FATURA_MAX_BYTES', 15 * 1024 * 1024))
+UPLOAD_LOTE_MAX_BYTES = int(env('UPLOAD_LOTE_MAX_BYTES', 200 * 1024 * 1024))
+# Modo offline: lotes enviados pela API de lotes do provedor da IA (resposta em até 24h, custo menor).
+# LLM_LOTE_PROVEDOR aceita 'openai' ou 'local' (simulador em LLM_LOTE_DIRETORIO, para testes).
+LLM_LOTE_PROVEDOR = env('LLM_LOTE_PROVEDOR', 'openai').strip().lower()
+LLM_LOTE_DIRETORIO = env('LLM_LOTE_DIRETORIO', '') or str(BASE_DIR / '.cache' / 'lote_ia')
+# Segundos entre consultas do worker ao provedor sobre um mesmo lote offline.
+LLM_LOTE_INTERVALO_CONSULTA = int(env('LLM_LOTE_INTERVALO_CONSULTA', 60))
+# Segundos sem atividade após os quais um lote 'processando' é dado como travado e encerrado (0 desativa).
+LOTE_PROCESSAMENTO_TIMEOUT = int(env('LOTE_PROCESSAMENTO_TIMEOUT', 3600))
+# Dias que o HTML das faturas processadas fica guardado para download/envio.
+FATURAS_PROCESSADAS_RETENCAO_DIAS = int(env('FATURAS_PROCESSADAS_RETENCAO_DIAS', 2))
+# Backend de extração de texto dos PDFs: 'pdfplumber' (padrão) ou 'pdfium' (mais rápido).
+# PDF_EXTRATOR_POR_CONCESSIONARIA sobrepõe por concessionária, ex.: "ENERGISA=pdfium,CPFL=pdfplumber".
+PDF_EXTRATOR = env('PDF_EXTRATOR', 'pdfplumber').strip().lower()
+PDF_EXTRATOR_POR_CONCESSIONARIA = {
+    chave.strip().upper(): valor.strip().lower()
+    for chave, _, valor in (item.partition('=') for item in env_list('PDF_EXTRATOR_POR_CONCESSIONARIA'))
+    if chave.strip() and valor.strip()
+}
+# Backend usado só na primeira página, para detectar a concessionária (e recusar PDFs que não
+# são faturas) antes da extração completa.
+PDF_EXTRATOR_DETECCAO = env('PDF_EXTRATOR_DETECCAO', 'pdfium').strip().lower()
+
+# Cache de resultados de faturas (PDF + diretrizes + modelo). CACHE_FATURAS_BACKEND aceita
+# 'arquivo' (padrão, em CACHE_FATURAS_DIR) ou 'banco' (rode python manage.py createcachetable).
+CACHE_FATURAS_BACKEND = env('CACHE_FATURAS_BACKEND', 'arquivo').strip().lower()
+CACHE_FATURAS_OPTIONS = {
+    'TIMEOUT': int(env('CACHE_FATURAS_TTL', 30 * 24 * 60 * 60)),
+    'OPTIONS': {'MAX_ENTRIES': int(env('CACHE_FATURAS_MAX_ENTRADAS', 5000))},
+}
+if CACHE_FATURAS_BACKEND == 'banco':
+    CACHE_FATURAS = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_faturas',
+        **CACHE_FATURAS_OPTIONS,
+    }
+else:
+    CACHE_FATURAS = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': env('CACHE_FATURAS_DIR', str(BASE_DIR / '.cache' / 'faturas')),
+        **CACHE_FATURAS_OPTIONS,
+    }
+
+# Limite (bytes) do cache em memória das imagens embutidas no HTML das faturas (QR code PIX).
+CACHE_ATIVOS_MAX_BYTES = int(env('CACHE_ATIVOS_MAX_BYTES', 8 * 1024 * 1024))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'faturas': CACHE_FATURAS,
+}
+
+# Logs da aplicação (textos, prompts e respostas da IA só aparecem em DEBUG, sempre redigidos).
+LOG_LEVEL = env('LOG_LEVEL', 'INFO').strip().upper()
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'padrao': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'padrao'},
+    },
+    'loggers': {
+        'app': {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+# Segundos entre publicações das métricas de cada processo no banco (0 desativa).
+METRICAS_INTERVALO_PUBLICACAO = int(env('METRICAS_INTERVALO_PUBLICACAO', 30))
+
 # Tempo de sessão: 15 minutos (renova a cada requisição)
 SESSION_IDLE_TIMEOUT = 15 * 60
 SESSION_COOKIE_AGE = SESSION_IDLE_TIMEOUT
@@ -8,7 +8,7 @@ from django.contrib.auth.hashers import identify_hasher, make_password
 from django.templatetags.static import static
 from django.utils.safestring import mark_safe
 
-from .models import Cliente, ClienteContato, CreditHistory
+from .models import ArquivoLote, Cliente, ClienteContato, CreditHistory, LoteProcessamento
 
 User = get_user_model()
 
@@ -58,7 +58,7 @@ class ClienteAdmin(admin.ModelAdmin):
     form = ClienteAdminForm
     list_display = ('nome', 'email', 'telefone', 'estado', 'cidade', 'is_ativo', 'is_VIP', 'vip_request_pending', 'template_fatura', 'saldo_atual')
     search_fields = ('nome', 'email')
-    list_filter = ('is_ativo', 'is_VIP', 'vip_request_pending', 'estado', 'cidade')
+    list_filter = ('is_ativo', 'is_VIP', 'vip_request_pending', 'modo_extracao', 'estado', 'cidade')
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at', 'saldo_atual', 'saldo_final')
     fieldsets = (
@@ -66,7 +66,7 @@ class ClienteAdmin(admin.ModelAdmin):
             'fields': ('nome', 'email', 'password', 'telefone', 'estado', 'cidade', 'is_ativo', 'is_VIP', 'vip_request_pending', 'template_fatura', 'pix_key', 'pix_qrcode')
         }),
         ('Diretrizes para IA', {
-            'fields': ('prompt_template',),
+            'fields': ('modo_extracao', 'prompt_template'),
             'classes': ('collapse',),
         }),
         ('Créditos', {
@@ -209,3 +209,23 @@ class CreditHistoryAdmin(admin.ModelAdmin):
     @admin.display(description='Criado em', ordering='created_at')
     def created_at_display(self, obj):
         return obj.created_at
+
+
+class ArquivoLoteInline(admin.TabularInline):
+    model = ArquivoLote
+    extra = 0
+    fields = ('ordem', 'nome_original', 'status', 'erro')
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(LoteProcessamento)
+class LoteProcessamentoAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'cliente', 'status', 'modo', 'coletado', 'created_at', 'concluido_em')
+    list_filter = ('status', 'modo', 'cliente')
+    search_fields = ('cliente__nome', 'lote_ia_id')
+    readonly_fields = (
+        'created_at', 'updated_at', 'iniciado_em', 'concluido_em',
+        'lote_ia_provedor', 'lote_ia_id', 'lote_ia_consultado_em',
+    )
+    inlines = (ArquivoLoteInline,)
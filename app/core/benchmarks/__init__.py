@@ -0,0 +1 @@
+"""Benchmark and comparison harnesses for the invoice pipeline."""
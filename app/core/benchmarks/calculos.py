@@ -0,0 +1,97 @@
+"""
+Benchmark das políticas de cálculo em lote.
+
+Mede, sobre linhas sintéticas, a implementação anterior (float por fatura,
+mantida aqui como referência), `calcular` fatura a fatura e `calcular_lote`, e
+confere o lote contra o cálculo exato em Decimal arredondado a centavos.
+"""
+
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List
+
+from app.core.calculos.factory import get_politica
+from app.core.services.processamento_energisa import br_to_float, float_to_br
+
+CENTAVO = Decimal("0.01")
+
+
+def linhas_sinteticas(quantidade: int = 100_000, semente: int = 0) -> List[Dict[str, str]]:
+    """Faturas com valores de energia injetada variados (milhar, centavos, vazios e negativos)."""
+    sorteio = random.Random(semente)
+    linhas = []
+    for _ in range(quantidade):
+        sorte = sorteio.random()
+        centavos = sorteio.randint(1, 5_000_000)
+        if sorte < 0.02:
+            valor = ""
+        elif sorte < 0.04:
+            valor = f"-{centavos // 100},{centavos % 100:02d}"
+        elif sorte < 0.5:
+            valor = f"{centavos // 100:,}".replace(",", ".") + f",{centavos % 100:02d}"
+        else:
+            valor = f"{centavos // 100},{centavos % 100:02d}"
+        linhas.append({"energia_injetada_valor": valor})
+    return linhas
+
+
+def _calcular_referencia(dados: dict, fracao: float) -> dict:
+    """Cópia fiel da versão anterior (float e ida e volta por string)."""
+    base_valor = br_to_float(dados.get("energia_injetada_valor", ""))
+    if base_valor <= 0:
+        return {"economia": "", "valor_a_pagar": ""}
+    return {"economia": float_to_br(base_valor * fracao), "valor_a_pagar": float_to_br(base_valor * (1 - fracao))}
+
+
+def calcular_decimal(dados: dict, fracao: Decimal) -> dict:
+    """Resultado exato esperado: Decimal, cada parte arredondada a centavos (metade para cima)."""
+    try:
+        base = Decimal(str(dados.get("energia_injetada_valor", "")).strip().replace(".", "").replace(",", "."))
+    except InvalidOperation:
+        base = Decimal(0)
+    if base <= 0:
+        return {"economia": "", "valor_a_pagar": ""}
+    return {
+        chave: str((base * parte).quantize(CENTAVO, ROUND_HALF_UP)).replace(".", ",")
+        for chave, parte in (("economia", fracao), ("valor_a_pagar", 1 - fracao))
+    }
+
+
+def _medir(funcao: Callable[[], Any], repeticoes: int) -> float:
+    """Melhor tempo (ms) entre `repeticoes` execuções."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return min(tempos)
+
+
+def medir_calculos(
+    quantidade: int = 100_000,
+    repeticoes: int = 3,
+    politicas: tuple = ("PADRAO", "VIP"),
+) -> Dict[str, Dict[str, Any]]:
+    """Tempo total (ms) de cada implementação por política, divergências do lote e da referência."""
+    linhas = linhas_sinteticas(quantidade)
+    resultado = {}
+    for nome in politicas:
+        politica = get_politica(nome)
+        fracao = politica.fracao_economia
+        esperado = [calcular_decimal(dados, fracao) for dados in linhas]
+        referencia = [_calcular_referencia(d, float(fracao)) for d in linhas]
+        lote = politica.calcular_lote(linhas)
+        tempos = {
+            "referencia_ms": _medir(lambda: [_calcular_referencia(d, float(fracao)) for d in linhas], repeticoes),
+            "por_fatura_ms": _medir(lambda: [politica.calcular(d) for d in linhas], repeticoes),
+            "lote_ms": _medir(lambda: politica.calcular_lote(linhas), repeticoes),
+        }
+        resultado[nome] = {
+            "linhas": len(linhas),
+            **tempos,
+            "linhas_por_segundo": len(linhas) * 1000 / tempos["lote_ms"] if tempos["lote_ms"] else 0.0,
+            "divergentes": sum(1 for obtido, certo in zip(lote, esperado) if obtido != certo),
+            "divergentes_referencia": sum(1 for obtido, certo in zip(referencia, esperado) if obtido != certo),
+        }
+    return resultado
@@ -0,0 +1,64 @@
+"""
+Benchmark do processamento por concessionária.
+
+Para cada concessionária do corpus sintético mede o parser determinístico
+sozinho (texto já extraído) e o `processar_fatura` completo (detecção,
+extração, leitura e política de cálculo), contando as chamadas ao dublê da IA:
+ENEL e CPFL não devem chamar a IA; a Energisa, no modo "sempre IA", chama uma vez por fatura.
+"""
+
+import io
+import time
+from typing import Any, Dict, Iterable
+
+from app.core.benchmarks.corpus import GERADORES, gerar_pdf
+from app.core.benchmarks.pipeline import llm_falso
+from app.core.models import Cliente
+from app.core.parsers.cpfl import CPFLParser
+from app.core.parsers.enel import EnelParser
+from app.core.parsers.energisa import EnergisaParser
+from app.core.services.processamento_energisa import extrair_documento
+from app.core.services.processamento_fatura import processar_fatura
+
+PARSERS = {
+    "ENERGISA": EnergisaParser,
+    "ENEL": EnelParser,
+    "CPFL": CPFLParser,
+}
+
+
+def medir_concessionarias(
+    concessionarias: Iterable[str] = tuple(GERADORES),
+    quantidade: int = 5,
+    paginas: int = 2,
+    repeticoes: int = 200,
+) -> Dict[str, Dict[str, Any]]:
+    """Tempo médio do parser (µs) e do processamento completo (ms) por concessionária."""
+    cliente = Cliente(nome="Benchmark", prompt_template="", modo_extracao=Cliente.MODO_EXTRACAO_IA)
+    resultado = {}
+    for concessionaria in concessionarias:
+        pdfs = [gerar_pdf(GERADORES[concessionaria](indice, paginas)) for indice in range(quantidade)]
+        textos = [extrair_documento(io.BytesIO(pdf)).texto for pdf in pdfs]
+        parser = PARSERS[concessionaria]()
+
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for texto in textos:
+                parser.extract(texto)
+        parser_us = (time.perf_counter() - inicio) * 1_000_000 / (repeticoes * len(textos))
+
+        detectadas = set()
+        with llm_falso() as llm:
+            inicio = time.perf_counter()
+            for pdf in pdfs:
+                detectadas.add(processar_fatura(io.BytesIO(pdf), cliente).get("concessionaria"))
+            completo_ms = (time.perf_counter() - inicio) * 1000 / len(pdfs)
+
+        resultado[concessionaria] = {
+            "faturas": len(pdfs),
+            "parser_us": parser_us,
+            "processamento_ms": completo_ms,
+            "chamadas_ia": llm.chamadas,
+            "detectadas": sorted(filter(None, detectadas)),
+        }
+    return resultado
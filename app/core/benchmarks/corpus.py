@@ -0,0 +1,204 @@
+"""
+Corpus sintético de faturas (Energisa, ENEL e CPFL) para benchmarks e testes.
+
+Os PDFs são gerados localmente (sem dependências além da stdlib), com texto
+real em Helvetica, e seguem o layout que as regex do pipeline esperam:
+cabeçalho, itens da fatura, histórico de consumo e saldo. Cada fatura tem
+nome, UC e valores próprios, derivados do índice (o corpus é determinístico).
+"""
+
+import io
+import random
+from pathlib import Path
+from typing import Callable, Iterable, List, Sequence
+
+NOMES = ("MARIA", "JOSE", "ANA", "JOAO", "ANTONIO", "FRANCISCA", "CARLOS", "PAULO", "LUCAS", "JULIANA")
+SOBRENOMES = ("SILVA", "SANTOS", "OLIVEIRA", "SOUZA", "RODRIGUES", "FERREIRA", "ALVES", "PEREIRA", "LIMA", "GOMES")
+MESES = ("SET", "AGO", "JUL", "JUN", "MAI", "ABR", "MAR", "FEV", "JAN", "DEZ", "NOV", "OUT", "SET")
+PAGINAS_PADRAO = (1, 2, 4, 8)
+PRECO_UNITARIO = 1.108630
+# Preços com tributos (R$/kWh) das parcelas TUSD e TE nas faturas ENEL/CPFL.
+TARIFA_TUSD_TE = (0.39263, 0.3104)
+AVISOS = (
+    "A ENERGISA informa: mantenha seu cadastro atualizado e evite cobranças indevidas.",
+    "Em caso de falta de energia ligue 0800 701 0326. Ouvidoria ANEEL 167.",
+    "Reservado ao fisco 5F2A.9C1E.77B3.0D44.A2C9.1E0F.6B7D.3A58",
+    "Tributos Base de Cálculo Alíquota Valor ICMS 17,00 PIS/PASEP 0,79 COFINS 3,65",
+)
+LINHAS_POR_PAGINA = 60
+
+
+def gerar_pdf(paginas: Sequence[Sequence[str]]) -> bytes:
+    """Gera um PDF mínimo (Helvetica, WinAnsi) com uma linha de texto por item de cada página."""
+    objetos = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # /Pages, preenchido depois de conhecer as páginas
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    kids = []
+    for linhas in paginas:
+        comandos = [b"BT /F1 9 Tf 40 800 Td 11 TL"]
+        for linha in linhas:
+            texto = linha.encode("cp1252").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            comandos.append(b"(" + texto + b") Tj T*")
+        comandos.append(b"ET")
+        stream = b"\n".join(comandos)
+        objetos.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        conteudo_id = len(objetos)
+        objetos.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % conteudo_id
+        )
+        kids.append(b"%d 0 R" % len(objetos))
+    objetos[1] = b"<< /Type /Pages /Kids [" + b" ".join(kids) + b"] /Count %d >>" % len(kids)
+
+    saida = io.BytesIO()
+    saida.write(b"%PDF-1.4\n")
+    offsets = []
+    for numero, corpo in enumerate(objetos, start=1):
+        offsets.append(saida.tell())
+        saida.write(b"%d 0 obj\n" % numero + corpo + b"\nendobj\n")
+    xref = saida.tell()
+    saida.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1))
+    for offset in offsets:
+        saida.write(b"%010d 00000 n \n" % offset)
+    saida.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, xref))
+    return saida.getvalue()
+
+
+def _br(valor: float) -> str:
+    return f"{valor:.2f}".replace(".", ",")
+
+
+def paginas_fatura(indice: int, paginas: int = 2) -> List[List[str]]:
+    """Linhas de cada página de uma fatura Energisa completa e consistente."""
+    sorteio = random.Random(indice)
+    consumo = sorteio.randint(150, 1500)
+    injetada = sorteio.randint(50, consumo)
+    nome = f"{NOMES[indice % len(NOMES)]} {SOBRENOMES[(indice // len(NOMES)) % len(SOBRENOMES)]} DE TAL"
+    uc = f"10/{sorteio.randint(10_000_000, 99_999_999)}-{sorteio.randint(0, 9)}"
+
+    cabecalho = [
+        "ENERGISA MATO GROSSO DO SUL DANF3E",
+        f"{nome} 10/09/2025",
+        f"RUA DAS FLORES, {sorteio.randint(1, 999)} - 79000000 CAMPO GRANDE",
+        f"UC {uc} DATA DE EMISSÃO:10/09/2025",
+        "SETEMBRO / 2025 SET/2025 18/09/2025",
+        "Leitura Anterior:07/08/2025 Leitura Atual:09/09/2025",
+        "Itens da Fatura",
+        f"Consumo em kWh KWH {consumo},00 1,108630 {_br(consumo * PRECO_UNITARIO)}",
+        f"Energia Atv Injetada GDI KWH {injetada},00 1,108630 -{_br(injetada * PRECO_UNITARIO)}",
+        "Consumo dos últimos 13 meses",
+    ]
+    historico = [
+        " ".join(
+            f"{mes}/{25 - i // 9} {sorteio.randint(100, 1500)},00"
+            for i, mes in enumerate(MESES[j:j + 3], start=j)
+        )
+        for j in range(0, len(MESES), 3)
+    ]
+    fechamento = historico + [f"Saldo Acumulado {sorteio.randint(0, 999)},00"]
+
+    if paginas <= 1:
+        return [cabecalho + fechamento]
+    miolo = [
+        [AVISOS[(pagina + linha) % len(AVISOS)] for linha in range(LINHAS_POR_PAGINA)]
+        for pagina in range(paginas - 2)
+    ]
+    return [cabecalho, *miolo, fechamento]
+
+
+def _paginas_itens_tusd_te(
+    indice: int,
+    paginas: int,
+    cabecalho: Callable[[random.Random, str], List[str]],
+    rotulo_injetada: str,
+    negativo: Callable[[str], str],
+    rodape: str,
+) -> List[List[str]]:
+    """Fatura no layout DANF3E com itens separados em TUSD e TE (ENEL e CPFL)."""
+    sorteio = random.Random(indice)
+    consumo = sorteio.randint(150, 1500)
+    injetada = sorteio.randint(50, consumo)
+    nome = f"{NOMES[indice % len(NOMES)]} {SOBRENOMES[(indice // len(NOMES)) % len(SOBRENOMES)]} DE TAL"
+    tusd, te = TARIFA_TUSD_TE
+    tarifa_tusd, tarifa_te = (f"{tarifa:.8f}".replace(".", ",") for tarifa in TARIFA_TUSD_TE)
+    primeira = cabecalho(sorteio, nome) + [
+        f"Consumo Uso Sistema [KWh]-TUSD KWH {consumo},000 {tarifa_tusd} {_br(consumo * tusd)}",
+        f"Consumo - TE KWH {consumo},000 {tarifa_te} {_br(consumo * te)}",
+        f"{rotulo_injetada} TUSD KWH {injetada},000 {tarifa_tusd} {negativo(_br(injetada * tusd))}",
+        f"{rotulo_injetada} TE KWH {injetada},000 {tarifa_te} {negativo(_br(injetada * te))}",
+        f"Adicional Bandeira Amarela KWH {consumo},000 0,01885000 {_br(consumo * 0.01885)}",
+        "Contrib. Ilum. Pública - Lei Municipal 12,13",
+        rodape,
+    ]
+    if paginas <= 1:
+        return [primeira]
+    miolo = [
+        [AVISOS[(pagina + linha) % len(AVISOS)].replace("ENERGISA", "DISTRIBUIDORA") for linha in range(LINHAS_POR_PAGINA)]
+        for pagina in range(paginas - 2)
+    ]
+    historico = ["Histórico de Consumo (kWh)"] + [
+        " ".join(f"{mes}/{25 - i // 9} {sorteio.randint(100, 1500)}" for i, mes in enumerate(MESES[j:j + 3], start=j))
+        for j in range(0, len(MESES), 3)
+    ]
+    return [primeira, *miolo, historico]
+
+
+def paginas_fatura_enel(indice: int, paginas: int = 1) -> List[List[str]]:
+    """Linhas de cada página de uma fatura Enel (itens TUSD/TE, injeção com valor negativo)."""
+    def cabecalho(sorteio: random.Random, nome: str) -> List[str]:
+        return [
+            "Enel Distribuição São Paulo",
+            "NOTA FISCAL/CONTA DE ENERGIA ELÉTRICA DANF3E",
+            nome,
+            f"AV PAULISTA, {sorteio.randint(1, 999)} - 01310100 SAO PAULO SP",
+            f"Nº DA INSTALAÇÃO {sorteio.randint(10_000_000, 99_999_999):09d} Nº DO CLIENTE {sorteio.randint(1_000_000, 9_999_999)}",
+            "REF: MÊS/ANO 09/2025 VENCIMENTO 20/10/2025",
+            "Itens de Fatura Unid. Quant. Preço unit. (R$) com tributos Valor (R$)",
+        ]
+
+    return _paginas_itens_tusd_te(indice, paginas, cabecalho, "Energia Injetada", lambda v: f"-{v}", "www.enel.com.br")
+
+
+def paginas_fatura_cpfl(indice: int, paginas: int = 1) -> List[List[str]]:
+    """Linhas de cada página de uma fatura CPFL (itens TUSD/TE, injeção com sinal à direita)."""
+    def cabecalho(sorteio: random.Random, nome: str) -> List[str]:
+        return [
+            "CPFL PAULISTA - Companhia Paulista de Força e Luz",
+            "DANF3E - DOCUMENTO AUXILIAR DA NOTA FISCAL DE ENERGIA ELÉTRICA ELETRÔNICA",
+            nome,
+            f"Nº Instalação {sorteio.randint(4_000_000_000, 4_099_999_999)} Seu Código {sorteio.randint(10_000_000, 99_999_999)}",
+            "Referência SET/2025 Vencimento 15/10/2025",
+            "Descrição Unid. Quant. Tarifa c/ Tributos Valor",
+        ]
+
+    return _paginas_itens_tusd_te(indice, paginas, cabecalho, "Energ Atv Inj. oUC mPT -", lambda v: f"{v}-", "www.cpfl.com.br")
+
+
+GERADORES = {
+    "ENERGISA": paginas_fatura,
+    "ENEL": paginas_fatura_enel,
+    "CPFL": paginas_fatura_cpfl,
+}
+
+
+def gerar_corpus(
+    destino: Path,
+    quantidade: int = 20,
+    paginas: Iterable[int] = PAGINAS_PADRAO,
+    concessionaria: str = "ENERGISA",
+) -> List[Path]:
+    """Grava `quantidade` PDFs em `destino`, alternando entre as contagens de páginas."""
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    paginas = list(paginas) or list(PAGINAS_PADRAO)
+    gerador = GERADORES[concessionaria.upper()]
+    prefixo = "fatura" if concessionaria.upper() == "ENERGISA" else f"fatura_{concessionaria.lower()}"
+    arquivos = []
+    for indice in range(quantidade):
+        total = paginas[indice % len(paginas)]
+        caminho = destino / f"{prefixo}_{indice:04d}_{total}p.pdf"
+        caminho.write_bytes(gerar_pdf(gerador(indice, total)))
+        arquivos.append(caminho)
+    return arquivos
@@ -0,0 +1,58 @@
+"""
+Comparação dos backends de extração de texto.
+
+Para cada PDF mede o tempo de extração de cada backend e verifica se as
+dicas de regex (`montar_hints`) continuam iguais às do backend de referência.
+"""
+
+import time
+from pathlib import Path
+from statistics import mean
+from typing import Any, Dict, Iterable, List, Sequence
+
+from app.core.extratores.factory import EXTRATORES
+from app.core.services.processamento_energisa import extrair_documento, montar_hints
+
+REFERENCIA = "pdfplumber"
+
+
+def comparar_extratores(
+    pdfs: Iterable[Path],
+    backends: Sequence[str] = (),
+    repeticoes: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Retorna uma linha por PDF com o tempo médio (ms) de cada backend e,
+    para cada dica, se o valor coincide com o do backend de referência.
+    """
+    backends = list(backends or EXTRATORES)
+    if REFERENCIA not in backends:
+        backends.insert(0, REFERENCIA)
+    repeticoes = max(1, repeticoes)
+
+    linhas = []
+    for pdf in pdfs:
+        tempos: Dict[str, float] = {}
+        hints: Dict[str, Dict[str, Any]] = {}
+        for nome in backends:
+            extrator = EXTRATORES[nome]()
+            duracoes = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                documento = extrair_documento(pdf, extrator=extrator)
+                duracoes.append((time.perf_counter() - inicio) * 1000)
+            tempos[nome] = mean(duracoes)
+            hints[nome] = montar_hints(documento.texto)
+
+        referencia = hints[REFERENCIA]
+        divergencias = {
+            nome: sorted(chave for chave, valor in referencia.items() if hints[nome].get(chave) != valor)
+            for nome in backends
+            if nome != REFERENCIA
+        }
+        linhas.append({
+            "pdf": str(pdf),
+            "tempos_ms": tempos,
+            "divergencias": divergencias,
+        })
+    return linhas
@@ -0,0 +1,268 @@
+"""
+Micro-benchmark do motor de hints.
+
+Compara `montar_hints` com a implementação anterior (uma busca por campo, com
+padrões recompilados a cada chamada e varreduras repetidas do texto), mantida
+aqui como referência, e confere que ambas produzem exatamente o mesmo dicionário.
+"""
+
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List
+
+from app.core.services.processamento_energisa import br_to_float, float_to_br, montar_hints
+
+MESES = ("SET", "AGO", "JUL", "JUN", "MAI", "ABR", "MAR", "FEV", "JAN", "DEZ", "NOV", "OUT", "SET")
+
+
+# -------------------------------------------------------------------
+# Implementação de referência (cópia fiel da versão anterior)
+# -------------------------------------------------------------------
+
+def _extrair_nome(texto: str) -> str:
+    padrao = r"([A-ZÁÉÍÓÚÃÕÇ]{3,}(?: [A-ZÁÉÍÓÚÃÕÇ]{2,}){1,})\s+\d{2}/\d{2}/\d{4}"
+    m = re.search(padrao, texto)
+    if not m:
+        return ""
+    nome = m.group(1).strip()
+    if "DOCUMENTO" in nome or "NOTA FISCAL" in nome:
+        return ""
+    return nome
+
+
+def _extrair_endereco(texto: str) -> str:
+    m = re.search(
+        r"(RUA [A-Z0-9ÁÉÍÓÚÃÕÇ\s\.]+,\s*\d+\s*-\s*\d{8})",
+        texto,
+        flags=re.IGNORECASE,
+    )
+    return m.group(1).strip() if m else ""
+
+
+def _extrair_uc(texto: str) -> str:
+    achou = re.findall(r"10/\d{7,8}-\d", texto)
+    return achou[0] if achou else ""
+
+
+def _extrair_data_emissao(texto: str) -> str:
+    m = re.search(r"DATA DE EMISSÃO:?(\d{2}/\d{2}/\d{4})", texto)
+    return m.group(1) if m else ""
+
+
+def _extrair_data_vencimento(texto: str) -> str:
+    m = re.search(r"[A-Za-zÁÉÍÓÚÃÕÇ]+ ?/\d{4}\s+(\d{2}/\d{2}/\d{4})", texto)
+    return m.group(1) if m else ""
+
+
+def _extrair_leituras(texto: str) -> tuple[str, str]:
+    m = re.search(
+        r"Leitura Anterior:(\d{2}/\d{2}/\d{4}).*?Leitura Atual:(\d{2}/\d{2}/\d{4})",
+        texto,
+        flags=re.DOTALL,
+    )
+    if m:
+        return m.group(1), m.group(2)
+    return "", ""
+
+
+def _extrair_consumo_kwh(texto: str) -> str:
+    """
+    Consumo principal da fatura.
+    Ignora ocorrências próximas de 'Energia Atv Injetada'.
+    """
+    for m in re.finditer(r"KWH\s*([\d\.]+,\d{2})", texto):
+        inicio = max(0, m.start() - 80)
+        contexto = texto[inicio:m.start()]
+        if "Energia Atv Injetada" not in contexto:
+            return m.group(1)
+    return ""
+
+
+def _extrair_preco_unitario(texto: str) -> str:
+    m = re.search(r"Consumo em kWh.*?(\d,\d{5,})", texto, flags=re.DOTALL)
+    return m.group(1) if m else ""
+
+
+def _extrair_historico_consumo(texto: str) -> List[Dict[str, str]]:
+    matches = re.findall(r"([A-Z]{3}/\d{2})\s+(\d+,\d{2})", texto)
+    return [{"mes": m[0], "consumo": m[1]} for m in matches]
+
+
+def _extrair_mes_referencia(texto: str) -> str:
+    """
+    Extrai o mês de referência.
+    """
+    padroes = [
+        r"(SETEMBRO / \d{4}|OUTUBRO / \d{4}|NOVEMBRO / \d{4}|DEZEMBRO / \d{4}|"
+        r"JANEIRO / \d{4}|FEVEREIRO / \d{4}|MARÇO / \d{4}|ABRIL / \d{4}|MAIO / \d{4}|"
+        r"JUNHO / \d{4}|JULHO / \d{4}|AGOSTO / \d{4})",
+        r"Referente a[: ]+([A-ZÇÃÉÍÓÚ]+/?\d{4})",
+        r"(?:M[ÊE]S DE REFER[ÊE]NCIA|M[ÊE]S REFER[ÊE]NCIA)\s*[:\-]?\s*([A-Z]{3}/\d{2,4})",
+    ]
+    for padrao in padroes:
+        m = re.search(padrao, texto, flags=re.IGNORECASE)
+        if m:
+            return m.group(1).strip()
+    # fallback: primeiro mês do histórico
+    hist = _extrair_historico_consumo(texto)
+    return hist[0]["mes"] if hist else ""
+
+
+def _extrair_saldo_acumulado(texto: str) -> str:
+    """
+    Extrai o saldo acumulado.
+    """
+    m = re.search(
+        r"Saldo Acumulado(?: anterior)?[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})",
+        texto,
+        flags=re.IGNORECASE,
+    )
+    if m:
+        return m.group(1).strip()
+
+    m2 = re.search(
+        r"Saldo[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})",
+        texto,
+        flags=re.IGNORECASE,
+    )
+    if m2:
+        return m2.group(1).strip()
+
+    return ""
+
+
+def _extrair_itens_da_fatura(texto: str) -> str:
+    """
+    Isola o bloco 'Itens da Fatura' até algum marcador de fim.
+    """
+    ini = texto.find("Itens da Fatura")
+    if ini == -1:
+        return texto
+
+    # tenta achar um fim razoável (histórico, consumo 13 meses, nota fiscal etc.)
+    m = re.search(
+        r"(Consumo dos últimos 13 meses|Consumo kWh|NOTA FISCAL|NOTA FISCAL/CONTA)",
+        texto[ini:],
+        flags=re.IGNORECASE,
+    )
+    if m:
+        fim = ini + m.start()
+        return texto[ini:fim]
+    return texto[ini:]
+
+
+def _extrair_energia_injetada_valor(texto: str) -> float:
+    """
+    Soma TODOS os valores negativos (R$) associados a 'Energia Atv Injetada'
+    dentro do bloco 'Itens da Fatura'.
+
+    Exemplo de padrão:
+        Energia Atv Injetada GDI ...
+        1,108630 -7.206,16 ...
+
+    Retorna sempre positivo (módulo da soma).
+    """
+    itens = _extrair_itens_da_fatura(texto)
+
+    padrao = r"Energia Atv Injetada.*?(-\d[\d\.]*,\d{2})"
+    matches = re.findall(padrao, itens, flags=re.IGNORECASE | re.DOTALL)
+
+    total = 0.0
+    for v in matches:
+        total += br_to_float(v)
+
+    # total é negativo; devolvemos módulo positivo
+    return abs(total)
+
+
+def hints_por_funcoes(texto: str) -> Dict[str, Any]:
+    """Dicionário de hints montado pela implementação de referência."""
+    leitura_anterior, leitura_atual = _extrair_leituras(texto)
+    preco = _extrair_preco_unitario(texto)
+    valor = _extrair_energia_injetada_valor(texto)
+    preco_float = br_to_float(preco)
+    return {
+        "nome_do_cliente": _extrair_nome(texto),
+        "endereco": _extrair_endereco(texto),
+        "codigo_do_cliente_uc": _extrair_uc(texto),
+        "data_de_emissao": _extrair_data_emissao(texto),
+        "data_de_vencimento": _extrair_data_vencimento(texto),
+        "leitura_anterior": leitura_anterior,
+        "leitura_atual": leitura_atual,
+        "consumo_kwh": _extrair_consumo_kwh(texto),
+        "preco_unitario": preco,
+        "energia_atv_injetada_kwh": float_to_br(valor / preco_float) if valor > 0 and preco_float > 0 else "",
+        "energia_atv_injetada_valor": float_to_br(valor) if valor > 0 else "",
+        "energia_atv_injetada_kwh_itens": 0.0,
+        "mes_referencia": _extrair_mes_referencia(texto),
+        "saldo_acumulado": _extrair_saldo_acumulado(texto),
+        "historico_de_consumo": _extrair_historico_consumo(texto),
+    }
+
+
+# -------------------------------------------------------------------
+# Texto sintético e medição
+# -------------------------------------------------------------------
+
+def texto_sintetico(linhas_injetada: int = 3) -> str:
+    """Texto no layout de uma fatura Energisa (cabeçalho, itens, tributos, histórico e avisos)."""
+    itens = ["Consumo em kWh KWH 1.385,00 1,108630 1.535,45"]
+    for i in range(linhas_injetada):
+        itens.append(f"Energia Atv Injetada GDI mUC {i + 1} KWH 4{i}5,00 1,108630 -{4 + i}71,39")
+    itens += [
+        "Adicional Bandeira Amarela 0,00 18,75",
+        "Contrib de Ilum Pub Municipal 32,40",
+        "Multa por atraso 0,00",
+    ]
+    tributos = [
+        "Tributos Base de Cálculo Alíquota Valor",
+        "ICMS 1.535,45 17,00 261,03 PIS/PASEP 1.535,45 0,79 12,13 COFINS 1.535,45 3,65 56,04",
+    ]
+    historico = " ".join(f"{mes}/{25 - i // 9} {380 - i * 7},00 30" for i, mes in enumerate(MESES))
+    avisos = [
+        "A ENERGISA informa: mantenha seu cadastro atualizado e evite cobranças indevidas.",
+        "Em caso de falta de energia ligue 0800 701 0326. Ouvidoria ANEEL 167.",
+        "Reservado ao fisco 5F2A.9C1E.77B3.0D44.A2C9.1E0F.6B7D.3A58",
+    ] * 8
+    partes = [
+        "ENERGISA MATO GROSSO DO SUL - DISTRIBUIDORA DE ENERGIA S.A. CNPJ 15.413.826/0001-50 DANF3E",
+        "DOCUMENTO AUXILIAR DA NOTA FISCAL DE ENERGIA ELÉTRICA ELETRÔNICA",
+        "FULANO DE TAL DA SILVA 10/09/2025",
+        "RUA DAS FLORES, 123 - 79000000 CAMPO GRANDE MS",
+        "UC 10/12345678-9 DATA DE EMISSÃO:10/09/2025 Classificação: B1 RESIDENCIAL",
+        "SETEMBRO / 2025 18/09/2025 R$ 1.235,52",
+        "Leitura Anterior:07/08/2025 Leitura Atual:09/09/2025 Nº de dias 33 Próxima Leitura 08/10/2025",
+        "Itens da Fatura Unid. Quant. Preço unit (R$) com tributos Valor (R$)",
+        *itens,
+        *tributos,
+        "Consumo dos últimos 13 meses",
+        historico,
+        "Saldo Acumulado 1.120,00 kWh Saldo a expirar 0,00",
+        *avisos,
+    ]
+    return " ".join(partes)
+
+
+def medir(funcao: Callable[[str], Any], textos: List[str], repeticoes: int) -> float:
+    """Tempo médio (µs) de uma chamada de `funcao` por texto."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        for texto in textos:
+            funcao(texto)
+    return (time.perf_counter() - inicio) * 1_000_000 / (repeticoes * max(1, len(textos)))
+
+
+def comparar_hints(textos: Iterable[str], repeticoes: int = 2000) -> Dict[str, Any]:
+    """Mede as duas implementações e lista os textos em que os resultados divergem."""
+    textos = list(textos)
+    divergentes = [indice for indice, texto in enumerate(textos) if montar_hints(texto) != hints_por_funcoes(texto)]
+    referencia = medir(hints_por_funcoes, textos, repeticoes)
+    atual = medir(montar_hints, textos, repeticoes)
+    return {
+        "textos": len(textos),
+        "caracteres": sum(len(t) for t in textos),
+        "referencia_us": referencia,
+        "montar_hints_us": atual,
+        "ganho": referencia / atual if atual else 0.0,
+        "divergentes": divergentes,
+    }
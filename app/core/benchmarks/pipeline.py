@@ -0,0 +1,234 @@
+"""
+Benchmark do pipeline de faturas, etapa por etapa, com a IA substituída por um
+dublê determinístico.
+
+Mede detecção da concessionária (pela primeira página), extração, dicas de
+regex, políticas de cálculo, IA (montagem do prompt + recorte + leitura do
+JSON, sem rede), pós-processamento e renderização do HTML, além do processamento completo
+(`processar_fatura` + renderização) para a vazão em faturas/s. Uma segunda
+passada, com tracemalloc ligado, registra o pico e o total alocado por etapa.
+Resultados podem ser gravados como linha de base e comparados depois.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from statistics import mean, quantiles
+from typing import Any, Callable, Dict, List, Sequence
+
+from django.conf import settings
+
+from app.core.calculos.factory import get_politica
+from app.core.models import Cliente
+from app.core.services import processamento_energisa as processamento
+from app.core.services.processamento_fatura import detectar_pela_primeira_pagina, processar_fatura
+from app.core.services.renderizacao import RenderizadorFatura
+
+ETAPAS = ("deteccao", "extracao", "hints", "calculo", "ia", "pos_processamento", "renderizacao", "total")
+BASELINE_PADRAO = Path(settings.BASE_DIR) / "app" / "core" / "benchmarks" / "baselines" / "pipeline.json"
+TOLERANCIA_PADRAO = 0.25
+# Diferenças absolutas menores que isto são ruído nas etapas de microssegundos.
+MARGEM_MINIMA_MS = 1.0
+
+
+class _RespostaFalsa:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class LLMFalso:
+    """
+    Dublê do ChatOpenAI: devolve sempre o mesmo JSON (vazio, por padrão), de modo
+    que o resultado vem das dicas de regex e o tempo medido é só o do pipeline.
+    """
+
+    def __init__(self, resposta: Dict[str, Any] | None = None, latencia_ms: float = 0.0):
+        self.resposta = json.dumps(resposta or {})
+        self.latencia_ms = latencia_ms
+        self.chamadas = 0
+
+    def invoke(self, prompt: str) -> _RespostaFalsa:
+        self.chamadas += 1
+        if self.latencia_ms:
+            time.sleep(self.latencia_ms / 1000)
+        return _RespostaFalsa(self.resposta)
+
+
+@contextmanager
+def llm_falso(llm: LLMFalso | None = None):
+    """Instala o dublê como cliente compartilhado da IA enquanto o bloco executa."""
+    llm = llm or LLMFalso()
+    anterior = processamento._llm, processamento.OPENAI_API_KEY
+    processamento._llm = llm
+    processamento.OPENAI_API_KEY = processamento.OPENAI_API_KEY or "sk-benchmark"
+    try:
+        yield llm
+    finally:
+        processamento._llm, processamento.OPENAI_API_KEY = anterior
+
+
+@contextmanager
+def _sem_publicar_metricas():
+    """As etapas instrumentadas não devem aparecer no endpoint de métricas da aplicação."""
+    anterior = getattr(settings, "METRICAS_INTERVALO_PUBLICACAO", 30)
+    settings.METRICAS_INTERVALO_PUBLICACAO = 0
+    try:
+        yield
+    finally:
+        settings.METRICAS_INTERVALO_PUBLICACAO = anterior
+
+
+def _etapas_da_fatura(pdf_bytes: bytes, cliente: Cliente, renderizador: RenderizadorFatura) -> Dict[str, Callable[[], Any]]:
+    """Funções de cada etapa, encadeadas pelos resultados da anterior."""
+    estado: Dict[str, Any] = {}
+
+    def deteccao():
+        detectar_pela_primeira_pagina(io.BytesIO(pdf_bytes))
+
+    def extracao():
+        estado["documento"] = processamento.extrair_documento(io.BytesIO(pdf_bytes))
+
+    def hints():
+        documento = estado["documento"]
+        estado["hints"] = processamento.montar_hints(documento.texto, documento)
+        processamento.verificar_hints(estado["hints"], documento.texto)
+
+    def calculo():
+        dados = {"energia_injetada_valor": estado["hints"].get("energia_atv_injetada_valor", "")}
+        get_politica("PADRAO").calcular(dados)
+        get_politica("VIP").calcular(dados)
+
+    def ia():
+        estado["ia"] = processamento.call_llm_fatura(estado["documento"].texto, estado["hints"])
+
+    def pos_processamento():
+        estado["parsed"] = processamento.consolidar_resultado(estado["ia"], estado["hints"])
+
+    def renderizacao():
+        renderizador.renderizar(estado["parsed"], cliente)
+
+    def total():
+        contexto = processar_fatura(io.BytesIO(pdf_bytes), cliente)
+        renderizador.renderizar(contexto.get("dados") or {}, cliente)
+
+    return {
+        "deteccao": deteccao,
+        "extracao": extracao,
+        "hints": hints,
+        "calculo": calculo,
+        "ia": ia,
+        "pos_processamento": pos_processamento,
+        "renderizacao": renderizacao,
+        "total": total,
+    }
+
+
+def _p95(valores: List[float]) -> float:
+    if len(valores) < 2:
+        return valores[0] if valores else 0.0
+    return quantiles(valores, n=20, method="inclusive")[-1]
+
+
+def medir_pipeline(pdfs: Sequence[Path], repeticoes: int = 3) -> Dict[str, Any]:
+    """
+    Executa cada etapa `repeticoes` vezes por PDF e devolve média/p95 (ms),
+    pico e total alocado (KB) por etapa e a vazão do processamento completo.
+    """
+    repeticoes = max(1, repeticoes)
+    # Modo "sempre IA" garante que o processamento completo também passe pelo dublê.
+    cliente = Cliente(nome="Benchmark", prompt_template="", modo_extracao=Cliente.MODO_EXTRACAO_IA)
+    renderizador = RenderizadorFatura()
+    conteudos = [Path(pdf).read_bytes() for pdf in pdfs]
+    tempos: Dict[str, List[float]] = {etapa: [] for etapa in ETAPAS}
+    alocacao: Dict[str, Dict[str, float]] = {etapa: {"pico_kb": 0.0, "alocado_kb": 0.0} for etapa in ETAPAS}
+
+    with llm_falso() as llm, _sem_publicar_metricas():
+        for _ in range(repeticoes):
+            for conteudo in conteudos:
+                for etapa, funcao in _etapas_da_fatura(conteudo, cliente, renderizador).items():
+                    inicio = time.perf_counter()
+                    funcao()
+                    tempos[etapa].append((time.perf_counter() - inicio) * 1000)
+
+        tracemalloc.start()
+        try:
+            for conteudo in conteudos:
+                for etapa, funcao in _etapas_da_fatura(conteudo, cliente, renderizador).items():
+                    tracemalloc.reset_peak()
+                    antes, _ = tracemalloc.get_traced_memory()
+                    funcao()
+                    depois, pico = tracemalloc.get_traced_memory()
+                    alocacao[etapa]["pico_kb"] = max(alocacao[etapa]["pico_kb"], (pico - antes) / 1024)
+                    alocacao[etapa]["alocado_kb"] += max(0, depois - antes) / 1024
+        finally:
+            tracemalloc.stop()
+
+    etapas = {}
+    for etapa in ETAPAS:
+        etapas[etapa] = {
+            "media_ms": round(mean(tempos[etapa]), 3) if tempos[etapa] else 0.0,
+            "p95_ms": round(_p95(tempos[etapa]), 3),
+            "pico_kb": round(alocacao[etapa]["pico_kb"], 1),
+            "retido_kb_por_fatura": round(alocacao[etapa]["alocado_kb"] / max(1, len(conteudos)), 1),
+        }
+    media_total = etapas["total"]["media_ms"]
+    return {
+        "faturas": len(conteudos),
+        "repeticoes": repeticoes,
+        "chamadas_ia": llm.chamadas,
+        "etapas": etapas,
+        "faturas_por_segundo": round(1000 / media_total, 2) if media_total else 0.0,
+        "ambiente": {
+            "python": sys.version.split()[0],
+            "plataforma": platform.platform(),
+            "extrator": getattr(settings, "PDF_EXTRATOR", ""),
+        },
+    }
+
+
+def salvar_baseline(resultado: Dict[str, Any], caminho: Path = BASELINE_PADRAO) -> Path:
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    caminho.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return caminho
+
+
+def carregar_baseline(caminho: Path = BASELINE_PADRAO) -> Dict[str, Any]:
+    return json.loads(Path(caminho).read_text(encoding="utf-8"))
+
+
+def comparar_com_baseline(
+    resultado: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerancia: float = TOLERANCIA_PADRAO,
+) -> List[str]:
+    """
+    Regressões: etapas com média acima de (1 + tolerância) × base (e ao menos
+    MARGEM_MINIMA_MS mais lentas) ou vazão abaixo de (1 - tolerância) × base.
+    """
+    regressoes = []
+    for etapa, atual in resultado["etapas"].items():
+        base = (baseline.get("etapas") or {}).get(etapa)
+        if not base or not base.get("media_ms"):
+            continue
+        if (
+            atual["media_ms"] > base["media_ms"] * (1 + tolerancia)
+            and atual["media_ms"] - base["media_ms"] >= MARGEM_MINIMA_MS
+        ):
+            regressoes.append(
+                f"{etapa}: {atual['media_ms']:.3f} ms (base {base['media_ms']:.3f} ms, "
+                f"+{(atual['media_ms'] / base['media_ms'] - 1) * 100:.0f}%)"
+            )
+    base_vazao = baseline.get("faturas_por_segundo") or 0
+    if base_vazao and resultado["faturas_por_segundo"] < base_vazao * (1 - tolerancia):
+        regressoes.append(
+            f"vazão: {resultado['faturas_por_segundo']:.2f} faturas/s (base {base_vazao:.2f} faturas/s)"
+        )
+    return regressoes
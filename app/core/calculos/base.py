@@ -1,9 +1,90 @@
 """Base classes for calculation policies."""
 
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Tuple
+
+# An amount as an exact scaled integer: (mantissa, decimal places), e.g. "1.234,56" -> (123456, 2).
+# Non-positive or unparseable amounts are (0, 0).
+ValorExato = Tuple[int, int]
+
+
+def valor_exato(valor: Any) -> ValorExato:
+    """
+    Parse a Brazilian-formatted amount (same rules as `br_to_float`) without
+    going through binary floats. Plain "1.234,56" strings take a fast path;
+    anything else goes through Decimal.
+    """
+    if valor is None:
+        return 0, 0
+    if isinstance(valor, (int, float)):
+        texto = repr(float(valor))
+    else:
+        texto = str(valor).strip().replace(".", "")
+        inteiro, _, fracao = texto.partition(",")
+        if (inteiro.isdecimal() or (not inteiro and fracao)) and (not fracao or fracao.isdecimal()):
+            return int(inteiro + fracao), len(fracao)
+        texto = texto.replace(",", ".")
+    try:
+        numero = Decimal(texto)
+    except (InvalidOperation, ValueError):
+        return 0, 0
+    if not numero.is_finite() or numero <= 0:
+        return 0, 0
+    _, digitos, expoente = numero.as_tuple()
+    mantissa = int("".join(map(str, digitos)))
+    if expoente >= 0:
+        return mantissa * 10 ** expoente, 0
+    return mantissa, -expoente
+
+
+def formatar_centavos(centavos: int) -> str:
+    """Cents as a Brazilian amount without thousands separators, like `float_to_br` ("1234,50")."""
+    return "%d,%02d" % divmod(centavos, 100)
+
+
+def _arredondar(numerador: int, divisor: int) -> int:
+    """numerador / divisor rounded half up, for non-negative integers."""
+    return (2 * numerador + divisor) // (2 * divisor)
+
 
 class PoliticaCalculo:
-    """Interface for calculation policies."""
+    """
+    Interface for calculation policies: `fracao_economia` of the injected
+    energy value is the client's economy and the rest is payable. Amounts are
+    split in exact integer arithmetic and each part is rounded to cents
+    (half up).
+    """
+
+    fracao_economia: Decimal = Decimal("0")
 
     def calcular(self, dados: dict) -> dict:
         """Return economia and valor_a_pagar."""
-        raise NotImplementedError
+        mantissa, casas = valor_exato((dados or {}).get("energia_injetada_valor", ""))
+        if mantissa <= 0:
+            return {"economia": "", "valor_a_pagar": ""}
+        numerador, denominador = self.fracao_economia.as_integer_ratio()
+        divisor = denominador * 10 ** casas
+        return {
+            "economia": formatar_centavos(_arredondar(mantissa * 100 * numerador, divisor)),
+            "valor_a_pagar": formatar_centavos(_arredondar(mantissa * 100 * (denominador - numerador), divisor)),
+        }
+
+    def calcular_lote(self, lote: Iterable[dict]) -> List[Dict[str, str]]:
+        """
+        `calcular` for many invoices at once: amounts are parsed once into a
+        column of scaled integers, each part of the split is computed for the
+        whole column and the results are formatted in bulk. Each result is
+        identical to calling `calcular` on that invoice.
+        """
+        coluna = [valor_exato((dados or {}).get("energia_injetada_valor", "")) for dados in lote]
+        numerador, denominador = self.fracao_economia.as_integer_ratio()
+        # Same rounding as _arredondar, with the per-scale constants hoisted out of the loop.
+        divisores = {casas: (2 * denominador * 10 ** casas, denominador * 10 ** casas) for _, casas in set(coluna)}
+        partes = []
+        for fator in (200 * numerador, 200 * (denominador - numerador)):
+            partes.append([
+                "%d,%02d" % divmod((mantissa * fator + divisores[casas][1]) // divisores[casas][0], 100)
+                if mantissa > 0 else ""
+                for mantissa, casas in coluna
+            ])
+        return [{"economia": economia, "valor_a_pagar": pagar} for economia, pagar in zip(*partes)]
@@ -0,0 +1,244 @@
+"""
+Calculation policy compiled from the client's directives (Cliente.prompt_template).
+
+Lines such as `"valor a pagar" = energia_atv_injetada_valor * 0.7` are parsed
+by a small recursive-descent parser (numbers, invoice fields, + - * /, unary
+signs, parentheses and `%`) into Decimal expressions, so economia and
+valor_a_pagar are computed locally instead of by the LLM. Lines that are not
+formulas, that use anything outside this grammar or that read no invoice
+field are kept as free-form instructions for the LLM.
+"""
+
+import operator
+import re
+from dataclasses import dataclass, field
+from decimal import ROUND_HALF_UP, Decimal, DivisionByZero, InvalidOperation
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple
+
+from .base import PoliticaCalculo, valor_exato
+
+CENTAVO = Decimal("0.01")
+
+# Invoice fields a formula may reference, and the key read from the invoice data.
+VARIAVEIS = {
+    "energia_atv_injetada_valor": "energia_atv_injetada_valor",
+    "energia_injetada_valor": "energia_atv_injetada_valor",
+    "energia_atv_injetada_kwh": "energia_atv_injetada_kwh",
+    "consumo_kwh": "consumo_kwh",
+    "preco_unitario": "preco_unitario",
+}
+# Targets a formula may assign, keyed by the normalized label ("Valor a pagar" -> "valor a pagar").
+ALVOS = {
+    "economia": "economia",
+    "valor a pagar": "valor_a_pagar",
+    "valor pagar": "valor_a_pagar",
+}
+FORMULAS_PADRAO = {
+    "economia": "energia_atv_injetada_valor * 0.3",
+    "valor_a_pagar": "energia_atv_injetada_valor * 0.7",
+}
+
+_RE_ATRIBUICAO = re.compile(r"""^\s*["'“”]?(?P<alvo>[^"'“”=:]+?)["'“”]?\s*[=:]\s*(?P<expressao>.+?)\s*$""")
+_RE_TOKEN = re.compile(r"\s*(?:(?P<numero>\d+(?:[.,]\d+)?)|(?P<nome>[A-Za-z_][A-Za-z0-9_]*)|(?P<operador>[-+*/()%]))")
+
+Valores = Mapping[str, Decimal]
+Expressao = Callable[[Valores], Decimal]
+
+
+_OPERACOES = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+
+class FormulaInvalida(ValueError):
+    """The text is not an expression of the supported grammar."""
+
+
+def _binaria(operacao: Callable, esquerda: Expressao, direita: Expressao) -> Expressao:
+    return lambda v: operacao(esquerda(v), direita(v))
+
+
+def _tokens(texto: str) -> List[Tuple[str, str]]:
+    tokens, posicao = [], 0
+    texto = texto.rstrip()
+    while posicao < len(texto):
+        m = _RE_TOKEN.match(texto, posicao)
+        if not m:
+            raise FormulaInvalida(f"caractere inesperado em {texto[posicao:]!r}")
+        tipo = m.lastgroup
+        tokens.append((tipo, m.group(tipo)))
+        posicao = m.end()
+    return tokens
+
+
+class _Parser:
+    """expr := termo (('+'|'-') termo)* ; termo := fator (('*'|'/') fator)* ; fator := ('+'|'-') fator | primario '%'?"""
+
+    def __init__(self, texto: str):
+        self.tokens = _tokens(texto)
+        self.posicao = 0
+        self.variaveis: set = set()
+
+    def _atual(self) -> Tuple[str, str] | None:
+        return self.tokens[self.posicao] if self.posicao < len(self.tokens) else None
+
+    def _consumir_operador(self, *operadores: str) -> str | None:
+        token = self._atual()
+        if token and token[0] == "operador" and token[1] in operadores:
+            self.posicao += 1
+            return token[1]
+        return None
+
+    def compilar(self) -> Expressao:
+        expressao = self._expr()
+        if self._atual() is not None:
+            raise FormulaInvalida(f"sobrou {self._atual()[1]!r} no fim da fórmula")
+        return expressao
+
+    def _expr(self) -> Expressao:
+        esquerda = self._termo()
+        while (operador := self._consumir_operador("+", "-")) is not None:
+            esquerda = _binaria(_OPERACOES[operador], esquerda, self._termo())
+        return esquerda
+
+    def _termo(self) -> Expressao:
+        esquerda = self._fator()
+        while (operador := self._consumir_operador("*", "/")) is not None:
+            esquerda = _binaria(_OPERACOES[operador], esquerda, self._fator())
+        return esquerda
+
+    def _fator(self) -> Expressao:
+        sinal = self._consumir_operador("+", "-")
+        if sinal is not None:
+            interno = self._fator()
+            return interno if sinal == "+" else (lambda v: -interno(v))
+        primario = self._primario()
+        if self._consumir_operador("%") is not None:
+            return lambda v: primario(v) / 100
+        return primario
+
+    def _primario(self) -> Expressao:
+        token = self._atual()
+        if token is None:
+            raise FormulaInvalida("fórmula incompleta")
+        self.posicao += 1
+        tipo, texto = token
+        if tipo == "numero":
+            constante = Decimal(texto.replace(",", "."))
+            return lambda v: constante
+        if tipo == "nome":
+            chave = VARIAVEIS.get(texto.lower())
+            if chave is None:
+                raise FormulaInvalida(f"campo desconhecido: {texto}")
+            self.variaveis.add(chave)
+            return lambda v: v[chave]
+        if texto == "(":
+            interno = self._expr()
+            if self._consumir_operador(")") is None:
+                raise FormulaInvalida("parêntese sem fechamento")
+            return interno
+        raise FormulaInvalida(f"operador inesperado: {texto}")
+
+
+@dataclass
+class Formula:
+    """A compiled expression and the invoice fields it reads."""
+
+    texto: str
+    avaliar: Expressao
+    variaveis: frozenset
+
+    @classmethod
+    def compilar(cls, texto: str) -> "Formula":
+        parser = _Parser(texto)
+        avaliar = parser.compilar()
+        return cls(texto=texto, avaliar=avaliar, variaveis=frozenset(parser.variaveis))
+
+
+def _decimal(valor) -> Decimal | None:
+    mantissa, casas = valor_exato(valor)
+    return Decimal(mantissa).scaleb(-casas) if mantissa > 0 else None
+
+
+def _formatar(valor: Decimal) -> str:
+    centavos = valor.quantize(CENTAVO, ROUND_HALF_UP)
+    return f"{centavos:f}".replace(".", ",")
+
+
+class PoliticaDiretrizes(PoliticaCalculo):
+    """
+    Policy built from the client's formulas. Targets without a formula use
+    the default split (30% economy, 70% payable), as the LLM prompt does.
+    A target is left empty when a field it reads is missing or not positive,
+    or when the formula divides by zero.
+    """
+
+    def __init__(self, formulas: Mapping[str, Formula]):
+        self.formulas = {
+            alvo: formulas.get(alvo) or Formula.compilar(FORMULAS_PADRAO[alvo]) for alvo in FORMULAS_PADRAO
+        }
+
+    def calcular(self, dados: dict) -> dict:
+        """Return economia and valor_a_pagar."""
+        dados = dados or {}
+        valores: Dict[str, Decimal] = {}
+        for chave in set().union(*(formula.variaveis for formula in self.formulas.values())):
+            bruto = dados.get(chave)
+            if chave == "energia_atv_injetada_valor" and not bruto:
+                bruto = dados.get("energia_injetada_valor")
+            valor = _decimal(bruto)
+            if valor is not None:
+                valores[chave] = valor
+
+        resultado = {}
+        for alvo, formula in self.formulas.items():
+            resultado[alvo] = ""
+            if formula.variaveis <= valores.keys():
+                try:
+                    resultado[alvo] = _formatar(formula.avaliar(valores))
+                except (DivisionByZero, InvalidOperation, ZeroDivisionError):
+                    pass
+        return resultado
+
+    def calcular_lote(self, lote: Iterable[dict]) -> List[Dict[str, str]]:
+        """`calcular` for many invoices at once."""
+        return [self.calcular(dados) for dados in lote]
+
+
+@dataclass
+class Diretrizes:
+    """Client directives split into the compiled policy (if any formula compiled) and the free-form rest."""
+
+    politica: PoliticaDiretrizes | None = None
+    instrucoes_livres: str = ""
+    formulas: Dict[str, str] = field(default_factory=dict)
+
+
+def _normalizar_alvo(alvo: str) -> str:
+    return " ".join(alvo.replace("_", " ").lower().split())
+
+
+def compilar_diretrizes(texto: str) -> Diretrizes:
+    """Compile every formula line of `texto`; the other lines go to `instrucoes_livres`."""
+    formulas: Dict[str, Formula] = {}
+    livres = []
+    for linha in (texto or "").splitlines():
+        if not linha.strip():
+            continue
+        m = _RE_ATRIBUICAO.match(linha)
+        alvo = ALVOS.get(_normalizar_alvo(m.group("alvo"))) if m else None
+        if alvo is not None:
+            try:
+                formula = Formula.compilar(m.group("expressao"))
+            except FormulaInvalida:
+                formula = None
+            # "economia = 40%" names no field: ambiguous, so the LLM interprets it.
+            if formula is not None and formula.variaveis:
+                formulas[alvo] = formula
+                continue
+        livres.append(linha.strip())
+    if not formulas:
+        return Diretrizes(instrucoes_livres="\n".join(livres))
+    return Diretrizes(
+        politica=PoliticaDiretrizes(formulas),
+        instrucoes_livres="\n".join(livres),
+        formulas={alvo: formula.texto for alvo, formula in formulas.items()},
+    )
@@ -1,11 +1,51 @@
 """Factory for calculation policies."""
 
+import threading
+from typing import Any, Dict, Tuple
+
+from .diretrizes import Diretrizes, compilar_diretrizes
 from .padrao import PoliticaPadrao
 from .vip import PoliticaVIP
 
+# Compiled directives per client pk, with the prompt text they were compiled from.
+_diretrizes_por_cliente: Dict[Any, Tuple[str, Diretrizes]] = {}
+_lock = threading.Lock()
+
+
+def diretrizes_do_cliente(cliente: Any) -> Diretrizes:
+    """
+    Compiled directives of the client's prompt_template. Compiled once per
+    client and reused until `invalidar_diretrizes` is called or the text changes.
+    """
+    texto = getattr(cliente, "prompt_template", "") or ""
+    chave = getattr(cliente, "pk", None)
+    if chave is None:
+        return compilar_diretrizes(texto)
+    with _lock:
+        em_cache = _diretrizes_por_cliente.get(chave)
+    if em_cache is not None and em_cache[0] == texto:
+        return em_cache[1]
+    diretrizes = compilar_diretrizes(texto)
+    with _lock:
+        _diretrizes_por_cliente[chave] = (texto, diretrizes)
+    return diretrizes
+
+
+def invalidar_diretrizes(cliente_pk: Any) -> None:
+    """Drop the compiled directives of a client (call after its prompt_template changes)."""
+    with _lock:
+        _diretrizes_por_cliente.pop(cliente_pk, None)
+
 
-def get_politica(nome: str):
-    """Return a calculation policy instance by name."""
+def get_politica(nome: str, cliente: Any = None):
+    """
+    Return a calculation policy instance by name. When `cliente` has formulas
+    in its prompt_template, the policy compiled from them wins.
+    """
+    if cliente is not None:
+        politica = diretrizes_do_cliente(cliente).politica
+        if politica is not None:
+            return politica
     if isinstance(nome, str) and nome.strip().upper() == "VIP":
         return PoliticaVIP()
     return PoliticaPadrao()
@@ -1,11 +1,33 @@
 """Detector base class for concessionaria identification."""
 
+import re
+from typing import Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Normalization shared by every detector (done once per text by the registry)."""
+    return (text or "").upper()
+
 
 class BaseDetector:
-    """Base detector with a scoring interface."""
+    """
+    Base detector with a scoring interface.
+
+    Detectors declare weighted signals matched against the normalized text:
+    `keywords` are literal substrings and `patterns` are regular expressions.
+    Each signal counts once. The registry evaluates the signals of every
+    detector together, chunk by chunk; detectors that need custom logic may
+    override `score` instead, and are then scored on their own. Pattern
+    matches must be shorter than the registry's chunk overlap (64 chars).
+    """
 
     name: str = ""
+    keywords: Tuple[Tuple[str, float], ...] = ()
+    patterns: Tuple[Tuple[str, float], ...] = ()
 
     def score(self, text: str) -> float:
         """Return a score between 0.0 and 1.0."""
-        raise NotImplementedError
+        normalized = normalize_text(text)
+        total = sum(weight for keyword, weight in self.keywords if keyword in normalized)
+        total += sum(weight for pattern, weight in self.patterns if re.search(pattern, normalized))
+        return min(1.0, total)
@@ -4,10 +4,15 @@ from .base import BaseDetector
 
 
 class CPFLDetector(BaseDetector):
-    """Minimal CPFL detector stub."""
+    """Heuristic-based detector for CPFL group invoices."""
 
     name = "CPFL"
-
-    def score(self, text: str) -> float:
-        """Return a minimal score placeholder."""
-        return 0.0
+    keywords = (
+        ("CPFL.COM.BR", 0.2),
+        ("RGE SUL", 0.2),
+    )
+    patterns = (
+        (r"\bCPFL\b", 0.5),
+        (r"CPFL (?:PAULISTA|PIRATININGA|SANTA CRUZ|RGE)", 0.3),
+        (r"COMPANHIA PAULISTA DE FOR[ÇC]A E LUZ", 0.3),
+    )
@@ -4,10 +4,13 @@ from .base import BaseDetector
 
 
 class EnelDetector(BaseDetector):
-    """Minimal Enel detector stub."""
+    """Heuristic-based detector for Enel invoices (São Paulo, Rio, Ceará, Goiás)."""
 
     name = "ENEL"
-
-    def score(self, text: str) -> float:
-        """Return a minimal score placeholder."""
-        return 0.0
+    keywords = (
+        ("ENEL DISTRIBUI", 0.3),
+        ("ENEL.COM.BR", 0.2),
+        ("ELETROPAULO", 0.2),
+        ("COELCE", 0.2),
+    )
+    patterns = ((r"\bENEL\b", 0.5),)
@@ -0,0 +1,99 @@
+"""Registry that scores every detector in one incremental pass over the text."""
+
+import re
+from typing import Dict, Iterable, List, Pattern, Tuple, Union
+
+from .base import BaseDetector, normalize_text
+
+DEFAULT_NAME = "ENERGISA"
+# Score at which a detector wins without scanning the rest of the text.
+DEFAULT_THRESHOLD = 1.0
+# Chunks start small (invoice headers are short) and double up to the maximum.
+FIRST_CHUNK_SIZE = 1024
+MAX_CHUNK_SIZE = 16384
+# Context read on each side of a chunk, so that a signal split across a boundary is
+# still found and a pattern never matches text cut at the boundary.
+CHUNK_OVERLAP = 64
+
+
+class DetectorRegistry:
+    """
+    Detectors are instantiated once and their signals (keywords and compiled
+    patterns) are pooled at construction. Detection walks the text in chunks,
+    normalizing each chunk once and testing all pending signals of every
+    concessionaria on it; a signal leaves the pool when found, and the walk
+    stops as soon as a detector reaches `threshold`. Invoices carry their
+    identifying signals in the header, so most of the text is never touched.
+    """
+
+    def __init__(self, detectors: Iterable[BaseDetector], threshold: float = DEFAULT_THRESHOLD):
+        self.detectors: Tuple[BaseDetector, ...] = tuple(detectors)
+        self.threshold = threshold
+        # (detector index, weight, keyword string or compiled pattern)
+        self._signals: List[Tuple[int, float, Union[str, Pattern[str]]]] = []
+        self._custom: List[int] = []
+        for index, detector in enumerate(self.detectors):
+            if type(detector).score is not BaseDetector.score:
+                self._custom.append(index)
+                continue
+            for keyword, weight in detector.keywords:
+                self._signals.append((index, weight, keyword))
+            for pattern, weight in detector.patterns:
+                self._signals.append((index, weight, re.compile(pattern)))
+
+    def _totals(self, text: str) -> List[float]:
+        totals = [0.0] * len(self.detectors)
+        for index in self._custom:
+            totals[index] = self.detectors[index].score(text)
+
+        text = text or ""
+        pending = self._signals
+        start = 0
+        size = FIRST_CHUNK_SIZE
+        while pending and start < len(text) and max(totals, default=0.0) < self.threshold:
+            # This round owns text[start:end]; a pattern counts only when its match starts
+            # there, and matches are shorter than the overlap, so they end inside the chunk.
+            end = start + size
+            left = max(0, start - CHUNK_OVERLAP)
+            raw = text if left == 0 and end + CHUNK_OVERLAP >= len(text) else text[left:end + CHUNK_OVERLAP]
+            chunk = normalize_text(raw)
+            first, last = start - left, end - left
+            if len(chunk) != len(raw):
+                # upper() may change lengths ("ß" -> "SS"): map the owned region to the chunk.
+                first = len(normalize_text(raw[:first]))
+                last = first + len(normalize_text(text[start:end]))
+            start, size = end, min(size * 2, MAX_CHUNK_SIZE)
+            remaining = []
+            for signal in pending:
+                index, weight, probe = signal
+                if probe.__class__ is str:
+                    found = probe in chunk
+                else:
+                    match = probe.search(chunk, first)
+                    found = match is not None and match.start() < last
+                if not found:
+                    remaining.append(signal)
+                    continue
+                totals[index] += weight
+                if totals[index] >= self.threshold:
+                    break
+            pending = remaining
+        return [min(1.0, total) for total in totals]
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Score of every detector, stopping early once one reaches the threshold."""
+        return {detector.name: score for detector, score in zip(self.detectors, self._totals(text))}
+
+    def best(self, text: str, default: str = DEFAULT_NAME) -> Tuple[str, float]:
+        """(name, score) of the best matched concessionaria; ties go to the first registered detector."""
+        best_name = default
+        best_score = 0.0
+        for detector, score in zip(self.detectors, self._totals(text)):
+            if score > best_score:
+                best_name = detector.name or best_name
+                best_score = score
+        return best_name, best_score
+
+    def detect(self, text: str, default: str = DEFAULT_NAME) -> str:
+        """Best matched concessionaria name (`default` when no detector scores)."""
+        return self.best(text, default)[0]
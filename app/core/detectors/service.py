@@ -1,27 +1,31 @@
 """Service for detecting concessionaria based on extracted text."""
 
-from typing import List
+import re
 
-from .base import BaseDetector
 from .cpfl import CPFLDetector
 from .enel import EnelDetector
 from .energisa import EnergisaDetector
+from .registry import DetectorRegistry
+
+REGISTRY = DetectorRegistry([
+    EnergisaDetector(),
+    EnelDetector(),
+    CPFLDetector(),
+])
 
 
 def detect_concessionaria(text: str) -> str:
-    """Run all detectors and return the best matched concessionaria name."""
-    detectors: List[BaseDetector] = [
-        EnergisaDetector(),
-        EnelDetector(),
-        CPFLDetector(),
-    ]
-
-    best_name = "ENERGISA"
-    best_score = 0.0
-    for detector in detectors:
-        score = detector.score(text)
-        if score > best_score:
-            best_name = detector.name or best_name
-            best_score = score
-
-    return best_name
+    """Score all detectors in one pass and return the best matched concessionaria name."""
+    return REGISTRY.detect(text)
+
+
+# Markers shared by electricity bills of any concessionaria (DANF3E, "conta de energia", kWh...).
+_INVOICE_MARKERS = re.compile(
+    r"DANF3E|CONTA DE ENERGIA|ENERGIA EL[ÉE]TRICA|UNIDADE CONSUMIDORA|NOTA FISCAL/CONTA|\bKWH\b",
+    re.IGNORECASE,
+)
+
+
+def looks_like_invoice(text: str) -> bool:
+    """Whether the text carries generic electricity-bill markers (used when no detector scores)."""
+    return bool(_INVOICE_MARKERS.search(text or ""))
@@ -0,0 +1 @@
+"""PDF text extraction package."""
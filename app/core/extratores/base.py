@@ -0,0 +1,70 @@
+"""Base classes for PDF text extraction backends."""
+
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Tuple, Union
+
+from .layout import IndicePagina, Rotulo
+
+PDFEntrada = Union[str, Path, IO[bytes]]
+
+
+@dataclass
+class DocumentoPDF:
+    """
+    Resultado de uma única passada de extração sobre o PDF.
+    `texto` mantém o formato histórico de `extrair_texto` (uma linha por página).
+    """
+
+    paginas: List[str] = field(default_factory=list)
+    palavras: List[List[Dict[str, Any]]] = field(default_factory=list)
+    _indices: Dict[int, IndicePagina] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    @cached_property
+    def texto(self) -> str:
+        return "\n".join(p for p in self.paginas if p)
+
+    @property
+    def num_paginas(self) -> int:
+        return len(self.paginas)
+
+    @property
+    def tem_palavras(self) -> bool:
+        """False when the backend did not keep word boxes (e.g. pdfium without `com_palavras`)."""
+        return any(self.palavras)
+
+    def indice(self, pagina: int) -> IndicePagina:
+        """Spatial word index of a page (0-based), built on first use."""
+        if pagina not in self._indices:
+            self._indices[pagina] = IndicePagina(self.palavras[pagina])
+        return self._indices[pagina]
+
+    def rotulos(self, rotulo: str) -> Iterator[Tuple[IndicePagina, Rotulo]]:
+        """
+        Occurrences of `rotulo` as printed (see IndicePagina.rotulos), page by page.
+        Only pages whose linear text contains the label get indexed.
+        """
+        for pagina, (texto, palavras) in enumerate(zip(self.paginas, self.palavras)):
+            if palavras and rotulo in texto:
+                indice = self.indice(pagina)
+                for encontrado in indice.rotulos(rotulo):
+                    yield indice, encontrado
+
+
+class BaseExtrator:
+    """Base extractor with a single-pass extraction interface."""
+
+    name: str = ""
+
+    def extrair(self, pdf: PDFEntrada, max_paginas: int | None = None) -> DocumentoPDF:
+        """Extract every page of the PDF (or only the first `max_paginas`) into a DocumentoPDF."""
+        raise NotImplementedError
+
+    @staticmethod
+    def _preparar(pdf: PDFEntrada):
+        """Rewind uploaded files and normalize paths before opening."""
+        if hasattr(pdf, "read"):
+            pdf.seek(0)
+            return pdf
+        return Path(pdf)
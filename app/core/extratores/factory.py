@@ -0,0 +1,26 @@
+"""Factory for PDF extraction backends."""
+
+from django.conf import settings
+
+from .base import BaseExtrator
+from .pdfium import PdfiumExtrator
+from .plumber import PdfplumberExtrator
+
+EXTRATORES = {
+    PdfplumberExtrator.name: PdfplumberExtrator,
+    PdfiumExtrator.name: PdfiumExtrator,
+}
+
+
+def get_extrator(nome: str = "", concessionaria: str = "") -> BaseExtrator:
+    """
+    Return an extraction backend instance.
+    Priority: explicit name, PDF_EXTRATOR_POR_CONCESSIONARIA, PDF_EXTRATOR, pdfplumber.
+    """
+    if not nome and concessionaria:
+        por_concessionaria = getattr(settings, "PDF_EXTRATOR_POR_CONCESSIONARIA", {}) or {}
+        nome = por_concessionaria.get(concessionaria.strip().upper(), "")
+    if not nome:
+        nome = getattr(settings, "PDF_EXTRATOR", "") or PdfplumberExtrator.name
+    classe = EXTRATORES.get(nome.strip().lower(), PdfplumberExtrator)
+    return classe()
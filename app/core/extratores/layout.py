@@ -0,0 +1,111 @@
+"""Spatial index over the word boxes kept by the extraction backends."""
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+Palavra = Dict[str, Any]
+
+# Two words belong to the same row when their tops differ by at most this many points.
+TOLERANCIA_LINHA = 3.0
+
+
+@dataclass
+class Rotulo:
+    """Position of a (possibly multi-word) label on the page and the text glued after it, if any."""
+
+    linha: int
+    inicio: int
+    fim: int
+    x0: float
+    top: float
+    x1: float
+    bottom: float
+    resto: str = ""
+
+
+def _chave(texto: str) -> str:
+    return texto.upper().rstrip(":")
+
+
+class IndicePagina:
+    """
+    Spatial index over the word boxes of one page (pdfplumber coordinates:
+    origin at the top-left, `top` growing downwards). Words are bucketed into
+    rows sorted by `top`, each row sorted by `x0`, and a dict maps every word
+    text to its (row, position). Label lookups are a dict hit, "right of" and
+    "below" are slices of the neighbouring rows and region queries bisect the
+    rows and then each row, so none of them scans the page.
+    """
+
+    def __init__(self, palavras: Sequence[Palavra]):
+        self.linhas: List[List[Palavra]] = []
+        for palavra in sorted(palavras, key=lambda p: (p["top"], p["x0"])):
+            if self.linhas and palavra["top"] - self.linhas[-1][0]["top"] <= TOLERANCIA_LINHA:
+                self.linhas[-1].append(palavra)
+            else:
+                self.linhas.append([palavra])
+        self._tops: List[float] = []
+        self._x0s: List[List[float]] = []
+        self._por_texto: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for numero, linha in enumerate(self.linhas):
+            linha.sort(key=lambda p: p["x0"])
+            self._tops.append(linha[0]["top"])
+            self._x0s.append([p["x0"] for p in linha])
+            for posicao, palavra in enumerate(linha):
+                self._por_texto[_chave(palavra["text"])].append((numero, posicao))
+
+    def na_regiao(self, x0: float, top: float, x1: float, bottom: float) -> List[Palavra]:
+        """Words whose top-left corner falls inside the region, in reading order."""
+        encontradas = []
+        for numero in range(bisect_left(self._tops, top - TOLERANCIA_LINHA), bisect_right(self._tops, bottom)):
+            linha = self.linhas[numero]
+            x0s = self._x0s[numero]
+            encontradas.extend(
+                p for p in linha[bisect_left(x0s, x0):bisect_right(x0s, x1)] if top <= p["top"] <= bottom
+            )
+        return encontradas
+
+    def rotulos(self, rotulo: str) -> List[Rotulo]:
+        """
+        Every occurrence of `rotulo` (case-insensitive, words separated by
+        spaces): the first word must match exactly and the next ones must start
+        the following words of the same row. The last word may carry the value
+        glued to it ("Atual:09/09/2025"), which is returned in `resto`.
+        """
+        termos = [termo.upper() for termo in rotulo.split()]
+        if not termos:
+            return []
+        ultimo = len(termos) - 1
+        encontrados = []
+        for numero, inicio in self._por_texto.get(_chave(termos[0]), ()):
+            linha = self.linhas[numero]
+            fim = inicio + ultimo
+            if fim >= len(linha):
+                continue
+            for deslocamento in range(1, ultimo + 1):
+                if not linha[inicio + deslocamento]["text"].upper().startswith(termos[deslocamento]):
+                    break
+            else:
+                primeira, final = linha[inicio], linha[fim]
+                resto = final["text"][len(termos[-1]):].lstrip(":") if ultimo else ""
+                encontrados.append(Rotulo(
+                    numero, inicio, fim, primeira["x0"], primeira["top"], final["x1"], final["bottom"], resto
+                ))
+        return encontrados
+
+    def a_direita(self, rotulo: Rotulo, distancia: float = 200.0) -> List[Palavra]:
+        """Words on the label's row, right of it and at most `distancia` points away, left to right."""
+        limite = bisect_right(self._x0s[rotulo.linha], rotulo.x1 + distancia)
+        return self.linhas[rotulo.linha][rotulo.fim + 1:limite]
+
+    def linhas_abaixo(self, rotulo: Rotulo) -> Iterator[List[Palavra]]:
+        """Rows below the label's row, top to bottom; callers that stop early never touch the rest."""
+        for numero in range(rotulo.linha + 1, len(self.linhas)):
+            yield self.linhas[numero]
+
+
+def texto_linha(linha: Sequence[Palavra]) -> str:
+    """Text of a row of words, space-separated like the linear page text."""
+    return " ".join(p["text"] for p in linha)
@@ -0,0 +1,21 @@
+"""pdfplumber/pdfminer extraction backend."""
+
+import pdfplumber
+
+from .base import BaseExtrator, DocumentoPDF, PDFEntrada
+
+
+class PdfplumberExtrator(BaseExtrator):
+    """Pure-Python backend that keeps the word boxes computed by pdfplumber."""
+
+    name = "pdfplumber"
+
+    def extrair(self, pdf: PDFEntrada, max_paginas: int | None = None) -> DocumentoPDF:
+        """Extract text (one line per page) and word boxes in a single pass."""
+        documento = DocumentoPDF()
+        with pdfplumber.open(self._preparar(pdf), pages=range(1, max_paginas + 1) if max_paginas else None) as arquivo:
+            for pagina in arquivo.pages:
+                words = pagina.extract_words()
+                documento.palavras.append(words)
+                documento.paginas.append(" ".join(w["text"] for w in words))
+        return documento
@@ -0,0 +1,237 @@
+"""Benchmarks do pipeline de faturas."""
+
+import logging
+import tempfile
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.extratores.factory import EXTRATORES
+
+
+class Command(BaseCommand):
+    help = 'Executa benchmarks do pipeline de faturas (ex.: "benchmark extratores faturas/*.pdf").'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='alvo', required=True)
+
+        extratores = subparsers.add_parser(
+            'extratores',
+            help='Compara tempo e dicas de regex entre os backends de extração de texto.',
+        )
+        extratores.add_argument('pdfs', nargs='+', help='PDFs de faturas a comparar.')
+        extratores.add_argument(
+            '--backend',
+            action='append',
+            choices=sorted(EXTRATORES),
+            help='Backend a comparar (pode repetir). Padrão: todos.',
+        )
+        extratores.add_argument('--repeticoes', type=int, default=3, help='Extrações por PDF e backend.')
+
+        hints = subparsers.add_parser(
+            'hints',
+            help='Mede montar_hints contra a implementação anterior (uma busca por campo).',
+        )
+        hints.add_argument('pdfs', nargs='*', help='PDFs de faturas (padrão: texto sintético de fatura Energisa).')
+        hints.add_argument('--repeticoes', type=int, default=2000, help='Execuções por texto.')
+
+        deteccao = subparsers.add_parser(
+            'deteccao',
+            help='Mede a vazão da detecção da concessionária contra a implementação anterior.',
+        )
+        deteccao.add_argument('pdfs', nargs='*', help='PDFs de faturas (padrão: textos do corpus sintético).')
+        deteccao.add_argument('--repeticoes', type=int, default=2000, help='Execuções por texto.')
+
+        concessionarias = subparsers.add_parser(
+            'concessionarias',
+            help='Mede parser e processamento completo de faturas Energisa, ENEL e CPFL do corpus sintético.',
+        )
+        concessionarias.add_argument('--quantidade', type=int, default=5, help='Faturas por concessionária.')
+        concessionarias.add_argument('--paginas', type=int, default=2, help='Páginas de cada fatura.')
+        concessionarias.add_argument('--repeticoes', type=int, default=200, help='Execuções do parser por texto.')
+
+        calculos = subparsers.add_parser(
+            'calculos',
+            help='Compara calcular fatura a fatura com calcular_lote nas políticas de cálculo.',
+        )
+        calculos.add_argument('--linhas', type=int, default=100_000, help='Faturas sintéticas no lote.')
+        calculos.add_argument('--repeticoes', type=int, default=3, help='Execuções de cada implementação (vale a melhor).')
+
+        pipeline = subparsers.add_parser(
+            'pipeline',
+            help='Mede cada etapa do pipeline em um corpus sintético, com a IA substituída por um dublê.',
+        )
+        pipeline.add_argument('--quantidade', type=int, default=12, help='Faturas no corpus sintético.')
+        pipeline.add_argument(
+            '--paginas',
+            type=int,
+            action='append',
+            help='Contagem de páginas das faturas (pode repetir). Padrão: 1, 2, 4 e 8.',
+        )
+        pipeline.add_argument('--repeticoes', type=int, default=3, help='Execuções de cada etapa por fatura.')
+        pipeline.add_argument('--corpus', help='Diretório onde gravar o corpus (padrão: temporário).')
+        pipeline.add_argument('--baseline', help='Arquivo da linha de base (padrão: app/core/benchmarks/baselines/pipeline.json).')
+        pipeline.add_argument('--salvar-baseline', action='store_true', help='Grava o resultado como nova linha de base.')
+        pipeline.add_argument('--comparar', action='store_true', help='Falha se houver regressão em relação à linha de base.')
+        pipeline.add_argument(
+            '--tolerancia',
+            type=float,
+            default=0.25,
+            help='Piora relativa aceita antes de acusar regressão (padrão: 0,25).',
+        )
+
+    def handle(self, *args, **options):
+        handler = getattr(self, f"_handle_{options['alvo']}")
+        handler(options)
+
+    def _handle_extratores(self, options):
+        from app.core.benchmarks.extratores import comparar_extratores
+
+        pdfs = [Path(p) for p in options['pdfs']]
+        faltando = [str(p) for p in pdfs if not p.is_file()]
+        if faltando:
+            raise CommandError(f"Arquivo(s) não encontrado(s): {', '.join(faltando)}")
+
+        linhas = comparar_extratores(pdfs, options.get('backend') or (), options['repeticoes'])
+        totais = {}
+        for linha in linhas:
+            tempos = ' | '.join(f'{nome}: {ms:.1f} ms' for nome, ms in linha['tempos_ms'].items())
+            self.stdout.write(f"{linha['pdf']}: {tempos}")
+            for nome, ms in linha['tempos_ms'].items():
+                totais[nome] = totais.get(nome, 0.0) + ms
+            for nome, chaves in linha['divergencias'].items():
+                if chaves:
+                    self.stdout.write(self.style.WARNING(f'  {nome} diverge em: {", ".join(chaves)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'  {nome}: todas as dicas coincidem'))
+
+        if linhas:
+            resumo = ' | '.join(f'{nome}: {ms / len(linhas):.1f} ms/PDF' for nome, ms in totais.items())
+            self.stdout.write(f'Média: {resumo}')
+
+    def _handle_hints(self, options):
+        from app.core.benchmarks.hints import comparar_hints, texto_sintetico
+        from app.core.services.processamento_energisa import extrair_texto
+
+        if options['pdfs']:
+            textos = [extrair_texto(Path(p)) for p in options['pdfs']]
+        else:
+            textos = [texto_sintetico(linhas) for linhas in (1, 3, 8)]
+
+        resultado = comparar_hints(textos, max(1, options['repeticoes']))
+        self.stdout.write(
+            f"{resultado['textos']} texto(s), {resultado['caracteres']} caracteres: "
+            f"referência {resultado['referencia_us']:.1f} µs | montar_hints {resultado['montar_hints_us']:.1f} µs "
+            f"({resultado['ganho']:.1f}x)"
+        )
+        if resultado['divergentes']:
+            raise CommandError(f"Hints divergentes nos textos: {resultado['divergentes']}")
+        self.stdout.write(self.style.SUCCESS('Hints idênticos à implementação de referência.'))
+
+    def _handle_deteccao(self, options):
+        from app.core.benchmarks.deteccao import comparar_deteccao, textos_corpus
+        from app.core.services.processamento_energisa import extrair_texto
+
+        if options['pdfs']:
+            textos = [extrair_texto(Path(p)) for p in options['pdfs']]
+        else:
+            textos = textos_corpus()
+
+        resultado = comparar_deteccao(textos, max(1, options['repeticoes']))
+        self.stdout.write(
+            f"{resultado['textos']} texto(s), {resultado['caracteres']} caracteres: "
+            f"referência {resultado['referencia_us']:.1f} µs | detect_concessionaria {resultado['atual_us']:.1f} µs "
+            f"({resultado['ganho']:.1f}x, {resultado['textos_por_segundo']:.0f} textos/s)"
+        )
+        if resultado['divergentes']:
+            raise CommandError(f"Detecção divergente nos textos: {resultado['divergentes']}")
+        self.stdout.write(self.style.SUCCESS('Mesma concessionária que a implementação de referência.'))
+
+    def _handle_calculos(self, options):
+        from app.core.benchmarks.calculos import medir_calculos
+
+        resultado = medir_calculos(max(1, options['linhas']), max(1, options['repeticoes']))
+        for politica, valores in resultado.items():
+            self.stdout.write(
+                f"{politica:<7} {valores['linhas']} linhas | anterior (float) {valores['referencia_ms']:.0f} ms | "
+                f"calcular {valores['por_fatura_ms']:.0f} ms | calcular_lote {valores['lote_ms']:.0f} ms "
+                f"({valores['linhas_por_segundo']:,.0f} linhas/s)"
+            )
+            if valores['divergentes_referencia']:
+                self.stdout.write(
+                    f"  a versão anterior (float) diverge do valor exato em {valores['divergentes_referencia']} linha(s)"
+                )
+            if valores['divergentes']:
+                raise CommandError(f"{politica}: calcular_lote diverge do cálculo exato em {valores['divergentes']} linha(s)")
+        self.stdout.write(self.style.SUCCESS('calcular_lote igual ao cálculo exato em Decimal, centavo a centavo.'))
+
+    def _handle_concessionarias(self, options):
+        from app.core.benchmarks.concessionarias import medir_concessionarias
+
+        logger = logging.getLogger('app')
+        nivel = logger.level
+        logger.setLevel(max(nivel, logging.WARNING))
+        try:
+            resultado = medir_concessionarias(
+                quantidade=max(1, options['quantidade']),
+                paginas=max(1, options['paginas']),
+                repeticoes=max(1, options['repeticoes']),
+            )
+        finally:
+            logger.setLevel(nivel)
+
+        for concessionaria, valores in resultado.items():
+            self.stdout.write(
+                f"{concessionaria:<9} parser {valores['parser_us']:8.1f} µs | "
+                f"processamento completo {valores['processamento_ms']:8.1f} ms/fatura | "
+                f"chamadas à IA: {valores['chamadas_ia']} em {valores['faturas']} fatura(s)"
+            )
+            if valores['detectadas'] != [concessionaria]:
+                raise CommandError(f"{concessionaria}: faturas detectadas como {', '.join(valores['detectadas'])}")
+
+    def _handle_pipeline(self, options):
+        from app.core.benchmarks.corpus import PAGINAS_PADRAO, gerar_corpus
+        from app.core.benchmarks.pipeline import (
+            BASELINE_PADRAO,
+            carregar_baseline,
+            comparar_com_baseline,
+            medir_pipeline,
+            salvar_baseline,
+        )
+
+        baseline = Path(options['baseline']) if options.get('baseline') else BASELINE_PADRAO
+        if options['comparar'] and not baseline.is_file():
+            raise CommandError(f'Linha de base não encontrada: {baseline}')
+
+        paginas = options.get('paginas') or PAGINAS_PADRAO
+        # Os logs por fatura distorcem a medição; só avisos e erros continuam.
+        logger = logging.getLogger('app')
+        nivel = logger.level
+        logger.setLevel(max(nivel, logging.WARNING))
+        try:
+            with tempfile.TemporaryDirectory() as temporario:
+                destino = Path(options['corpus'] or temporario)
+                pdfs = gerar_corpus(destino, max(1, options['quantidade']), paginas)
+                resultado = medir_pipeline(pdfs, options['repeticoes'])
+        finally:
+            logger.setLevel(nivel)
+
+        self.stdout.write(
+            f"{resultado['faturas']} fatura(s) ({', '.join(map(str, paginas))} página(s)), "
+            f"{resultado['repeticoes']} repetição(ões), {resultado['chamadas_ia']} chamada(s) ao dublê da IA"
+        )
+        for etapa, valores in resultado['etapas'].items():
+            self.stdout.write(
+                f"  {etapa:<18} média {valores['media_ms']:9.3f} ms | p95 {valores['p95_ms']:9.3f} ms | "
+                f"pico {valores['pico_kb']:9.1f} KB | retido {valores['retido_kb_por_fatura']:8.1f} KB/fatura"
+            )
+        self.stdout.write(f"Vazão: {resultado['faturas_por_segundo']:.2f} faturas/s")
+
+        if options['comparar']:
+            regressoes = comparar_com_baseline(resultado, carregar_baseline(baseline), options['tolerancia'])
+            if regressoes:
+                raise CommandError('Regressão em relação à linha de base:\n  ' + '\n  '.join(regressoes))
+            self.stdout.write(self.style.SUCCESS(f'Sem regressões em relação a {baseline}.'))
+
+        if options['salvar_baseline']:
+            self.stdout.write(self.style.SUCCESS(f'Linha de base gravada em {salvar_baseline(resultado, baseline)}.'))
@@ -0,0 +1,76 @@
+"""Worker que processa os lotes de faturas enfileirados pelo painel."""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.core.models import LoteProcessamento
+from app.core.services import metricas
+from app.core.services.lotes import (
+    coletar_lotes_offline,
+    interromper_lote,
+    limpar_faturas_antigas,
+    processar_lote,
+    recuperar_lotes_travados,
+    reservar_proximo_lote,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processa os lotes de faturas pendentes fora da requisição HTTP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--uma-vez',
+            action='store_true',
+            help='Processa os lotes pendentes e encerra, em vez de ficar aguardando novos lotes.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas quando não há lotes pendentes.',
+        )
+
+    def handle(self, *args, **options):
+        uma_vez = options['uma_vez']
+        intervalo = max(0.1, options['intervalo'])
+
+        limpar_faturas_antigas()
+        while True:
+            # Publica também com o worker ocioso, para os contadores não sumirem do endpoint.
+            metricas.publicar_se_preciso()
+
+            recuperados = recuperar_lotes_travados()
+            if recuperados:
+                self.stdout.write(self.style.WARNING(f'{recuperados} lote(s) travado(s) encerrado(s).'))
+
+            # Lotes offline já enviados ao provedor da IA são consultados a cada volta.
+            coletados = coletar_lotes_offline()
+            if coletados:
+                self.stdout.write(self.style.SUCCESS(f'{coletados} lote(s) offline concluído(s).'))
+
+            lote = reservar_proximo_lote()
+            if lote is None:
+                if uma_vez:
+                    return
+                time.sleep(intervalo)
+                continue
+
+            self.stdout.write(f'Processando lote {lote.pk} do cliente {lote.cliente_id}...')
+            try:
+                processar_lote(lote)
+            except Exception:
+                # Um lote com falha não derruba o worker nem fica preso em 'processando'.
+                logger.exception('Falha inesperada ao processar o lote %s', lote.pk)
+                interromper_lote(lote, 'Erro inesperado ao processar o lote; envie a fatura novamente.')
+                self.stdout.write(self.style.ERROR(f'Lote {lote.pk} encerrado com erro.'))
+                continue
+            if lote.status == LoteProcessamento.STATUS_AGUARDANDO_IA:
+                self.stdout.write(f'Lote {lote.pk} enviado à IA no modo offline; aguardando o resultado.')
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Lote {lote.pk} concluído.'))
+            limpar_faturas_antigas()
@@ -0,0 +1,81 @@
+"""Servidor HTTP local compatível com a API de chat da OpenAI (simulador da IA)."""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.core.services.simulador_llm import MODOS, SimuladorLLM
+
+
+def _handler(simulador: SimuladorLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, como o pool de conexões do cliente espera
+
+        def do_POST(self):
+            tamanho = int(self.headers.get('content-length') or 0)
+            corpo = self.rfile.read(tamanho)
+            cabecalhos = {nome.lower(): valor for nome, valor in self.headers.items()}
+            status, cabecalhos_resposta, resposta = simulador.responder(self.path, corpo, cabecalhos)
+            self.send_response(status)
+            for nome, valor in cabecalhos_resposta.items():
+                self.send_header(nome, valor)
+            self.send_header('content-length', str(len(resposta)))
+            self.end_headers()
+            self.wfile.write(resposta)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = (
+        'Sobe um simulador local da API de chat da OpenAI para testes de carga e de regressão. '
+        'Aponte LLM_BASE_URL para http://HOST:PORTA/v1.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta (padrão: 127.0.0.1).')
+        parser.add_argument('--porta', type=int, default=8765, help='Porta de escuta (padrão: 8765).')
+        parser.add_argument('--modo', choices=MODOS, help='Sobrepõe LLM_SIMULADOR_MODO.')
+        parser.add_argument('--gravacoes', help='Sobrepõe LLM_SIMULADOR_GRAVACOES.')
+        parser.add_argument('--latencia-ms', type=float, help='Sobrepõe LLM_SIMULADOR_LATENCIA_MS (mediana).')
+        parser.add_argument('--latencia-p99-ms', type=float, help='Sobrepõe LLM_SIMULADOR_LATENCIA_P99_MS.')
+        parser.add_argument('--taxa-erro', type=float, help='Sobrepõe LLM_SIMULADOR_TAXA_ERRO (0 a 1).')
+        parser.add_argument('--taxa-limite', type=float, help='Sobrepõe LLM_SIMULADOR_TAXA_LIMITE (0 a 1).')
+        parser.add_argument('--semente', type=int, help='Sobrepõe LLM_SIMULADOR_SEMENTE.')
+
+    def handle(self, *args, **options):
+        try:
+            simulador = SimuladorLLM.das_configuracoes(
+                modo=options['modo'],
+                gravacoes=options['gravacoes'],
+                latencia_ms=options['latencia_ms'],
+                latencia_p99_ms=options['latencia_p99_ms'],
+                taxa_erro=options['taxa_erro'],
+                taxa_limite=options['taxa_limite'],
+                semente=options['semente'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        servidor = ThreadingHTTPServer((options['host'], options['porta']), _handler(simulador))
+        servidor.daemon_threads = True
+        self.stdout.write(
+            f"Simulador da IA em http://{options['host']}:{servidor.server_port}/v1 "
+            f"(modo {simulador.modo}, gravações em {simulador.gravacoes}, "
+            f"latência {simulador.latencia_ms:.0f}/{simulador.latencia_p99_ms:.0f} ms mediana/p99, "
+            f"erros {simulador.taxa_erro:.0%}, limite {simulador.taxa_limite:.0%})"
+        )
+        if simulador.modo == 'gravar':
+            self.stdout.write(f'Repassando ao provedor em {settings.LLM_SIMULADOR_UPSTREAM}.')
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
+            resumo = ', '.join(f'{nome}: {valor}' for nome, valor in simulador.estatisticas.items())
+            self.stdout.write(f'Simulador encerrado. {resumo}')
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_alter_cliente_template_fatura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteProcessamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluido', 'Concluído')], db_index=True, default='pendente', max_length=20)),
+                ('base_url', models.CharField(blank=True, default='', max_length=255)),
+                ('coletado', models.BooleanField(default=False)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lotes', to='core.cliente')),
+            ],
+            options={
+                'verbose_name': 'Lote de processamento',
+                'verbose_name_plural': 'Lotes de processamento',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArquivoLote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('ordem', models.PositiveIntegerField(default=0)),
+                ('nome_original', models.CharField(max_length=255)),
+                ('pdf', models.FileField(blank=True, null=True, upload_to='lotes/%Y/%m/')),
+                ('status', models.CharField(choices=[('pendente', 'Aguardando'), ('processando', 'Processando'), ('processado', 'Processado'), ('erro', 'Erro')], default='pendente', max_length=20)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('html', models.TextField(blank=True, default='')),
+                ('contact_name', models.CharField(blank=True, default='', max_length=255)),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos', to='core.loteprocessamento')),
+            ],
+            options={
+                'verbose_name': 'Arquivo do lote',
+                'verbose_name_plural': 'Arquivos do lote',
+                'ordering': ['lote', 'ordem'],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_lotes_processamento'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='arquivolote',
+            name='contact_name',
+        ),
+        migrations.RemoveField(
+            model_name='arquivolote',
+            name='html',
+        ),
+        migrations.CreateModel(
+            name='FaturaProcessada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('nome', models.CharField(default='fatura.html', max_length=255)),
+                ('original_name', models.CharField(blank=True, default='', max_length=255)),
+                ('contact_name', models.CharField(blank=True, default='', max_length=255)),
+                ('suggested_contact_id', models.BigIntegerField(blank=True, null=True)),
+                ('suggested_contact_name', models.CharField(blank=True, default='', max_length=100)),
+                ('conteudo', models.BinaryField(default=b'')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='faturas_processadas', to='core.cliente')),
+            ],
+            options={
+                'verbose_name': 'Fatura processada',
+                'verbose_name_plural': 'Faturas processadas',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='arquivolote',
+            name='fatura',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.faturaprocessada'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_fatura_processada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='modo_extracao',
+            field=models.CharField(choices=[('automatico', 'Automático (regex quando consistente)'), ('ia', 'Sempre IA')], default='ia', help_text='Automático: dispensa a IA quando os dados lidos via regex estão completos e consistentes.', max_length=20, verbose_name='Modo de extração'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_cliente_modo_extracao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivolote',
+            name='dados_extracao',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='loteprocessamento',
+            name='lote_ia_consultado_em',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='loteprocessamento',
+            name='lote_ia_id',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='loteprocessamento',
+            name='lote_ia_provedor',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='loteprocessamento',
+            name='modo',
+            field=models.CharField(choices=[('interativo', 'Interativo'), ('offline', 'Offline (API de lotes da IA)')], default='interativo', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='loteprocessamento',
+            name='status',
+            field=models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('aguardando_ia', 'Aguardando IA (offline)'), ('concluido', 'Concluído')], db_index=True, default='pendente', max_length=20),
+        ),
+    ]
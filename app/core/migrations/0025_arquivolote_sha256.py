@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_lote_modo_offline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='arquivolote',
+            name='sha256',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_arquivolote_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricasProcesso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('processo', models.CharField(max_length=255, unique=True)),
+                ('dados', models.JSONField(default=dict)),
+            ],
+            options={
+                'verbose_name': 'Métricas do processo',
+                'verbose_name_plural': 'Métricas dos processos',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import zlib
+
 from django.conf import settings
 from django.db import models
 
@@ -10,6 +12,17 @@ class Base(models.Model):
         abstract = True
 
 class Cliente(Base):
+    MODO_EXTRACAO_AUTOMATICO = 'automatico'
+    MODO_EXTRACAO_IA = 'ia'
+    MODO_EXTRACAO_CHOICES = [
+        (MODO_EXTRACAO_AUTOMATICO, 'Automático (regex quando consistente)'),
+        (MODO_EXTRACAO_IA, 'Sempre IA'),
+    ]
+    PROMPT_TEMPLATE_PADRAO = ''' 
+        "valor a pagar" =  energia_atv_injetada_valor * 0.7
+        "Economia"  =  energia_atv_injetada_valor * 0.3
+        '''
+
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -47,14 +60,18 @@ class Cliente(Base):
     valor_credito = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='Valor do crédito')
     saldo_final = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='Saldo final')
     password = models.CharField(max_length=128, default='123456')
+    modo_extracao = models.CharField(
+        max_length=20,
+        choices=MODO_EXTRACAO_CHOICES,
+        default=MODO_EXTRACAO_IA,
+        verbose_name='Modo de extração',
+        help_text='Automático: dispensa a IA quando os dados lidos via regex estão completos e consistentes.',
+    )
     prompt_template = models.TextField(
         verbose_name='Diretrizes para IA', 
         blank=True, 
         null=True,                          
-        default= ''' 
-        "valor a pagar" =  energia_atv_injetada_valor * 0.7
-        "Economia"  =  energia_atv_injetada_valor * 0.3
-        ''')
+        default=PROMPT_TEMPLATE_PADRAO)
 
     def __str__(self):
         return self.nome
@@ -106,3 +123,171 @@ class CreditHistory(Base):
     def __str__(self):
         sinal = '+' if self.amount and self.amount > 0 else ''
         return f'Movimentação {sinal}{self.amount}'
+
+
+class LoteProcessamento(Base):
+    """
+    Lote de faturas enviado pelo cliente e processado fora da requisição HTTP.
+    """
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_AGUARDANDO_IA = 'aguardando_ia'
+    STATUS_CONCLUIDO = 'concluido'
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Pendente'),
+        (STATUS_PROCESSANDO, 'Processando'),
+        (STATUS_AGUARDANDO_IA, 'Aguardando IA (offline)'),
+        (STATUS_CONCLUIDO, 'Concluído'),
+    ]
+    MODO_INTERATIVO = 'interativo'
+    MODO_OFFLINE = 'offline'
+    MODO_CHOICES = [
+        (MODO_INTERATIVO, 'Interativo'),
+        (MODO_OFFLINE, 'Offline (API de lotes da IA)'),
+    ]
+
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='lotes',
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDENTE, db_index=True)
+    modo = models.CharField(max_length=20, choices=MODO_CHOICES, default=MODO_INTERATIVO)
+    base_url = models.CharField(max_length=255, blank=True, default='')
+    coletado = models.BooleanField(default=False)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+    # Modo offline: identificação do lote no provedor da IA e da última consulta ao andamento.
+    lote_ia_provedor = models.CharField(max_length=20, blank=True, default='')
+    lote_ia_id = models.CharField(max_length=255, blank=True, default='')
+    lote_ia_consultado_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        verbose_name = 'Lote de processamento'
+        verbose_name_plural = 'Lotes de processamento'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'Lote {self.pk} ({self.get_status_display()})'
+
+
+class FaturaProcessada(Base):
+    """
+    HTML gerado de uma fatura, guardado comprimido fora da sessão.
+    A sessão guarda apenas os IDs das faturas prontas para download/envio.
+    """
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='faturas_processadas',
+    )
+    nome = models.CharField(max_length=255, default='fatura.html')
+    original_name = models.CharField(max_length=255, blank=True, default='')
+    contact_name = models.CharField(max_length=255, blank=True, default='')
+    suggested_contact_id = models.BigIntegerField(blank=True, null=True)
+    suggested_contact_name = models.CharField(max_length=100, blank=True, default='')
+    conteudo = models.BinaryField(default=b'')
+
+    class Meta:
+        verbose_name = 'Fatura processada'
+        verbose_name_plural = 'Faturas processadas'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.nome
+
+    @property
+    def html(self) -> str:
+        if not self.conteudo:
+            return ''
+        return zlib.decompress(bytes(self.conteudo)).decode('utf-8')
+
+    @html.setter
+    def html(self, value: str) -> None:
+        self.conteudo = zlib.compress((value or '').encode('utf-8'))
+
+    def html_em_blocos(self, tamanho: int = 64 * 1024):
+        """Bytes UTF-8 do HTML descomprimidos aos poucos, sem montar o documento inteiro."""
+        descompressor = zlib.decompressobj()
+        restante = bytes(self.conteudo or b'')
+        while restante:
+            bloco = descompressor.decompress(restante, tamanho)
+            restante = descompressor.unconsumed_tail
+            if bloco:
+                yield bloco
+        final = descompressor.flush()
+        if final:
+            yield final
+
+    def as_item(self) -> dict:
+        """Metadados usados pelo painel (sem o HTML)."""
+        return {
+            'id': self.pk,
+            'name': self.nome,
+            'status': 'processado',
+            'contact_name': self.contact_name,
+            'suggested_contact_id': self.suggested_contact_id,
+            'suggested_contact_name': self.suggested_contact_name,
+            'original_name': self.original_name,
+        }
+
+
+class ArquivoLote(Base):
+    """
+    PDF individual de um lote, com o andamento e o resultado do processamento.
+    """
+    STATUS_PENDENTE = 'pendente'
+    STATUS_PROCESSANDO = 'processando'
+    STATUS_PROCESSADO = 'processado'
+    STATUS_ERRO = 'erro'
+    STATUS_CHOICES = [
+        (STATUS_PENDENTE, 'Aguardando'),
+        (STATUS_PROCESSANDO, 'Processando'),
+        (STATUS_PROCESSADO, 'Processado'),
+        (STATUS_ERRO, 'Erro'),
+    ]
+
+    lote = models.ForeignKey(
+        LoteProcessamento,
+        on_delete=models.CASCADE,
+        related_name='arquivos',
+    )
+    ordem = models.PositiveIntegerField(default=0)
+    nome_original = models.CharField(max_length=255)
+    pdf = models.FileField(upload_to='lotes/%Y/%m/', blank=True, null=True)
+    sha256 = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDENTE)
+    erro = models.TextField(blank=True, default='')
+    # Modo offline: dicas de regex e chave do cache guardadas até a resposta da IA chegar.
+    dados_extracao = models.JSONField(blank=True, null=True)
+    fatura = models.ForeignKey(
+        FaturaProcessada,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        blank=True,
+        null=True,
+    )
+
+    class Meta:
+        verbose_name = 'Arquivo do lote'
+        verbose_name_plural = 'Arquivos do lote'
+        ordering = ['lote', 'ordem']
+
+    def __str__(self):
+        return f'{self.nome_original} ({self.get_status_display()})'
+
+
+class MetricasProcesso(Base):
+    """
+    Último instantâneo das métricas publicado por um processo (servidor web ou
+    worker de lotes); uma linha por processo, renovada a cada publicação.
+    """
+    processo = models.CharField(max_length=255, unique=True)
+    dados = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name = 'Métricas do processo'
+        verbose_name_plural = 'Métricas dos processos'
+
+    def __str__(self):
+        return self.processo
@@ -1,16 +1,10 @@
-"""Parser stub for CPFL invoices."""
+"""Parser for CPFL invoices."""
 
-from .base import BaseParser
+from .itens import ItemizedBillParser
 
 
-class CPFLParser(BaseParser):
-    """Minimal CPFL parser placeholder."""
-
-    def extract(self, text: str) -> dict:
-        """Extract normalized energy bill data."""
-        return {
-            "energia_injetada_kwh": "",
-            "energia_injetada_valor": "",
-            "consumo_kwh": "",
-            "preco_unitario": "",
-        }
+class CPFLParser(ItemizedBillParser):
+    """
+    CPFL DANF3E ("Consumo Uso Sistema [KWh]-TUSD", "Consumo - TE",
+    "Energ Atv Inj. ... - TUSD/TE" rows with trailing minus), parsed by regex only.
+    """
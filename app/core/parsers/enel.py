@@ -1,16 +1,10 @@
-"""Parser stub for Enel invoices."""
+"""Parser for Enel invoices."""
 
-from .base import BaseParser
+from .itens import ItemizedBillParser
 
 
-class EnelParser(BaseParser):
-    """Minimal Enel parser placeholder."""
-
-    def extract(self, text: str) -> dict:
-        """Extract normalized energy bill data."""
-        return {
-            "energia_injetada_kwh": "",
-            "energia_injetada_valor": "",
-            "consumo_kwh": "",
-            "preco_unitario": "",
-        }
+class EnelParser(ItemizedBillParser):
+    """
+    Enel DANF3E ("Consumo Uso Sistema [KWh]-TUSD", "Consumo - TE",
+    "Energia Injetada TUSD/TE" rows), parsed by regex only.
+    """
@@ -0,0 +1,129 @@
+"""Deterministic parser for the item table of DANF3E invoices (TUSD/TE split)."""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List
+
+from app.core.services import processamento_energisa as processamento
+
+from .base import BaseParser
+
+_NUMERO = r"\d[\d.]*(?:,\d+)?"
+# Unit + quantity, unit price and value columns of a kWh row. Text extraction joins each
+# page into one line, so rows are anchored on these columns and the description is the
+# run of text (without digits, at most JANELA_DESCRICAO chars) right before them.
+_RE_COLUNAS = re.compile(
+    rf"\bKWH\s+(?P<quantidade>{_NUMERO})\s+(?P<preco>\d+,\d+)\s+(?P<valor>-?{_NUMERO}-?)",
+    re.IGNORECASE,
+)
+_RE_DIGITO = re.compile(r"\d")
+JANELA_DESCRICAO = 60
+_RE_INJETADA = re.compile(r"\bINJ", re.IGNORECASE)
+_RE_CONSUMO = re.compile(r"\bCONSUMO\b", re.IGNORECASE)
+_RE_INSTALACAO = re.compile(r"INSTALA[ÇC][ÃA]O\W{0,5}(\d{6,12})", re.IGNORECASE)
+_RE_VENCIMENTO = re.compile(r"VENCIMENTO\W{0,5}(\d{2}/\d{2}/\d{4})", re.IGNORECASE)
+_RE_REFERENCIA = re.compile(
+    r"(?:REFER[ÊE]NCIA|M[ÊE]S/ANO|REF\.?:)\W{0,5}"
+    r"((?:JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ)[A-Z]*\s?/\s?\d{4}|\d{2}/\d{4})",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ItemFatura:
+    """One kWh row of the item table; `valor` is signed (credits are negative)."""
+
+    descricao: str
+    quantidade: float
+    preco: float
+    valor: float
+
+    @property
+    def componente(self) -> str:
+        """Tariff component of the row: TUSD, TE or "" when the row is not split."""
+        descricao = self.descricao.upper()
+        if "TUSD" in descricao:
+            return "TUSD"
+        if re.search(r"\bTE\b", descricao):
+            return "TE"
+        return ""
+
+
+def _descricao(text: str, fim: int) -> str:
+    inicio = max(0, fim - JANELA_DESCRICAO)
+    trecho = _RE_DIGITO.split(text[inicio:fim])
+    descricao = trecho[-1]
+    if len(trecho) == 1 and inicio > 0:
+        # Window cut mid-text: drop the (possibly partial) first word.
+        descricao = descricao.partition(" ")[2]
+    return " ".join(descricao.split()).lstrip(",.;:-/()[]$R ")
+
+
+def extrair_itens(text: str) -> List[ItemFatura]:
+    """Every kWh row of the item table, in document order."""
+    text = text or ""
+    itens = []
+    for m in _RE_COLUNAS.finditer(text):
+        valor = m.group("valor")
+        negativo = valor.startswith("-") or valor.endswith("-")
+        itens.append(ItemFatura(
+            descricao=_descricao(text, m.start()),
+            quantidade=processamento.br_to_float(m.group("quantidade")),
+            preco=processamento.br_to_float(m.group("preco")),
+            valor=-abs(processamento.br_to_float(valor.strip("-"))) if negativo else processamento.br_to_float(valor),
+        ))
+    return itens
+
+
+def _kwh(itens: List[ItemFatura]) -> float:
+    """kWh of a group of rows without double counting the TUSD and TE rows of the same energy."""
+    for componente in ("TUSD", "TE"):
+        do_componente = [item for item in itens if item.componente == componente]
+        if do_componente:
+            return sum(item.quantidade for item in do_componente)
+    return sum(item.quantidade for item in itens)
+
+
+def _preco(itens: List[ItemFatura]) -> float:
+    """Full R$/kWh: TUSD + TE prices of the first consumption pair, or the single price."""
+    precos: Dict[str, float] = {}
+    for item in itens:
+        precos.setdefault(item.componente, item.preco)
+    if "TUSD" in precos or "TE" in precos:
+        return precos.get("TUSD", 0.0) + precos.get("TE", 0.0)
+    return precos.get("", 0.0)
+
+
+class ItemizedBillParser(BaseParser):
+    """
+    Regex-only parser for distributors whose DANF3E lists consumption and
+    injected energy as kWh rows, usually split into TUSD and TE. Consumption
+    rows mention "Consumo"; injected energy rows mention "Inj" (Injetada,
+    Inj.) and carry negative values. No LLM call is involved.
+    """
+
+    def extract(self, text: str) -> dict:
+        """Extract normalized energy bill data."""
+        texto = text or ""
+        itens = extrair_itens(texto)
+        injetados = [item for item in itens if _RE_INJETADA.search(item.descricao)]
+        consumos = [item for item in itens if _RE_CONSUMO.search(item.descricao) and item not in injetados]
+
+        consumo_kwh = _kwh(consumos)
+        preco = _preco(consumos)
+        injetada_kwh = _kwh(injetados)
+        injetada_valor = sum(abs(item.valor) for item in injetados)
+
+        def _campo(regex: re.Pattern) -> str:
+            m = regex.search(texto)
+            return m.group(1) if m else ""
+
+        return {
+            "energia_injetada_kwh": processamento.float_to_br(injetada_kwh) if injetada_kwh > 0 else "",
+            "energia_injetada_valor": processamento.float_to_br(injetada_valor) if injetada_valor > 0 else "",
+            "consumo_kwh": processamento.float_to_br(consumo_kwh) if consumo_kwh > 0 else "",
+            "preco_unitario": processamento.float_to_br(preco, 6) if preco > 0 else "",
+            "codigo_do_cliente_uc": _campo(_RE_INSTALACAO),
+            "mes_referencia": _campo(_RE_REFERENCIA).upper().replace(" ", ""),
+            "data_de_vencimento": _campo(_RE_VENCIMENTO),
+        }
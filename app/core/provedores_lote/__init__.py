@@ -0,0 +1 @@
+"""Provider-side batch LLM processing (offline mode)."""
@@ -0,0 +1,30 @@
+"""Base classes for provider-side batch LLM processing."""
+
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+STATUS_EM_ANDAMENTO = "em_andamento"
+STATUS_CONCLUIDO = "concluido"
+STATUS_FALHOU = "falhou"
+
+
+class BaseProvedorLote:
+    """
+    Submits a JSONL file of chat-completion requests and hands back the answers later.
+    Request and result lines follow the OpenAI Batch API format, so every provider
+    (including the local stand-in) is ingested by the same code.
+    """
+
+    name = ""
+
+    def enviar(self, arquivo: Path) -> str:
+        """Submit the request file and return the provider's batch id."""
+        raise NotImplementedError
+
+    def consultar(self, lote_id: str) -> str:
+        """Return STATUS_EM_ANDAMENTO, STATUS_CONCLUIDO or STATUS_FALHOU."""
+        raise NotImplementedError
+
+    def resultados(self, lote_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield one result line (already decoded) per request of a finished batch."""
+        raise NotImplementedError
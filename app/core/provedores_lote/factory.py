@@ -0,0 +1,19 @@
+"""Factory for batch LLM providers."""
+
+from django.conf import settings
+
+from .base import BaseProvedorLote
+from .local import LocalProvedorLote
+from .openai_batch import OpenAIProvedorLote
+
+PROVEDORES = {
+    OpenAIProvedorLote.name: OpenAIProvedorLote,
+    LocalProvedorLote.name: LocalProvedorLote,
+}
+
+
+def get_provedor_lote(nome: str = "") -> BaseProvedorLote:
+    """Return a batch provider instance. Priority: explicit name, LLM_LOTE_PROVEDOR, openai."""
+    nome = (nome or getattr(settings, "LLM_LOTE_PROVEDOR", "") or OpenAIProvedorLote.name).strip().lower()
+    classe = PROVEDORES.get(nome, OpenAIProvedorLote)
+    return classe()
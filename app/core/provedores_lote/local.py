@@ -0,0 +1,75 @@
+"""File-based stand-in for the batch provider, for offline development and tests."""
+
+import json
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator
+
+from django.conf import settings
+
+from .base import STATUS_CONCLUIDO, STATUS_FALHOU, BaseProvedorLote
+
+Respondedor = Callable[[Dict[str, Any]], str]
+
+
+def responder_vazio(corpo: Dict[str, Any]) -> str:
+    """Answers every request with an empty JSON object; the result then comes from the regex hints."""
+    return "{}"
+
+
+class LocalProvedorLote(BaseProvedorLote):
+    """
+    Each batch is a folder under LLM_LOTE_DIRETORIO holding input.jsonl.
+    The first status check answers every line with `respondedor` and writes
+    output.jsonl in the OpenAI Batch format, so the batch completes on the next poll.
+    """
+
+    name = "local"
+
+    def __init__(self, diretorio: str | Path | None = None, respondedor: Respondedor | None = None):
+        self.diretorio = Path(diretorio or settings.LLM_LOTE_DIRETORIO)
+        self.respondedor = respondedor or responder_vazio
+
+    def _pasta(self, lote_id: str) -> Path:
+        return self.diretorio / lote_id
+
+    def enviar(self, arquivo: Path) -> str:
+        lote_id = f"lote_local_{uuid.uuid4().hex}"
+        pasta = self._pasta(lote_id)
+        pasta.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(arquivo, pasta / "input.jsonl")
+        return lote_id
+
+    def consultar(self, lote_id: str) -> str:
+        pasta = self._pasta(lote_id)
+        if not (pasta / "input.jsonl").exists():
+            return STATUS_FALHOU
+        if not (pasta / "output.jsonl").exists():
+            self._executar(pasta)
+        return STATUS_CONCLUIDO
+
+    def _executar(self, pasta: Path) -> None:
+        with open(pasta / "input.jsonl", encoding="utf-8") as entrada, \
+                open(pasta / "output.jsonl", "w", encoding="utf-8") as saida:
+            for numero, linha in enumerate(entrada):
+                if not linha.strip():
+                    continue
+                requisicao = json.loads(linha)
+                resultado = {"id": f"req_{numero}", "custom_id": requisicao.get("custom_id"), "error": None}
+                try:
+                    conteudo = self.respondedor(requisicao.get("body") or {})
+                except Exception as exc:
+                    resultado.update(response=None, error={"code": "erro_local", "message": str(exc)})
+                else:
+                    resultado["response"] = {
+                        "status_code": 200,
+                        "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}}]},
+                    }
+                saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+    def resultados(self, lote_id: str) -> Iterator[Dict[str, Any]]:
+        with open(self._pasta(lote_id) / "output.jsonl", encoding="utf-8") as fh:
+            for linha in fh:
+                if linha.strip():
+                    yield json.loads(linha)
@@ -0,0 +1,58 @@
+"""OpenAI Batch API provider."""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+from .base import STATUS_CONCLUIDO, STATUS_EM_ANDAMENTO, STATUS_FALHOU, BaseProvedorLote
+
+ENDPOINT = "/v1/chat/completions"
+JANELA_CONCLUSAO = "24h"
+_STATUS_FALHA = {"failed", "expired", "cancelled", "cancelling"}
+
+
+class OpenAIProvedorLote(BaseProvedorLote):
+    """Uploads the request file and polls /v1/batches until the output file is ready."""
+
+    name = "openai"
+
+    def __init__(self, client: Any = None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            from app.core.services.processamento_energisa import OPENAI_API_KEY
+
+            self._client = OpenAI(api_key=OPENAI_API_KEY or None)
+        return self._client
+
+    def enviar(self, arquivo: Path) -> str:
+        with open(arquivo, "rb") as fh:
+            enviado = self.client.files.create(file=fh, purpose="batch")
+        lote = self.client.batches.create(
+            input_file_id=enviado.id,
+            endpoint=ENDPOINT,
+            completion_window=JANELA_CONCLUSAO,
+        )
+        return lote.id
+
+    def consultar(self, lote_id: str) -> str:
+        status = self.client.batches.retrieve(lote_id).status
+        if status == "completed":
+            return STATUS_CONCLUIDO
+        if status in _STATUS_FALHA:
+            return STATUS_FALHOU
+        return STATUS_EM_ANDAMENTO
+
+    def resultados(self, lote_id: str) -> Iterator[Dict[str, Any]]:
+        lote = self.client.batches.retrieve(lote_id)
+        # Requisições que falharam vão para o arquivo de erros, no mesmo formato.
+        for file_id in (lote.output_file_id, lote.error_file_id):
+            if not file_id:
+                continue
+            for linha in self.client.files.content(file_id).text.splitlines():
+                if linha.strip():
+                    yield json.loads(linha)
@@ -0,0 +1,112 @@
+"""
+Cache em memória dos recursos embutidos no HTML das faturas.
+
+O QR code PIX do cliente vira data URI (arquivo lido e codificado em base64) e
+as logos estáticas viram URLs resolvidas no manifesto do staticfiles. Em um
+lote as mesmas imagens se repetem em toda fatura, então o resultado fica
+guardado no processo: data URIs pela chave caminho + mtime + tamanho (arquivo
+trocado em disco gera entrada nova) e URLs estáticas pelo caminho. O total de
+bytes guardados é limitado por CACHE_ATIVOS_MAX_BYTES, descartando os menos
+usados. Acertos e faltas entram nos contadores de `metricas`.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+from app.core.services import metricas
+
+logger = logging.getLogger(__name__)
+
+MIMES = {'.png': 'image/png', '.gif': 'image/gif', '.svg': 'image/svg+xml', '.webp': 'image/webp'}
+
+_lock = threading.Lock()
+_data_uris: OrderedDict[Tuple[str, int, int], str] = OrderedDict()
+_bytes_guardados = 0
+_urls_estaticas: Dict[str, str] = {}
+
+
+def _incrementar(nome: str) -> None:
+    metricas.incrementar(f'cache_ativos_{nome}')
+
+
+def _limite_bytes() -> int:
+    return int(getattr(settings, 'CACHE_ATIVOS_MAX_BYTES', 8 * 1024 * 1024))
+
+
+def data_uri(caminho: str) -> str:
+    """Data URI do arquivo local (vazio se não existir ou falhar a leitura), lido e codificado uma vez por versão."""
+    global _bytes_guardados
+    if not caminho:
+        return ''
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return ''
+    chave = (caminho, estado.st_mtime_ns, estado.st_size)
+    with _lock:
+        uri = _data_uris.get(chave)
+        if uri is not None:
+            _data_uris.move_to_end(chave)
+    if uri is not None:
+        _incrementar('hits')
+        return uri
+
+    _incrementar('misses')
+    mime = MIMES.get(os.path.splitext(caminho)[1].lower(), 'image/jpeg')
+    try:
+        with open(caminho, 'rb') as fh:
+            uri = f"data:{mime};base64,{base64.b64encode(fh.read()).decode('ascii')}"
+    except OSError:
+        logger.warning('Não foi possível ler %s para embutir na fatura', caminho)
+        return ''
+
+    limite = _limite_bytes()
+    if len(uri) > limite:
+        return uri
+    with _lock:
+        # Versões antigas do mesmo arquivo não voltam a ser pedidas.
+        for antiga in [c for c in _data_uris if c[0] == caminho]:
+            _bytes_guardados -= len(_data_uris.pop(antiga))
+        _data_uris[chave] = uri
+        _bytes_guardados += len(uri)
+        while _bytes_guardados > limite:
+            _, descartada = _data_uris.popitem(last=False)
+            _bytes_guardados -= len(descartada)
+    return uri
+
+
+def url_estatica(caminho: str) -> str:
+    """URL (relativa) do arquivo estático, preferindo a versão com hash do manifesto."""
+    with _lock:
+        url = _urls_estaticas.get(caminho)
+    if url is not None:
+        _incrementar('hits')
+        return url
+
+    _incrementar('misses')
+    try:
+        url = staticfiles_storage.url(caminho)
+    except Exception:
+        # Sem entrada no manifesto: não guarda, para pegar o arquivo quando o collectstatic rodar.
+        return f"{settings.STATIC_URL}{caminho}" if settings.STATIC_URL else ''
+    with _lock:
+        _urls_estaticas[caminho] = url
+    return url
+
+
+def limpar() -> None:
+    """Esvazia o cache deste processo."""
+    global _bytes_guardados
+    with _lock:
+        _data_uris.clear()
+        _urls_estaticas.clear()
+        _bytes_guardados = 0
@@ -0,0 +1,117 @@
+"""
+Cache de resultados de `processar_pdf` endereçado pelo conteúdo.
+
+A chave combina o SHA-256 dos bytes do PDF, o hash das diretrizes do cliente
+(prompt_template), o modelo da OpenAI e o modo de extração, de modo que o reenvio da mesma fatura
+com as mesmas instruções não paga de novo a extração nem a chamada à IA.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Union
+
+from django.core.cache import caches
+
+from app.core.models import Cliente
+from app.core.services import metricas
+from app.core.services import processamento_energisa as processamento
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = "faturas"
+VERSAO_CHAVE = "v2"
+
+_contadores = {"hits": 0, "misses": 0}
+_contadores_lock = threading.Lock()
+
+
+def _incrementar(nome: str) -> None:
+    with _contadores_lock:
+        _contadores[nome] += 1
+    metricas.incrementar(f"cache_faturas_{nome}")
+
+
+def estatisticas() -> Dict[str, int]:
+    """Retorna os contadores de acertos/faltas do cache neste processo."""
+    with _contadores_lock:
+        return dict(_contadores)
+
+
+def sha256_pdf(pdf: Union[str, Path, IO[bytes]]) -> str:
+    """Calcula o SHA-256 do PDF lendo em blocos; arquivos abertos voltam para o início."""
+    digest = hashlib.sha256()
+    if hasattr(pdf, "read"):
+        pdf.seek(0)
+        for bloco in iter(lambda: pdf.read(1024 * 1024), b""):
+            digest.update(bloco)
+        pdf.seek(0)
+    else:
+        with open(pdf, "rb") as fh:
+            for bloco in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(bloco)
+    return digest.hexdigest()
+
+
+def chave_cache(
+    pdf_sha256: str,
+    prompt_extra: str = "",
+    modelo: str = "",
+    modo_extracao: str = Cliente.MODO_EXTRACAO_IA,
+) -> str:
+    prompt_hash = hashlib.sha256((prompt_extra or "").encode("utf-8")).hexdigest()
+    modelo = modelo or processamento.OPENAI_MODEL
+    return f"fatura:{VERSAO_CHAVE}:{modelo}:{modo_extracao}:{pdf_sha256}:{prompt_hash}"
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def consultar(chave: str) -> Dict[str, Any] | None:
+    """Resultado guardado para a chave (cópia), ou None; contabiliza acerto/falta."""
+    try:
+        resultado = _cache().get(chave)
+    except Exception:
+        logger.exception("Falha ao consultar o cache de faturas")
+        resultado = None
+
+    if resultado is None:
+        _incrementar("misses")
+        return None
+    _incrementar("hits")
+    return copy.deepcopy(resultado)
+
+
+def gravar(chave: str, resultado: Dict[str, Any]) -> None:
+    try:
+        _cache().set(chave, resultado)
+    except Exception:
+        logger.exception("Falha ao gravar no cache de faturas")
+
+
+def obter_ou_processar(
+    pdf_path: Union[str, Path, IO[bytes]],
+    prompt_extra: str,
+    processar: Callable[[], Dict[str, Any]],
+    pdf_sha256: str = "",
+    modo_extracao: str = Cliente.MODO_EXTRACAO_IA,
+) -> Dict[str, Any]:
+    """
+    Retorna o resultado consolidado do cache ou executa `processar` em caso de falta.
+    O cache é consultado antes de qualquer extração; falhas do backend nunca
+    interrompem o processamento.
+    """
+    chave = chave_cache(pdf_sha256 or sha256_pdf(pdf_path), prompt_extra, modo_extracao=modo_extracao)
+
+    resultado = consultar(chave)
+    if resultado is not None:
+        return resultado
+
+    resultado = processar()
+    gravar(chave, resultado)
+    return resultado
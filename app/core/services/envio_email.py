@@ -0,0 +1,166 @@
+"""
+Envio das faturas por e-mail em lote.
+
+Cada worker abre uma única conexão SMTP e manda por ela todas as mensagens da
+sua fatia (`send_messages`, uma mensagem por vez para saber o resultado de cada
+contato). As mensagens que o SMTP não entregar vão pelo SendGrid, com um único
+cliente para o lote inteiro. Até EMAIL_ENVIO_CONCORRENCIA workers trabalham ao
+mesmo tempo; o resultado volta por contato, na ordem recebida.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, List, Sequence
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+logger = logging.getLogger(__name__)
+
+CANAL_SMTP = 'smtp'
+CANAL_SENDGRID = 'sendgrid'
+
+
+@dataclass
+class EnvioEmail:
+    """Um e-mail a enviar: destinatário, textos e o anexo (nome, conteúdo, tipo)."""
+
+    contato_id: Any
+    contato_nome: str
+    email: str
+    assunto: str
+    corpo: str
+    anexo_nome: str
+    anexo: str | bytes
+    anexo_tipo: str = 'text/html'
+
+
+@dataclass
+class ResultadoEnvio:
+    """Resultado por contato; `smtp_indisponivel` indica que o SMTP nem respondeu."""
+
+    contato_id: Any
+    contato_nome: str
+    enviado: bool = False
+    canal: str = ''
+    erros: List[str] = field(default_factory=list)
+    smtp_indisponivel: bool = False
+
+
+class _ClienteSendGrid:
+    """Cliente do SendGrid criado na primeira necessidade e compartilhado pelos workers do lote."""
+
+    def __init__(self):
+        self.api_key = os.getenv('SENDGRID_API_KEY', '').strip()
+        self.from_email = os.getenv('SENDGRID_FROM_EMAIL', '').strip() or settings.DEFAULT_FROM_EMAIL
+        self._cliente = None
+        self._lock = threading.Lock()
+
+    def _obter(self):
+        with self._lock:
+            if self._cliente is None:
+                from sendgrid import SendGridAPIClient  # type: ignore
+
+                self._cliente = SendGridAPIClient(self.api_key)
+            return self._cliente
+
+    def enviar(self, envio: EnvioEmail, resultado: ResultadoEnvio) -> None:
+        if not self.api_key:
+            return
+        try:
+            from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition  # type: ignore
+
+            message = Mail(
+                from_email=self.from_email,
+                to_emails=envio.email,
+                subject=envio.assunto,
+                html_content=envio.corpo.replace('\n', '<br>'),
+            )
+            bruto = envio.anexo.encode('utf-8') if isinstance(envio.anexo, str) else envio.anexo
+            message.attachment = Attachment(
+                FileContent(base64.b64encode(bruto).decode()),
+                FileName(envio.anexo_nome),
+                FileType(envio.anexo_tipo),
+                Disposition('attachment'),
+            )
+            self._obter().send(message)
+            resultado.enviado = True
+            resultado.canal = CANAL_SENDGRID
+        except ImportError:
+            logger.warning('SendGrid não instalado; adicione sendgrid ao requirements.')
+        except Exception as exc:
+            logger.exception('Erro ao enviar fatura via SendGrid para contato %s', envio.contato_id)
+            resultado.erros.append(f'SendGrid: {exc}')
+
+
+def _mensagem(envio: EnvioEmail, conexao) -> EmailMessage:
+    mensagem = EmailMessage(
+        subject=envio.assunto,
+        body=envio.corpo,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[envio.email],
+        connection=conexao,
+    )
+    mensagem.attach(envio.anexo_nome, envio.anexo, envio.anexo_tipo)
+    return mensagem
+
+
+def _enviar_fatia(envios: Sequence[EnvioEmail], resultados: Sequence[ResultadoEnvio], sendgrid: _ClienteSendGrid) -> None:
+    """Envia uma fatia do lote por uma única conexão SMTP; o que falhar segue para o SendGrid."""
+    conexao = get_connection(timeout=settings.EMAIL_ENVIO_TIMEOUT)
+    try:
+        conexao.open()
+        aberta = True
+    except (socket.gaierror, socket.timeout, OSError) as exc:
+        # SMTP indisponível: não bloquear o fluxo, apenas avisar
+        logger.warning('SMTP indisponível para %d contato(s): %s', len(envios), exc)
+        for resultado in resultados:
+            resultado.smtp_indisponivel = True
+        aberta = False
+
+    try:
+        for envio, resultado in zip(envios, resultados):
+            if aberta:
+                try:
+                    if conexao.send_messages([_mensagem(envio, conexao)]):
+                        resultado.enviado = True
+                        resultado.canal = CANAL_SMTP
+                        continue
+                except (socket.gaierror, socket.timeout, OSError) as exc:
+                    logger.warning('SMTP indisponível para contato %s: %s', envio.contato_id, exc)
+                    resultado.smtp_indisponivel = True
+                except BaseException as exc:
+                    # Captura SystemExit (gunicorn aborta worker) e demais erros de SMTP, mas não deixa pendurar
+                    logger.exception('Erro ao enviar fatura por e-mail para contato %s', envio.contato_id)
+                    resultado.erros.append(f'SMTP: {exc}')
+            sendgrid.enviar(envio, resultado)
+    finally:
+        if aberta:
+            try:
+                conexao.close()
+            except Exception:
+                logger.debug('Falha ao fechar a conexão SMTP', exc_info=True)
+
+
+def enviar_emails(envios: Sequence[EnvioEmail], max_workers: int | None = None) -> List[ResultadoEnvio]:
+    """Envia os e-mails e retorna um ResultadoEnvio por envio, na mesma ordem."""
+    resultados = [ResultadoEnvio(envio.contato_id, envio.contato_nome) for envio in envios]
+    if not envios:
+        return resultados
+    workers = max(1, min(max_workers or settings.EMAIL_ENVIO_CONCORRENCIA, len(envios)))
+    sendgrid = _ClienteSendGrid()
+    fatias = [(envios[i::workers], resultados[i::workers]) for i in range(workers)]
+    if workers == 1:
+        _enviar_fatia(*fatias[0], sendgrid)
+        return resultados
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='envio-email') as executor:
+        for futuro in [executor.submit(_enviar_fatia, fatia, resultado, sendgrid) for fatia, resultado in fatias]:
+            futuro.result()
+    return resultados
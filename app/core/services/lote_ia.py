@@ -0,0 +1,46 @@
+"""
+Formato das requisições e respostas do modo offline (API de lotes do provedor da IA).
+
+Cada fatura que precisa da IA vira uma linha JSONL com o mesmo prompt da chamada
+direta; a resposta volta depois pelo `custom_id` e passa pelo mesmo pós-processamento.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+from app.core.provedores_lote.openai_batch import ENDPOINT
+from app.core.services import processamento_energisa as processamento
+
+
+def linha_requisicao(custom_id: str, prompt: str) -> Dict[str, Any]:
+    """Requisição de chat completion no formato da API de lotes, com os parâmetros da chamada direta."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": processamento.OPENAI_MODEL,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": [{"role": "user", "content": prompt}],
+        },
+    }
+
+
+def escrever_requisicoes(linhas: Iterable[Dict[str, Any]], destino: Path) -> Path:
+    with open(destino, "w", encoding="utf-8") as fh:
+        for linha in linhas:
+            fh.write(json.dumps(linha, ensure_ascii=False) + "\n")
+    return destino
+
+
+def conteudo_resposta(linha: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON devolvido pela IA em uma linha de resultado; levanta RuntimeError se a requisição falhou."""
+    erro = linha.get("error")
+    resposta = linha.get("response") or {}
+    if erro or resposta.get("status_code") != 200:
+        mensagem = (erro or {}).get("message") or f"status {resposta.get('status_code')}"
+        raise RuntimeError(f"A IA não respondeu esta fatura no lote: {mensagem}")
+    conteudo = resposta["body"]["choices"][0]["message"]["content"]
+    return json.loads(conteudo)
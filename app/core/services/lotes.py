@@ -0,0 +1,420 @@
+"""Fila de lotes de faturas processados fora da requisição HTTP."""
+
+import logging
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app.core.calculos.factory import diretrizes_do_cliente
+from app.core.models import ArquivoLote, Cliente, CreditHistory, FaturaProcessada, LoteProcessamento
+from app.core.provedores_lote.base import STATUS_CONCLUIDO, STATUS_EM_ANDAMENTO
+from app.core.provedores_lote.factory import get_provedor_lote
+from app.core.services import cache_faturas, lote_ia, metricas
+from app.core.services import processamento_energisa as processamento
+from app.core.services.cache_faturas import obter_ou_processar
+from app.core.services.processamento_fatura import (
+    extrair_e_detectar,
+    processador_da_concessionaria,
+    processar_fatura,
+)
+from app.core.services.renderizacao import RenderizadorFatura
+
+logger = logging.getLogger(__name__)
+
+
+def criar_lote(cliente, files, base_url: str = '', modo: str = LoteProcessamento.MODO_INTERATIVO) -> LoteProcessamento:
+    """Persiste o lote e os PDFs enviados para que o worker os processe depois."""
+    with transaction.atomic():
+        lote = LoteProcessamento.objects.create(cliente=cliente, base_url=base_url or '', modo=modo)
+        for ordem, f in enumerate(files):
+            nome_original = Path(f.name).name or 'fatura.pdf'
+            # Uploads do FaturaUploadHandler já chegam com o SHA-256 e são movidos, sem cópia, para o storage.
+            arquivo = ArquivoLote(lote=lote, ordem=ordem, nome_original=nome_original, sha256=getattr(f, 'sha256', ''))
+            arquivo.pdf.save(nome_original, f, save=False)
+            arquivo.save()
+    return lote
+
+
+def reservar_proximo_lote():
+    """
+    Marca o lote pendente mais antigo como 'processando' e o retorna.
+    O UPDATE condicional garante que dois workers não peguem o mesmo lote.
+    """
+    pendentes = LoteProcessamento.objects.filter(
+        status=LoteProcessamento.STATUS_PENDENTE,
+    ).order_by('created_at').values_list('pk', flat=True)
+    for pk in pendentes[:10]:
+        reservado = LoteProcessamento.objects.filter(
+            pk=pk,
+            status=LoteProcessamento.STATUS_PENDENTE,
+        ).update(status=LoteProcessamento.STATUS_PROCESSANDO, iniciado_em=timezone.now())
+        if reservado:
+            return LoteProcessamento.objects.select_related('cliente').get(pk=pk)
+    return None
+
+
+@contextmanager
+def _abrir_pdf(arquivo: ArquivoLote):
+    """
+    Entrega o caminho do PDF quando o storage é local, para o extrator abrir o
+    arquivo direto do disco; em storages remotos, entrega o arquivo aberto.
+    """
+    try:
+        caminho = arquivo.pdf.path
+    except NotImplementedError:
+        with arquivo.pdf.open('rb') as fh:
+            yield fh
+    else:
+        yield caminho
+
+
+def _extrair_dados(arquivo: ArquivoLote, cliente):
+    """
+    Etapa pesada (PDF + IA); roda nas threads do pool. Marca o arquivo como em
+    andamento quando a thread o pega (os que esperam vaga no pool seguem
+    pendentes); a publicação das métricas e o cache de faturas (cache 'banco')
+    também usam o banco, então a conexão aberta pela thread é fechada ao final.
+    """
+    prompt_extra = cliente.prompt_template or ""
+    try:
+        ArquivoLote.objects.filter(pk=arquivo.pk).update(status=ArquivoLote.STATUS_PROCESSANDO, updated_at=timezone.now())
+        with _abrir_pdf(arquivo) as pdf:
+            return obter_ou_processar(
+                pdf,
+                prompt_extra,
+                lambda: processar_fatura(pdf, cliente).get('dados') or {},
+                pdf_sha256=arquivo.sha256,
+                modo_extracao=cliente.modo_extracao,
+            )
+    finally:
+        connection.close()
+
+
+def _registrar_erro(arquivo: ArquivoLote, exc: Exception) -> None:
+    logger.error('Erro ao processar fatura %s', arquivo.nome_original, exc_info=exc)
+    metricas.incrementar('faturas_com_erro')
+    arquivo.status = ArquivoLote.STATUS_ERRO
+    arquivo.erro = str(exc)
+    arquivo.save(update_fields=['status', 'erro', 'updated_at'])
+
+
+def _registrar_fatura(arquivo: ArquivoLote, parsed: Dict[str, Any], cliente, renderizador: RenderizadorFatura) -> bool:
+    """Renderiza o JSON consolidado e vincula a fatura gerada ao arquivo."""
+    try:
+        html, nome_para_arquivo = renderizador.renderizar(parsed, cliente)
+    except Exception as exc:
+        _registrar_erro(arquivo, exc)
+        return False
+
+    fatura = FaturaProcessada(
+        cliente=cliente,
+        nome=f'{Path(arquivo.nome_original).stem or "fatura"}.html',
+        original_name=arquivo.nome_original,
+        contact_name=nome_para_arquivo or '',
+    )
+    fatura.html = html
+    fatura.save()
+
+    arquivo.status = ArquivoLote.STATUS_PROCESSADO
+    arquivo.fatura = fatura
+    arquivo.save(update_fields=['status', 'fatura', 'updated_at'])
+    metricas.incrementar('faturas_processadas')
+    return True
+
+
+def _processar_arquivo(arquivo: ArquivoLote, futuro: Future, cliente, renderizador: RenderizadorFatura) -> bool:
+    try:
+        parsed = futuro.result()
+    except Exception as exc:
+        _registrar_erro(arquivo, exc)
+        return False
+    return _registrar_fatura(arquivo, parsed, cliente, renderizador)
+
+
+def _debitar_creditos(lote: LoteProcessamento, quantidade: int) -> None:
+    """Debita os créditos apenas pelas faturas geradas."""
+    if quantidade <= 0:
+        return
+    cliente = lote.cliente
+    try:
+        with transaction.atomic():
+            cliente.refresh_from_db(fields=['saldo_atual'])
+            debit = Decimal(quantidade)
+            cliente.saldo_atual = Decimal(cliente.saldo_atual or 0) - debit
+            cliente.saldo_final = cliente.saldo_atual
+            cliente.valor_credito = Decimal('0')
+            cliente.save(update_fields=['saldo_atual', 'saldo_final', 'valor_credito'])
+            CreditHistory.objects.create(
+                cliente=cliente,
+                amount=-debit,
+                balance_after=cliente.saldo_atual,
+                description=f'Débito por processamento de {quantidade} fatura(s)',
+            )
+    except Exception:
+        logger.exception('Falha ao debitar créditos do cliente %s', cliente.id)
+
+
+def _concluir_lote(lote: LoteProcessamento) -> None:
+    """Debita as faturas geradas, descarta os PDFs e os dados intermediários e encerra o lote."""
+    _debitar_creditos(lote, lote.arquivos.filter(status=ArquivoLote.STATUS_PROCESSADO).count())
+
+    # O PDF original não é mais necessário depois de processado.
+    for arquivo in lote.arquivos.exclude(pdf='').exclude(pdf__isnull=True):
+        arquivo.pdf.delete(save=False)
+        arquivo.save(update_fields=['pdf'])
+    lote.arquivos.filter(dados_extracao__isnull=False).update(dados_extracao=None)
+
+    lote.status = LoteProcessamento.STATUS_CONCLUIDO
+    lote.concluido_em = timezone.now()
+    lote.save(update_fields=['status', 'concluido_em', 'updated_at'])
+
+
+def interromper_lote(lote: LoteProcessamento, motivo: str) -> None:
+    """
+    Encerra o lote que não pôde terminar: as faturas ainda pendentes ou em
+    andamento viram erro com `motivo` e as já geradas são debitadas normalmente.
+    """
+    interrompidos = lote.arquivos.filter(
+        status__in=[ArquivoLote.STATUS_PENDENTE, ArquivoLote.STATUS_PROCESSANDO],
+    ).update(status=ArquivoLote.STATUS_ERRO, erro=motivo, updated_at=timezone.now())
+    logger.warning('Lote %s interrompido (%d fatura(s) sem resultado): %s', lote.pk, interrompidos, motivo)
+    if interrompidos:
+        metricas.incrementar('faturas_com_erro', interrompidos)
+    _concluir_lote(lote)
+
+
+def recuperar_lotes_travados() -> int:
+    """
+    Encerra os lotes 'processando' sem atividade há mais de LOTE_PROCESSAMENTO_TIMEOUT
+    segundos (worker reiniciado ou morto no meio do lote). Atividade é o início do
+    lote, a última consulta ao provedor (modo offline) ou a gravação de qualquer
+    arquivo. Retorna quantos lotes foram encerrados.
+    """
+    segundos = int(getattr(settings, 'LOTE_PROCESSAMENTO_TIMEOUT', 3600) or 0)
+    if segundos <= 0:
+        return 0
+    agora = timezone.now()
+    limite = agora - timedelta(seconds=segundos)
+    travados = LoteProcessamento.objects.filter(
+        Q(iniciado_em__isnull=True) | Q(iniciado_em__lt=limite),
+        Q(lote_ia_consultado_em__isnull=True) | Q(lote_ia_consultado_em__lt=limite),
+        status=LoteProcessamento.STATUS_PROCESSANDO,
+    ).exclude(arquivos__updated_at__gte=limite).select_related('cliente').distinct()
+
+    recuperados = 0
+    for lote in travados:
+        # UPDATE condicional: só um worker encerra cada lote travado.
+        reservado = LoteProcessamento.objects.filter(
+            pk=lote.pk,
+            status=LoteProcessamento.STATUS_PROCESSANDO,
+            iniciado_em=lote.iniciado_em,
+        ).update(iniciado_em=agora)
+        if not reservado:
+            continue
+        interromper_lote(lote, 'O processamento foi interrompido antes do fim; envie a fatura novamente.')
+        recuperados += 1
+    return recuperados
+
+
+def processar_lote(lote: LoteProcessamento) -> None:
+    """Processa todos os PDFs do lote, isolando erros por arquivo."""
+    cliente = lote.cliente
+    if lote.status != LoteProcessamento.STATUS_PROCESSANDO:
+        lote.status = LoteProcessamento.STATUS_PROCESSANDO
+        lote.iniciado_em = timezone.now()
+        lote.save(update_fields=['status', 'iniciado_em', 'updated_at'])
+
+    if lote.modo == LoteProcessamento.MODO_OFFLINE:
+        enviar_lote_offline(lote)
+        return
+
+    renderizador = RenderizadorFatura(base_url=lote.base_url)
+    arquivos = list(lote.arquivos.filter(status=ArquivoLote.STATUS_PENDENTE).order_by('ordem'))
+    if arquivos:
+        # Mantém até LLM_MAX_CONCORRENCIA chamadas à IA em paralelo. Cada resultado é
+        # gravado assim que fica pronto; a ordem dos arquivos volta pelo campo `ordem`.
+        limite = max(1, int(getattr(settings, 'LLM_MAX_CONCORRENCIA', 1) or 1))
+        with ThreadPoolExecutor(max_workers=min(limite, len(arquivos))) as executor:
+            futuros = {executor.submit(_extrair_dados, arquivo, cliente): arquivo for arquivo in arquivos}
+            for futuro in as_completed(futuros):
+                _processar_arquivo(futuros[futuro], futuro, cliente, renderizador)
+
+    _concluir_lote(lote)
+
+
+# ===================================================================
+# MODO OFFLINE (API de lotes do provedor da IA)
+# ===================================================================
+
+def _preparar_arquivo_offline(arquivo: ArquivoLote, cliente) -> Tuple[Dict[str, Any] | None, Dict[str, Any] | None]:
+    """
+    Etapas locais de uma fatura do lote offline. Retorna (parsed, None) quando a
+    fatura já está resolvida (cache, concessionária sem IA ou dicas suficientes)
+    ou (None, requisicao) com a linha a enviar ao provedor; neste caso as dicas
+    ficam em `arquivo.dados_extracao` até a resposta chegar.
+    """
+    prompt_extra = cliente.prompt_template or ""
+    with _abrir_pdf(arquivo) as pdf:
+        chave = cache_faturas.chave_cache(
+            arquivo.sha256 or cache_faturas.sha256_pdf(pdf), prompt_extra, modo_extracao=cliente.modo_extracao,
+        )
+        parsed = cache_faturas.consultar(chave)
+        if parsed is not None:
+            return parsed, None
+
+        documento, concessionaria = extrair_e_detectar(pdf)
+        if processador_da_concessionaria(concessionaria) is not processamento.processar:
+            parsed = processar_fatura(pdf, cliente, documento=documento, concessionaria=concessionaria).get('dados') or {}
+        else:
+            permitir_sem_ia = cliente.modo_extracao == Cliente.MODO_EXTRACAO_AUTOMATICO
+            diretrizes = diretrizes_do_cliente(cliente)
+            texto, hints, dispensa_ia = processamento.preparar_leitura(
+                documento, diretrizes.instrucoes_livres, permitir_sem_ia,
+            )
+            if not dispensa_ia:
+                arquivo.dados_extracao = {'hints': hints, 'chave_cache': chave}
+                prompt = processamento.montar_prompt(texto, hints, diretrizes.instrucoes_livres)
+                return None, lote_ia.linha_requisicao(str(arquivo.pk), prompt)
+            parsed = processamento.consolidar_resultado(
+                {}, hints, processamento.CAMINHO_REGEX, diretrizes.politica,
+            )
+
+    cache_faturas.gravar(chave, parsed)
+    return parsed, None
+
+
+def enviar_lote_offline(lote: LoteProcessamento) -> None:
+    """
+    Resolve localmente as faturas que não precisam da IA e envia as demais ao
+    provedor em um único arquivo de lote. O lote fica 'aguardando_ia' até
+    `coletar_lotes_offline` ingerir as respostas.
+    """
+    cliente = lote.cliente
+    renderizador = RenderizadorFatura(base_url=lote.base_url)
+    requisicoes = []
+    aguardando = []
+    for arquivo in lote.arquivos.filter(status=ArquivoLote.STATUS_PENDENTE).order_by('ordem'):
+        arquivo.status = ArquivoLote.STATUS_PROCESSANDO
+        arquivo.save(update_fields=['status', 'updated_at'])
+        try:
+            parsed, requisicao = _preparar_arquivo_offline(arquivo, cliente)
+        except Exception as exc:
+            _registrar_erro(arquivo, exc)
+            continue
+        if requisicao is None:
+            _registrar_fatura(arquivo, parsed, cliente, renderizador)
+            continue
+        arquivo.save(update_fields=['dados_extracao', 'updated_at'])
+        requisicoes.append(requisicao)
+        aguardando.append(arquivo)
+
+    if not requisicoes:
+        _concluir_lote(lote)
+        return
+
+    provedor = get_provedor_lote()
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = lote_ia.escrever_requisicoes(requisicoes, Path(pasta) / f'lote_{lote.pk}.jsonl')
+            lote_ia_id = provedor.enviar(caminho)
+    except Exception as exc:
+        logger.exception('Falha ao enviar o lote %s ao provedor da IA', lote.pk)
+        for arquivo in aguardando:
+            _registrar_erro(arquivo, exc)
+        _concluir_lote(lote)
+        return
+
+    logger.info('Lote %s enviado ao provedor %s (%s): %d fatura(s)', lote.pk, provedor.name, lote_ia_id, len(aguardando))
+    lote.status = LoteProcessamento.STATUS_AGUARDANDO_IA
+    lote.lote_ia_provedor = provedor.name
+    lote.lote_ia_id = lote_ia_id
+    lote.lote_ia_consultado_em = timezone.now()
+    lote.save(update_fields=['status', 'lote_ia_provedor', 'lote_ia_id', 'lote_ia_consultado_em', 'updated_at'])
+
+
+def _ingerir_respostas(lote: LoteProcessamento, respostas: Dict[str, Dict[str, Any]], motivo_falta: str) -> None:
+    """Aplica às respostas do provedor o mesmo pós-processamento de `processar_pdf`."""
+    cliente = lote.cliente
+    politica = diretrizes_do_cliente(cliente).politica
+    renderizador = RenderizadorFatura(base_url=lote.base_url)
+    for arquivo in lote.arquivos.filter(status=ArquivoLote.STATUS_PROCESSANDO).order_by('ordem'):
+        dados = arquivo.dados_extracao or {}
+        try:
+            linha = respostas.get(str(arquivo.pk))
+            if linha is None:
+                raise RuntimeError(motivo_falta)
+            ia = lote_ia.conteudo_resposta(linha)
+            parsed = processamento.consolidar_resultado(
+                ia, dados.get('hints') or {}, processamento.CAMINHO_IA, politica,
+            )
+        except Exception as exc:
+            _registrar_erro(arquivo, exc)
+            continue
+        if dados.get('chave_cache'):
+            cache_faturas.gravar(dados['chave_cache'], parsed)
+        _registrar_fatura(arquivo, parsed, cliente, renderizador)
+    _concluir_lote(lote)
+
+
+def coletar_lotes_offline() -> int:
+    """
+    Consulta o provedor sobre os lotes offline e ingere os que terminaram.
+    Cada lote é consultado no máximo a cada LLM_LOTE_INTERVALO_CONSULTA segundos.
+    Retorna quantos lotes foram concluídos.
+    """
+    agora = timezone.now()
+    intervalo = timedelta(seconds=int(getattr(settings, 'LLM_LOTE_INTERVALO_CONSULTA', 60) or 0))
+    aguardando = LoteProcessamento.objects.filter(
+        Q(lote_ia_consultado_em__isnull=True) | Q(lote_ia_consultado_em__lte=agora - intervalo),
+        status=LoteProcessamento.STATUS_AGUARDANDO_IA,
+    ).select_related('cliente').order_by('created_at')
+
+    concluidos = 0
+    for lote in aguardando:
+        LoteProcessamento.objects.filter(pk=lote.pk).update(lote_ia_consultado_em=agora)
+        provedor = get_provedor_lote(lote.lote_ia_provedor)
+        try:
+            status = provedor.consultar(lote.lote_ia_id)
+            if status == STATUS_EM_ANDAMENTO:
+                continue
+            respostas = {}
+            if status == STATUS_CONCLUIDO:
+                respostas = {str(linha.get('custom_id')): linha for linha in provedor.resultados(lote.lote_ia_id)}
+        except Exception:
+            logger.exception('Falha ao consultar o lote %s no provedor da IA', lote.pk)
+            continue
+
+        # Mesmo UPDATE condicional de reservar_proximo_lote: um único worker ingere o lote.
+        reservado = LoteProcessamento.objects.filter(
+            pk=lote.pk,
+            status=LoteProcessamento.STATUS_AGUARDANDO_IA,
+        ).update(status=LoteProcessamento.STATUS_PROCESSANDO)
+        if not reservado:
+            continue
+
+        if status == STATUS_CONCLUIDO:
+            motivo_falta = 'O provedor da IA não devolveu resposta para esta fatura.'
+        else:
+            motivo_falta = 'O lote foi recusado ou expirou no provedor da IA.'
+        _ingerir_respostas(lote, respostas, motivo_falta)
+        concluidos += 1
+    return concluidos
+
+
+def limpar_faturas_antigas() -> int:
+    """Remove faturas processadas além do período de retenção (sessões já expiradas)."""
+    dias = int(getattr(settings, 'FATURAS_PROCESSADAS_RETENCAO_DIAS', 2) or 0)
+    if dias <= 0:
+        return 0
+    limite = timezone.now() - timedelta(days=dias)
+    removidas, _ = FaturaProcessada.objects.filter(created_at__lt=limite).delete()
+    return removidas
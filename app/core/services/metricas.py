@@ -0,0 +1,182 @@
+"""
+Métricas de desempenho do processamento de faturas.
+
+Cada etapa (extração, detecção, dicas, IA, pós-processamento e renderização)
+registra a duração de cada fatura em um histograma de faixas fixas; contadores
+acompanham eventos como faturas processadas, erros e acertos do cache.
+Os valores ficam em memória no processo e são publicados periodicamente no
+banco, uma linha por processo (MetricasProcesso), de onde o endpoint interno
+soma os processos ativos — o servidor web e os workers de lotes.
+"""
+
+from __future__ import annotations
+
+import copy
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+ETAPA_EXTRACAO = "extracao"
+ETAPA_DETECCAO = "deteccao"
+ETAPA_HINTS = "hints"
+ETAPA_IA = "ia"
+ETAPA_POS_PROCESSAMENTO = "pos_processamento"
+ETAPA_RENDERIZACAO = "renderizacao"
+ETAPAS = (
+    ETAPA_EXTRACAO,
+    ETAPA_DETECCAO,
+    ETAPA_HINTS,
+    ETAPA_IA,
+    ETAPA_POS_PROCESSAMENTO,
+    ETAPA_RENDERIZACAO,
+)
+
+# Limites superiores (ms) das faixas dos histogramas; a última faixa é "acima de".
+FAIXAS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+_lock = threading.Lock()
+_duracoes: Dict[str, Dict[str, Any]] = {}
+_contadores: Dict[str, int] = {}
+# A primeira publicação acontece um intervalo depois de o processo subir.
+_ultima_publicacao = time.monotonic()
+
+
+def _histograma_vazio() -> Dict[str, Any]:
+    return {"contagem": 0, "soma_ms": 0.0, "max_ms": 0.0, "faixas": [0] * (len(FAIXAS_MS) + 1)}
+
+
+def registrar_duracao(etapa: str, duracao_ms: float) -> None:
+    faixa = bisect_left(FAIXAS_MS, duracao_ms)
+    with _lock:
+        histograma = _duracoes.setdefault(etapa, _histograma_vazio())
+        histograma["contagem"] += 1
+        histograma["soma_ms"] += duracao_ms
+        histograma["max_ms"] = max(histograma["max_ms"], duracao_ms)
+        histograma["faixas"][faixa] += 1
+    logger.debug("etapa=%s duracao_ms=%.1f", etapa, duracao_ms)
+    publicar_se_preciso()
+
+
+def incrementar(nome: str, quantidade: int = 1) -> None:
+    with _lock:
+        _contadores[nome] = _contadores.get(nome, 0) + quantidade
+
+
+@contextmanager
+def medir(etapa: str):
+    """Mede o bloco (ou a função decorada) e registra a duração na etapa, mesmo se falhar."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_duracao(etapa, (time.perf_counter() - inicio) * 1000)
+
+
+def instantaneo() -> Dict[str, Any]:
+    """Cópia dos valores brutos deste processo."""
+    with _lock:
+        return {"duracoes": copy.deepcopy(_duracoes), "contadores": dict(_contadores)}
+
+
+def zerar() -> None:
+    global _ultima_publicacao
+    with _lock:
+        _duracoes.clear()
+        _contadores.clear()
+        _ultima_publicacao = time.monotonic()
+
+
+def somar(instantaneos: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Soma instantâneos de vários processos (histogramas e contadores são aditivos)."""
+    total = {"duracoes": {}, "contadores": {}}
+    for dados in instantaneos:
+        for etapa, histograma in (dados.get("duracoes") or {}).items():
+            acumulado = total["duracoes"].setdefault(etapa, _histograma_vazio())
+            acumulado["contagem"] += histograma["contagem"]
+            acumulado["soma_ms"] += histograma["soma_ms"]
+            acumulado["max_ms"] = max(acumulado["max_ms"], histograma["max_ms"])
+            acumulado["faixas"] = [a + b for a, b in zip(acumulado["faixas"], histograma["faixas"])]
+        for nome, valor in (dados.get("contadores") or {}).items():
+            total["contadores"][nome] = total["contadores"].get(nome, 0) + valor
+    return total
+
+
+def resumir(dados: Dict[str, Any]) -> Dict[str, Any]:
+    """Formato do endpoint: média por etapa e faixas rotuladas ("<=250", ">60000")."""
+    rotulos = [f"<={limite}" for limite in FAIXAS_MS] + [f">{FAIXAS_MS[-1]}"]
+    duracoes = {}
+    for etapa, histograma in sorted(dados["duracoes"].items()):
+        contagem = histograma["contagem"]
+        duracoes[etapa] = {
+            "contagem": contagem,
+            "media_ms": round(histograma["soma_ms"] / contagem, 1) if contagem else 0.0,
+            "max_ms": round(histograma["max_ms"], 1),
+            "soma_ms": round(histograma["soma_ms"], 1),
+            "faixas_ms": dict(zip(rotulos, histograma["faixas"])),
+        }
+    return {"duracoes": duracoes, "contadores": dict(sorted(dados["contadores"].items()))}
+
+
+# -------------------------------------------------------------------
+# Publicação entre processos
+# -------------------------------------------------------------------
+
+def _chave_processo() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _validade() -> int:
+    return max(60, 10 * int(getattr(settings, "METRICAS_INTERVALO_PUBLICACAO", 30) or 30))
+
+
+def publicar() -> None:
+    """
+    Grava o instantâneo deste processo na sua linha de MetricasProcesso e apaga as
+    linhas de processos que pararam de publicar. Cada processo só escreve a própria
+    linha, então publicações simultâneas não se sobrescrevem.
+    """
+    from app.core.models import MetricasProcesso
+
+    global _ultima_publicacao
+    _ultima_publicacao = time.monotonic()
+    MetricasProcesso.objects.update_or_create(processo=_chave_processo(), defaults={"dados": instantaneo()})
+    MetricasProcesso.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=_validade())).delete()
+
+
+def publicar_se_preciso() -> None:
+    """Publica se já passou METRICAS_INTERVALO_PUBLICACAO desde a última vez (o worker chama a cada volta)."""
+    intervalo = int(getattr(settings, "METRICAS_INTERVALO_PUBLICACAO", 30) or 0)
+    if intervalo <= 0 or time.monotonic() - _ultima_publicacao < intervalo:
+        return
+    try:
+        publicar()
+    except Exception:
+        logger.exception("Falha ao publicar as métricas do processo")
+
+
+def coletar() -> Dict[str, Any]:
+    """Métricas somadas de todos os processos que publicaram recentemente (incluindo este)."""
+    from app.core.models import MetricasProcesso
+
+    instantaneos = [instantaneo()]
+    try:
+        publicados = MetricasProcesso.objects.filter(
+            updated_at__gte=timezone.now() - timedelta(seconds=_validade()),
+        ).exclude(processo=_chave_processo())
+        instantaneos.extend(dados for dados in publicados.values_list("dados", flat=True) if dados)
+    except Exception:
+        logger.exception("Falha ao ler as métricas publicadas pelos outros processos")
+    resumo = resumir(somar(instantaneos))
+    resumo["processos"] = len(instantaneos)
+    return resumo
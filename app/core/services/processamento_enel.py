@@ -3,19 +3,32 @@
 from typing import Any, Dict
 
 from app.core.services import processamento_energisa as processamento
-from app.core.calculos.padrao import PoliticaPadrao
+from app.core.calculos.factory import get_politica
+from app.core.extratores.base import DocumentoPDF
 from app.core.models import Cliente
 from app.core.parsers.enel import EnelParser
 
 
-def processar(pdf_file: Any, cliente: Cliente, texto: str | None = None) -> Dict[str, Any]:
+def processar(
+    pdf_file: Any,
+    cliente: Cliente,
+    texto: str | None = None,
+    documento: DocumentoPDF | None = None,
+) -> Dict[str, Any]:
     """
-    Processa a fatura Enel usando o parser dedicado e aplica a política de cálculo do cliente.
+    Processa a fatura Enel usando o parser dedicado (só regex, sem IA) e aplica a política de cálculo do cliente.
     """
+    if documento is not None:
+        texto = documento.texto
     texto = texto or processamento.extrair_texto(pdf_file)
     dados = EnelParser().extract(texto) or {}
 
-    calculado = PoliticaPadrao().calcular(dados) or {}
+    # Mesmas chaves do pipeline Energisa, lidas pela renderização.
+    dados.setdefault("energia_atv_injetada_kwh", dados.get("energia_injetada_kwh", ""))
+    dados.setdefault("energia_atv_injetada_valor", dados.get("energia_injetada_valor", ""))
+    dados.setdefault("caminho_extracao", processamento.CAMINHO_REGEX)
+
+    calculado = get_politica("PADRAO", cliente).calcular(dados) or {}
 
     template_fatura = getattr(cliente, "template_fatura", "") or "energisa_padrao.html"
     return {
@@ -8,20 +8,38 @@ from __future__ import annotations
 
 import os
 import json
+import logging
 import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Union, IO, Any, Dict, List
 
-import pdfplumber
+import httpx
+import tiktoken
+from django.conf import settings
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 
+from app.core.calculos.base import PoliticaCalculo
+from app.core.calculos.factory import diretrizes_do_cliente
+from app.core.extratores import layout
+from app.core.extratores.base import BaseExtrator, DocumentoPDF
+from app.core.extratores.factory import get_extrator
+from app.core.models import Cliente
+from app.core.services import metricas
+from app.core.services.redacao import redigir
+
 # -------------------------------------------------------------------
 # CONFIGURAÇÃO
 # -------------------------------------------------------------------
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "").strip()
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1").strip() or "gpt-4.1"
 
@@ -71,73 +89,129 @@ def float_to_br(valor: Any, casas: int = 2) -> str:
 # PDF → TEXTO LINEAR
 # ===================================================================
 
-def extrair_texto(pdf_path: Union[str, Path, IO[bytes]]) -> str:
+def extrair_documento(
+    pdf_path: Union[str, Path, IO[bytes]],
+    extrator: BaseExtrator | None = None,
+) -> DocumentoPDF:
     """
-    Extrai texto unificado do PDF, mantendo a ordem visual o melhor possível.
+    Abre o PDF uma única vez e devolve texto por página e as palavras com coordenadas.
     Aceita tanto caminho (Path/str) quanto InMemoryUploadedFile.
+    O backend padrão vem de PDF_EXTRATOR (ver app/core/extratores).
     """
-    if hasattr(pdf_path, "read"):
-        pdf_path.seek(0)
-        pdf_file = pdf_path
-    else:
-        pdf_file = Path(pdf_path)
+    extrator = extrator or get_extrator()
+    with metricas.medir(metricas.ETAPA_EXTRACAO):
+        return extrator.extrair(pdf_path)
 
-    partes: List[str] = []
-    with pdfplumber.open(pdf_file) as pdf:
-        for pagina in pdf.pages:
-            words = pagina.extract_words()
-            if words:
-                linha = " ".join(w["text"] for w in words)
-                partes.append(linha)
 
-    return "\n".join(partes)
+def extrair_texto(pdf_path: Union[str, Path, IO[bytes]]) -> str:
+    """
+    Extrai texto unificado do PDF, mantendo a ordem visual o melhor possível.
+    Aceita tanto caminho (Path/str) quanto InMemoryUploadedFile.
+    """
+    return extrair_documento(pdf_path).texto
 
 
 # ===================================================================
 # REGEX – EXTRAÇÕES HEURÍSTICAS (HINTS)
 # ===================================================================
+# Padrões pré-compilados no carregamento do módulo. O `re` do CPython só usa
+# busca rápida quando o padrão começa por um literal; por isso os padrões que
+# começariam por uma classe de caracteres (nome, vencimento, histórico, mês por
+# extenso, fim do bloco de itens) são ancorados em "/", " / " ou " " e o trecho
+# anterior é validado em Python, com o mesmo resultado dos padrões originais.
+
+_RE_NOME = re.compile(r"([A-ZÁÉÍÓÚÃÕÇ]{3,}(?: [A-ZÁÉÍÓÚÃÕÇ]{2,}){1,})\s+\d{2}/\d{2}/\d{4}")
+_RE_DATA_BARRA = re.compile(r"/\d{2}/\d{4}")
+_RE_ENDERECO = re.compile(r"(RUA [A-Z0-9ÁÉÍÓÚÃÕÇ\s\.]+,\s*\d+\s*-\s*\d{8})", flags=re.IGNORECASE)
+_RE_UC = re.compile(r"10/\d{7,8}-\d")
+_RE_DATA_EMISSAO = re.compile(r"DATA DE EMISSÃO:?(\d{2}/\d{2}/\d{4})")
+_RE_VENCIMENTO_BARRA = re.compile(r"/\d{4}\s+(\d{2}/\d{2}/\d{4})")
+_RE_LEITURAS = re.compile(
+    r"Leitura Anterior:(\d{2}/\d{2}/\d{4}).*?Leitura Atual:(\d{2}/\d{2}/\d{4})",
+    flags=re.DOTALL,
+)
+_RE_KWH = re.compile(r"KWH\s*([\d\.]+,\d{2})")
+_RE_PRECO_UNITARIO = re.compile(r"Consumo em kWh.*?(\d,\d{5,})", flags=re.DOTALL)
+_RE_HISTORICO_BARRA = re.compile(r"/\d{2}\s+(\d+,\d{2})")
+_RE_MES_ABREVIADO = re.compile(r"[A-Z]{3}")
+_RE_MES_EXTENSO_BARRA = re.compile(r" / \d{4}")
+_RE_REFERENTE_A = re.compile(r"Referente a[: ]+([A-ZÇÃÉÍÓÚ]+/?\d{4})", flags=re.IGNORECASE)
+_RE_MES_REFERENCIA_ROTULO = re.compile(
+    r"(?:M[ÊE]S DE REFER[ÊE]NCIA|M[ÊE]S REFER[ÊE]NCIA)\s*[:\-]?\s*([A-Z]{3}/\d{2,4})",
+    flags=re.IGNORECASE,
+)
+_RE_SALDO_ACUMULADO = re.compile(
+    r"Saldo Acumulado(?: anterior)?[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})",
+    flags=re.IGNORECASE,
+)
+_RE_SALDO = re.compile(r"Saldo[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})", flags=re.IGNORECASE)
+# Marcadores de fim do bloco de itens, ancorados no espaço após "Consumo"/"NOTA".
+_RE_FIM_ITENS = re.compile(
+    r" (?:(?<=consumo )(?:dos últimos 13 meses|kwh)|(?<=nota )fiscal)",
+    flags=re.IGNORECASE,
+)
+_RE_ENERGIA_INJETADA = re.compile(r"Energia Atv Injetada.*?(-\d[\d\.]*,\d{2})", flags=re.IGNORECASE | re.DOTALL)
+_RE_ENERGIA_INJETADA_KWH = re.compile(r"Energia Atv Injetada.*?KWH\s*([\d\.]+,\d{2})", flags=re.IGNORECASE | re.DOTALL)
+
+_LETRAS_NOME = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZÁÉÍÓÚÃÕÇ")
+_LETRAS_VENCIMENTO = _LETRAS_NOME | frozenset("abcdefghijklmnopqrstuvwxyz")
+_MESES_EXTENSO = (
+    "SETEMBRO", "OUTUBRO", "NOVEMBRO", "DEZEMBRO", "JANEIRO", "FEVEREIRO",
+    "MARÇO", "ABRIL", "MAIO", "JUNHO", "JULHO", "AGOSTO",
+)
+
 
 def extrair_nome(texto: str) -> str:
-    padrao = r"([A-ZÁÉÍÓÚÃÕÇ]{3,}(?: [A-ZÁÉÍÓÚÃÕÇ]{2,}){1,})\s+\d{2}/\d{2}/\d{4}"
-    m = re.search(padrao, texto)
-    if not m:
-        return ""
-    nome = m.group(1).strip()
-    if "DOCUMENTO" in nome or "NOTA FISCAL" in nome:
-        return ""
-    return nome
+    """
+    Primeira sequência de palavras em maiúsculas seguida de uma data.
+    Só o trecho imediatamente anterior a cada data é examinado.
+    """
+    for data in _RE_DATA_BARRA.finditer(texto):
+        inicio_data = data.start() - 2
+        i = inicio_data
+        while i > 0 and texto[i - 1].isspace():
+            i -= 1
+        if i == inicio_data:
+            continue
+        while i > 0 and (texto[i - 1] in _LETRAS_NOME or texto[i - 1] == " "):
+            i -= 1
+        m = _RE_NOME.search(texto, i, data.end())
+        if m:
+            nome = m.group(1).strip()
+            if "DOCUMENTO" in nome or "NOTA FISCAL" in nome:
+                return ""
+            return nome
+    return ""
 
 
 def extrair_endereco(texto: str) -> str:
-    m = re.search(
-        r"(RUA [A-Z0-9ÁÉÍÓÚÃÕÇ\s\.]+,\s*\d+\s*-\s*\d{8})",
-        texto,
-        flags=re.IGNORECASE,
-    )
+    m = _RE_ENDERECO.search(texto)
     return m.group(1).strip() if m else ""
 
 
 def extrair_uc(texto: str) -> str:
-    achou = re.findall(r"10/\d{7,8}-\d", texto)
-    return achou[0] if achou else ""
+    m = _RE_UC.search(texto)
+    return m.group(0) if m else ""
 
 
 def extrair_data_emissao(texto: str) -> str:
-    m = re.search(r"DATA DE EMISSÃO:?(\d{2}/\d{2}/\d{4})", texto)
+    m = _RE_DATA_EMISSAO.search(texto)
     return m.group(1) if m else ""
 
 
 def extrair_data_vencimento(texto: str) -> str:
-    m = re.search(r"[A-Za-zÁÉÍÓÚÃÕÇ]+ ?/\d{4}\s+(\d{2}/\d{2}/\d{4})", texto)
-    return m.group(1) if m else ""
+    """Data logo após o "MÊS/AAAA" (ex.: "SETEMBRO / 2025 18/09/2025")."""
+    for m in _RE_VENCIMENTO_BARRA.finditer(texto):
+        i = m.start()
+        if i > 0 and texto[i - 1] == " ":
+            i -= 1
+        if i > 0 and texto[i - 1] in _LETRAS_VENCIMENTO:
+            return m.group(1)
+    return ""
 
 
 def extrair_leituras(texto: str) -> tuple[str, str]:
-    m = re.search(
-        r"Leitura Anterior:(\d{2}/\d{2}/\d{4}).*?Leitura Atual:(\d{2}/\d{2}/\d{4})",
-        texto,
-        flags=re.DOTALL,
-    )
+    m = _RE_LEITURAS.search(texto)
     if m:
         return m.group(1), m.group(2)
     return "", ""
@@ -148,41 +222,43 @@ def extrair_consumo_kwh(texto: str) -> str:
     Consumo principal da fatura.
     Ignora ocorrências próximas de 'Energia Atv Injetada'.
     """
-    for m in re.finditer(r"KWH\s*([\d\.]+,\d{2})", texto):
-        inicio = max(0, m.start() - 80)
-        contexto = texto[inicio:m.start()]
-        if "Energia Atv Injetada" not in contexto:
+    for m in _RE_KWH.finditer(texto):
+        if texto.find("Energia Atv Injetada", max(0, m.start() - 80), m.start()) == -1:
             return m.group(1)
     return ""
 
 
 def extrair_preco_unitario(texto: str) -> str:
-    m = re.search(r"Consumo em kWh.*?(\d,\d{5,})", texto, flags=re.DOTALL)
+    m = _RE_PRECO_UNITARIO.search(texto)
     return m.group(1) if m else ""
 
 
 def extrair_historico_consumo(texto: str) -> List[Dict[str, str]]:
-    matches = re.findall(r"([A-Z]{3}/\d{2})\s+(\d+,\d{2})", texto)
-    return [{"mes": m[0], "consumo": m[1]} for m in matches]
+    """Pares "MMM/AA consumo" (ex.: "SET/25 385,00")."""
+    historico = []
+    for m in _RE_HISTORICO_BARRA.finditer(texto):
+        i = m.start()
+        if i >= 3 and _RE_MES_ABREVIADO.fullmatch(texto, i - 3, i):
+            historico.append({"mes": texto[i - 3:i + 3], "consumo": m.group(1)})
+    return historico
 
 
-def extrair_mes_referencia(texto: str) -> str:
+def extrair_mes_referencia(texto: str, historico: List[Dict[str, str]] | None = None) -> str:
     """
     Extrai o mês de referência.
+    `historico` evita reextrair o histórico quando ele já é conhecido.
     """
-    padroes = [
-        r"(SETEMBRO / \d{4}|OUTUBRO / \d{4}|NOVEMBRO / \d{4}|DEZEMBRO / \d{4}|"
-        r"JANEIRO / \d{4}|FEVEREIRO / \d{4}|MARÇO / \d{4}|ABRIL / \d{4}|MAIO / \d{4}|"
-        r"JUNHO / \d{4}|JULHO / \d{4}|AGOSTO / \d{4})",
-        r"Referente a[: ]+([A-ZÇÃÉÍÓÚ]+/?\d{4})",
-        r"(?:M[ÊE]S DE REFER[ÊE]NCIA|M[ÊE]S REFER[ÊE]NCIA)\s*[:\-]?\s*([A-Z]{3}/\d{2,4})",
-    ]
-    for padrao in padroes:
-        m = re.search(padrao, texto, flags=re.IGNORECASE)
+    for m in _RE_MES_EXTENSO_BARRA.finditer(texto):
+        i = m.start()
+        for mes in _MESES_EXTENSO:
+            if texto[max(0, i - len(mes)):i].upper() == mes:
+                return texto[i - len(mes):m.end()].strip()
+    for padrao in (_RE_REFERENTE_A, _RE_MES_REFERENCIA_ROTULO):
+        m = padrao.search(texto)
         if m:
             return m.group(1).strip()
     # fallback: primeiro mês do histórico
-    hist = extrair_historico_consumo(texto)
+    hist = extrair_historico_consumo(texto) if historico is None else historico
     return hist[0]["mes"] if hist else ""
 
 
@@ -190,19 +266,11 @@ def extrair_saldo_acumulado(texto: str) -> str:
     """
     Extrai o saldo acumulado.
     """
-    m = re.search(
-        r"Saldo Acumulado(?: anterior)?[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})",
-        texto,
-        flags=re.IGNORECASE,
-    )
+    m = _RE_SALDO_ACUMULADO.search(texto)
     if m:
         return m.group(1).strip()
 
-    m2 = re.search(
-        r"Saldo[^0-9\-]*([\-]?\d{1,3}(?:\.\d{3})*,\d{2})",
-        texto,
-        flags=re.IGNORECASE,
-    )
+    m2 = _RE_SALDO.search(texto)
     if m2:
         return m2.group(1).strip()
 
@@ -220,14 +288,10 @@ def extrair_itens_da_fatura(texto: str) -> str:
         return texto
 
     # tenta achar um fim razoável (histórico, consumo 13 meses, nota fiscal etc.)
-    m = re.search(
-        r"(Consumo dos últimos 13 meses|Consumo kWh|NOTA FISCAL|NOTA FISCAL/CONTA)",
-        texto[ini:],
-        flags=re.IGNORECASE,
-    )
+    m = _RE_FIM_ITENS.search(texto, ini)
     if m:
-        fim = ini + m.start()
-        return texto[ini:fim]
+        rotulo = 4 if m.group(0).lower() == " fiscal" else 7  # "NOTA" ou "Consumo"
+        return texto[ini:m.start() - rotulo]
     return texto[ini:]
 
 
@@ -244,8 +308,7 @@ def extrair_energia_injetada_valor(texto: str) -> float:
     """
     itens = extrair_itens_da_fatura(texto)
 
-    padrao = r"Energia Atv Injetada.*?(-\d[\d\.]*,\d{2})"
-    matches = re.findall(padrao, itens, flags=re.IGNORECASE | re.DOTALL)
+    matches = _RE_ENERGIA_INJETADA.findall(itens)
 
     total = 0.0
     for v in matches:
@@ -255,23 +318,421 @@ def extrair_energia_injetada_valor(texto: str) -> float:
     return abs(total)
 
 
+def extrair_energia_injetada_kwh(texto: str) -> float:
+    """
+    Soma as quantidades (kWh) das linhas de 'Energia Atv Injetada' do bloco
+    'Itens da Fatura'. Serve para conferir o valor em R$ (kWh × preço unitário).
+    """
+    itens = extrair_itens_da_fatura(texto)
+    return sum(br_to_float(v) for v in _RE_ENERGIA_INJETADA_KWH.findall(itens))
+
+
+# ----------- EXTRAÇÕES POR REGIÃO (COORDENADAS DAS PALAVRAS) --------
+# Com as caixas das palavras (backend pdfplumber), leituras, itens da fatura e
+# saldo acumulado são lidos consultando só a vizinhança do rótulo no índice
+# espacial da página em que ele aparece, em vez de regex sobre o documento
+# inteiro. Sem palavras, ou quando o rótulo não é encontrado, valem as
+# extrações por regex acima.
+
+_RE_DATA = re.compile(r"\d{2}/\d{2}/\d{4}")
+_RE_VALOR_BR = re.compile(r"-?\d{1,3}(?:\.\d{3})*,\d{2}")
+_RE_VALOR_NEGATIVO = re.compile(r"-\d[\d\.]*,\d{2}")
+_RE_CONTINUACAO_ITEM = re.compile(r"[-\d]|KWH\b")
+_RE_FIM_ITENS_LINHA = re.compile(r"\b(?:consumo (?:dos últimos 13 meses|kwh)|nota fiscal)", flags=re.IGNORECASE)
+
+
+def _valor_a_direita(documento: DocumentoPDF, rotulo: str, padrao: re.Pattern, palavras: int = 2) -> str:
+    """
+    Valor colado ao rótulo ("Atual:09/09/2025") ou em uma das `palavras`
+    seguintes da mesma linha (ex.: "Saldo Acumulado anterior 120,00").
+    """
+    for indice, encontrado in documento.rotulos(rotulo):
+        candidatos = [encontrado.resto] + [p["text"] for p in indice.a_direita(encontrado)[:palavras]]
+        for candidato in candidatos:
+            if padrao.fullmatch(candidato):
+                return candidato
+    return ""
+
+
+def extrair_leituras_layout(documento: DocumentoPDF) -> tuple[str, str]:
+    """Leituras anterior e atual lidas à direita dos rótulos."""
+    if not documento.tem_palavras:
+        return "", ""
+    return (
+        _valor_a_direita(documento, "Leitura Anterior:", _RE_DATA),
+        _valor_a_direita(documento, "Leitura Atual:", _RE_DATA),
+    )
+
+
+def extrair_saldo_acumulado_layout(documento: DocumentoPDF) -> str:
+    """Saldo lido à direita do rótulo "Saldo Acumulado", na página em que ele aparece."""
+    if not documento.tem_palavras:
+        return ""
+    return _valor_a_direita(documento, "Saldo Acumulado", _RE_VALOR_BR, palavras=3)
+
+
+def linhas_itens_layout(documento: DocumentoPDF) -> List[str]:
+    """
+    Linhas do quadro 'Itens da Fatura', lidas de cima para baixo a partir do
+    título até o marcador de fim. Linhas que começam por número ou pela unidade
+    continuam a descrição da linha anterior (ex.: "Energia Atv Injetada GDI" /
+    "1,108630 -7.206,16").
+    """
+    if not documento.tem_palavras:
+        return []
+    for indice, titulo in documento.rotulos("Itens da Fatura"):
+        linhas: List[str] = []
+        for linha in indice.linhas_abaixo(titulo):
+            texto = layout.texto_linha(linha)
+            if _RE_FIM_ITENS_LINHA.search(texto):
+                break
+            if linhas and _RE_CONTINUACAO_ITEM.match(texto):
+                linhas[-1] = f"{linhas[-1]} {texto}"
+            else:
+                linhas.append(texto)
+        return linhas
+    return []
+
+
+def itens_layout(linhas: List[str]) -> Dict[str, Any]:
+    """Consumo, preço unitário e energia injetada (kWh e R$) a partir das linhas do quadro de itens."""
+    consumo = preco = ""
+    injetada_valor = injetada_kwh = 0.0
+    for linha in linhas:
+        if linha.lower().startswith("energia atv injetada"):
+            valor = _RE_VALOR_NEGATIVO.search(linha)
+            injetada_valor += br_to_float(valor.group(0)) if valor else 0.0
+            kwh = _RE_KWH.search(linha)
+            injetada_kwh += br_to_float(kwh.group(1)) if kwh else 0.0
+            continue
+        if not consumo:
+            kwh = _RE_KWH.search(linha)
+            consumo = kwh.group(1) if kwh else ""
+        if not preco and linha.startswith("Consumo em kWh"):
+            preco = extrair_preco_unitario(linha)
+    return {
+        "consumo_kwh": consumo,
+        "preco_unitario": preco,
+        "energia_atv_injetada_valor": abs(injetada_valor),
+        "energia_atv_injetada_kwh": injetada_kwh,
+    }
+
+
+def montar_hints(texto: str, documento: DocumentoPDF | None = None) -> Dict[str, Any]:
+    """
+    Executa todas as extrações via regex e devolve o dicionário de DICAS
+    enviado à IA (e usado como fallback no pós-processamento).
+    Com `documento` (e as caixas das palavras), leituras, itens da fatura e
+    saldo acumulado vêm das extrações por região; o que elas não acharem vem da regex.
+    """
+    historico_hint = extrair_historico_consumo(texto)
+    leitura_ant_hint, leitura_atual_hint = extrair_leituras_layout(documento) if documento else ("", "")
+    if not (leitura_ant_hint and leitura_atual_hint):
+        leitura_ant_hint, leitura_atual_hint = extrair_leituras(texto)
+
+    itens = itens_layout(linhas_itens_layout(documento)) if documento else {}
+    preco_hint = itens.get("preco_unitario") or extrair_preco_unitario(texto)
+
+    # Energia Atv Injetada – valor total (R$) via regex + kWh calculado
+    energia_valor_hint_float = itens.get("energia_atv_injetada_valor") or extrair_energia_injetada_valor(texto)
+    energia_valor_hint = float_to_br(energia_valor_hint_float) if energia_valor_hint_float > 0 else ""
+
+    preco_float = br_to_float(preco_hint)
+    if energia_valor_hint_float > 0 and preco_float > 0:
+        kwh_hint_float = energia_valor_hint_float / preco_float
+        energia_kwh_hint = float_to_br(kwh_hint_float)
+    else:
+        energia_kwh_hint = ""
+
+    hints = {
+        "nome_do_cliente": extrair_nome(texto),
+        "endereco": extrair_endereco(texto),
+        "codigo_do_cliente_uc": extrair_uc(texto),
+        "data_de_emissao": extrair_data_emissao(texto),
+        "data_de_vencimento": extrair_data_vencimento(texto),
+        "leitura_anterior": leitura_ant_hint,
+        "leitura_atual": leitura_atual_hint,
+        "consumo_kwh": itens.get("consumo_kwh") or extrair_consumo_kwh(texto),
+        "preco_unitario": preco_hint,
+        "energia_atv_injetada_kwh": energia_kwh_hint,
+        "energia_atv_injetada_valor": energia_valor_hint,
+        # kWh somado no quadro de itens por região (0 sem documento): só para verificar_hints, fora do prompt.
+        "energia_atv_injetada_kwh_itens": itens.get("energia_atv_injetada_kwh", 0.0),
+        "mes_referencia": extrair_mes_referencia(texto, historico_hint),
+        "saldo_acumulado": (extrair_saldo_acumulado_layout(documento) if documento else "") or extrair_saldo_acumulado(texto),
+        "historico_de_consumo": historico_hint,
+    }
+
+    return hints
+
+
+# ===================================================================
+# VALIDAÇÃO DAS DICAS – CAMINHO SEM IA
+# ===================================================================
+
+CAMINHO_REGEX = "regex"
+CAMINHO_IA = "ia"
+
+# Diferença aceita entre kWh injetado × preço unitário e o valor em R$ da fatura.
+TOLERANCIA_ENERGIA_INJETADA = 0.01
+
+_RE_UC_COMPLETA = re.compile(r"10/\d{8}-\d")
+
+# Dicas usadas só na validação local, que não vão para a IA.
+HINTS_INTERNOS = ("energia_atv_injetada_kwh_itens",)
+
+
+def _normalizar_prompt(prompt: str) -> str:
+    return re.sub(r"[\s\"']", "", prompt or "").lower()
+
+
+def prompt_sem_instrucoes_proprias(prompt_extra: str) -> bool:
+    """True quando o cliente não definiu diretrizes além da fórmula padrão de economia."""
+    return _normalizar_prompt(prompt_extra) in ("", _normalizar_prompt(Cliente.PROMPT_TEMPLATE_PADRAO))
+
+
+def _data(valor: str):
+    try:
+        return datetime.strptime(valor or "", "%d/%m/%Y").date()
+    except ValueError:
+        return None
+
+
+def verificar_hints(hints: Dict[str, Any], texto: str) -> Dict[str, bool]:
+    """
+    Confiança por campo: True quando o valor lido via regex pode ir para a
+    fatura sem revisão da IA. O saldo acumulado é opcional e não é verificado.
+    O kWh injetado vem do quadro de itens já lido em `montar_hints`.
+    """
+    emissao = _data(hints["data_de_emissao"])
+    vencimento = _data(hints["data_de_vencimento"])
+    leitura_anterior = _data(hints["leitura_anterior"])
+    leitura_atual = _data(hints["leitura_atual"])
+
+    preco = br_to_float(hints["preco_unitario"])
+    valor = br_to_float(hints["energia_atv_injetada_valor"])
+    kwh_itens = hints.get("energia_atv_injetada_kwh_itens") or extrair_energia_injetada_kwh(texto)
+    energia_consistente = (
+        valor > 0
+        and kwh_itens > 0
+        and abs(kwh_itens * preco - valor) <= max(0.05, valor * TOLERANCIA_ENERGIA_INJETADA)
+    )
+
+    return {
+        "nome_do_cliente": bool(hints["nome_do_cliente"]),
+        "endereco": bool(hints["endereco"]),
+        "codigo_do_cliente_uc": bool(_RE_UC_COMPLETA.fullmatch(hints["codigo_do_cliente_uc"])),
+        "data_de_emissao": emissao is not None,
+        "data_de_vencimento": vencimento is not None and (emissao is None or vencimento >= emissao),
+        "leitura_anterior": leitura_anterior is not None,
+        "leitura_atual": leitura_atual is not None and leitura_anterior is not None and leitura_atual > leitura_anterior,
+        "consumo_kwh": br_to_float(hints["consumo_kwh"]) > 0,
+        "preco_unitario": 0 < preco < 10,
+        "energia_atv_injetada_valor": energia_consistente,
+        "mes_referencia": bool(hints["mes_referencia"]),
+        "historico_de_consumo": bool(hints["historico_de_consumo"]),
+    }
+
+
+# ===================================================================
+# TEXTO PARA A IA – RECORTE POR SEÇÕES
+# ===================================================================
+# Em vez do texto inteiro do PDF, a IA recebe só os trechos que contêm os
+# campos do JSON, em ordem de prioridade, até LLM_LIMITE_TOKENS_TEXTO tokens.
+
+LIMITE_TOKENS_TEXTO_PADRAO = 2500
+MARCADOR_RECORTE = "\n[...]\n"
+_TAMANHO_CABECALHO = 1200  # caracteres iniciais: cliente, endereço, UC e datas
+_JANELA_LEITURAS = 300
+_JANELA_SALDO = 120
+
+
+@lru_cache(maxsize=None)
+def _codificador():
+    """Encoding do tiktoken para o modelo; None se não puder ser carregado (ex.: sem rede)."""
+    try:
+        try:
+            return tiktoken.encoding_for_model(OPENAI_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        logger.warning("Encoding do tiktoken indisponível; tokens estimados por caracteres (4 por token)")
+        return None
+
+
+def contar_tokens(texto: str) -> int:
+    codificador = _codificador()
+    if codificador is None:
+        return (len(texto) + 3) // 4
+    return len(codificador.encode(texto))
+
+
+def _cortar_em_tokens(texto: str, limite: int) -> str:
+    if limite <= 0:
+        return ""
+    codificador = _codificador()
+    if codificador is None:
+        return texto[:limite * 4]
+    tokens = codificador.encode(texto)
+    return texto if len(tokens) <= limite else codificador.decode(tokens[:limite])
+
+
+def _trecho_historico(texto: str) -> tuple[int, int] | None:
+    inicio = fim = -1
+    for m in _RE_HISTORICO_BARRA.finditer(texto):
+        i = m.start()
+        if i >= 3 and _RE_MES_ABREVIADO.fullmatch(texto, i - 3, i):
+            if inicio == -1:
+                inicio = i - 3
+            fim = m.end()
+    if inicio == -1:
+        return None
+    marcador = texto.rfind("Consumo dos últimos 13 meses", 0, inicio)
+    if marcador != -1 and inicio - marcador < _JANELA_LEITURAS:
+        inicio = marcador
+    return inicio, fim
+
+
+def _secoes_relevantes(texto: str) -> List[tuple[int, int]]:
+    """Trechos (início, fim) em ordem de prioridade: itens, leituras, cabeçalho, histórico e saldo."""
+    secoes = []
+    ini = texto.find("Itens da Fatura")
+    if ini != -1:
+        secoes.append((ini, ini + len(extrair_itens_da_fatura(texto))))
+    leituras = texto.find("Leitura Anterior")
+    if leituras != -1:
+        secoes.append((leituras, leituras + _JANELA_LEITURAS))
+    secoes.append((0, _TAMANHO_CABECALHO))
+    historico = _trecho_historico(texto)
+    if historico:
+        secoes.append(historico)
+    saldo = _RE_SALDO_ACUMULADO.search(texto)
+    if saldo:
+        secoes.append((saldo.start(), saldo.end() + _JANELA_SALDO))
+    return [(inicio, min(fim, len(texto))) for inicio, fim in secoes]
+
+
+def recortar_texto_para_ia(texto: str, limite_tokens: int | None = None) -> str:
+    """
+    Reduz o texto da fatura às seções relevantes dentro do orçamento de tokens.
+    Textos que já cabem no orçamento (ou limite 0) são enviados sem recorte.
+    """
+    if limite_tokens is None:
+        limite_tokens = int(getattr(settings, "LLM_LIMITE_TOKENS_TEXTO", LIMITE_TOKENS_TEXTO_PADRAO) or 0)
+
+    tokens_antes = contar_tokens(texto)
+    if limite_tokens <= 0 or tokens_antes <= limite_tokens:
+        logger.info("Texto da fatura para a IA: %d tokens (sem recorte)", tokens_antes)
+        return texto
+
+    secoes = _secoes_relevantes(texto)
+    tokens = [contar_tokens(texto[inicio:fim]) for inicio, fim in secoes]
+
+    # Divide o orçamento em partes iguais entre as seções; o que uma seção curta
+    # não usa é redistribuído às demais, com sobra final pela ordem de prioridade.
+    disponivel = limite_tokens - contar_tokens(MARCADOR_RECORTE) * len(secoes)
+    cotas = [0] * len(secoes)
+    pendentes = [i for i, total in enumerate(tokens) if total > 0]
+    while pendentes and disponivel > 0:
+        parte = max(1, disponivel // len(pendentes))
+        for i in list(pendentes):
+            acrescimo = min(tokens[i] - cotas[i], parte, disponivel)
+            cotas[i] += acrescimo
+            disponivel -= acrescimo
+            if cotas[i] == tokens[i]:
+                pendentes.remove(i)
+
+    escolhidos: List[tuple[int, int]] = []
+    for (inicio, fim), total, cota in zip(secoes, tokens, cotas):
+        if cota <= 0:
+            continue
+        if cota < total:
+            fim = inicio + len(_cortar_em_tokens(texto[inicio:fim], cota))
+        escolhidos.append((inicio, fim))
+
+    # Junta trechos sobrepostos ou adjacentes mantendo a ordem original do texto.
+    unidos: List[List[int]] = []
+    for inicio, fim in sorted(escolhidos):
+        if unidos and inicio <= unidos[-1][1]:
+            unidos[-1][1] = max(unidos[-1][1], fim)
+        else:
+            unidos.append([inicio, fim])
+    recortado = MARCADOR_RECORTE.join(texto[inicio:fim].strip() for inicio, fim in unidos)
+
+    logger.info(
+        "Texto da fatura para a IA: %d tokens antes do recorte, %d depois (limite %d)",
+        tokens_antes,
+        contar_tokens(recortado),
+        limite_tokens,
+    )
+    return recortado
+
+
 # ===================================================================
 # IA – Leitura inteligente da fatura
 # ===================================================================
 
-def call_llm_fatura(texto_pdf: str, hints: Dict[str, Any], prompt_extra: str = "") -> Dict[str, Any]:
-    if not OPENAI_API_KEY:
-        raise RuntimeError("OPENAI_API_KEY não configurada.")
+_llm: ChatOpenAI | None = None
+_llm_lock = threading.Lock()
 
-    llm = ChatOpenAI(
+
+def ia_configurada() -> bool:
+    """Há para onde mandar o prompt: chave da OpenAI, endpoint próprio (LLM_BASE_URL) ou o simulador local."""
+    return bool(OPENAI_API_KEY or getattr(settings, "LLM_BASE_URL", "") or getattr(settings, "LLM_SIMULADOR", False))
+
+
+def _criar_llm() -> ChatOpenAI:
+    timeout = float(getattr(settings, "LLM_TIMEOUT", 80))
+    transporte = None
+    if getattr(settings, "LLM_SIMULADOR", False):
+        from app.core.services.simulador_llm import SimuladorLLM, TransporteSimulador
+
+        transporte = TransporteSimulador(SimuladorLLM.das_configuracoes())
+        logger.warning("Cliente da IA usando o simulador local (LLM_SIMULADOR); nenhuma chamada sai do processo")
+    http_client = httpx.Client(
+        transport=transporte,
+        limits=httpx.Limits(
+            max_connections=int(getattr(settings, "LLM_POOL_MAX_CONEXOES", 10)),
+            max_keepalive_connections=int(getattr(settings, "LLM_POOL_MAX_KEEPALIVE", 10)),
+            keepalive_expiry=float(getattr(settings, "LLM_POOL_KEEPALIVE_EXPIRACAO", 60)),
+        ),
+        timeout=httpx.Timeout(timeout, connect=float(getattr(settings, "LLM_TIMEOUT_CONEXAO", 10))),
+    )
+    return ChatOpenAI(
         model=OPENAI_MODEL,
-        api_key=OPENAI_API_KEY,
+        # O simulador e endpoints locais não exigem chave, mas o SDK não aceita uma vazia.
+        api_key=OPENAI_API_KEY or "sk-sem-chave",
+        base_url=getattr(settings, "LLM_BASE_URL", "") or None,
         temperature=0,
-        timeout=80,
+        timeout=timeout,
         max_retries=2,
         model_kwargs={"response_format": {"type": "json_object"}},
+        http_client=http_client,
     )
 
+
+def obter_llm() -> tuple[ChatOpenAI, bool]:
+    """
+    Cliente da IA compartilhado pelo processo (criado na primeira chamada).
+    O pool HTTP do httpx mantém as conexões TLS abertas entre faturas e é
+    seguro entre as threads do processamento de lotes.
+    Retorna (cliente, criado_agora).
+    """
+    global _llm
+    if _llm is not None:
+        return _llm, False
+    with _llm_lock:
+        if _llm is None:
+            _llm = _criar_llm()
+            return _llm, True
+    return _llm, False
+
+
+def montar_prompt(texto_pdf: str, hints: Dict[str, Any], prompt_extra: str = "") -> str:
+    """Prompt completo da leitura da fatura (usado na chamada direta e no modo offline em lote)."""
+    texto_ia = recortar_texto_para_ia(texto_pdf)
+    dicas = {campo: valor for campo, valor in hints.items() if campo not in HINTS_INTERNOS}
+
     extra_block = ""
     if prompt_extra:
         extra_block = f"\nINSTRUÇÕES DO CLIENTE (priorize e siga):\n{prompt_extra}\n"
@@ -312,7 +773,7 @@ TEMPLATE JSON (responda APENAS neste formato json válido):
 }}
 
 DICAS (hints) extraídas via regex em json:
-{json.dumps(hints, ensure_ascii=False)}
+{json.dumps(dicas, ensure_ascii=False)}
 
 Regras importantes (siga com rigor):
 - Priorize as INSTRUÇÕES DO CLIENTE para fórmulas e formato.
@@ -340,20 +801,34 @@ Para 'economia' e 'valor_a_pagar':
     valor_a_pagar = base * 0.7
 - Retorne-os como string no formato brasileiro, ex.: "999,99".
 
-TEXTO COMPLETO DA FATURA (PDF → texto):
-\"\"\"{texto_pdf}\"\"\"
+TEXTO DA FATURA (PDF → texto; "[...]" marca trechos omitidos):
+\"\"\"{texto_ia}\"\"\"
 
 Responda APENAS com o JSON final, sem comentários adicionais.
 """
+    return prompt
+
+
+def call_llm_fatura(texto_pdf: str, hints: Dict[str, Any], prompt_extra: str = "") -> Dict[str, Any]:
+    if not ia_configurada():
+        raise RuntimeError("OPENAI_API_KEY não configurada.")
+
+    llm, cliente_novo = obter_llm()
+    prompt = montar_prompt(texto_pdf, hints, prompt_extra)
 
-    print("\n\n===== PROMPT ENVIADO À IA =====")
-    print(prompt[:2000], "...\n")
+    logger.debug("Prompt enviado à IA (%d caracteres): %s", len(prompt), redigir(prompt))
 
-    resposta = llm.invoke(prompt)
+    inicio = time.perf_counter()
+    with metricas.medir(metricas.ETAPA_IA):
+        resposta = llm.invoke(prompt)
+    logger.info(
+        "Chamada à IA: %.0f ms (cliente %s)",
+        (time.perf_counter() - inicio) * 1000,
+        "novo, com abertura de conexão" if cliente_novo else "reutilizado",
+    )
     conteudo = resposta.content
 
-    print("\n===== RESPOSTA RAW DA IA =====")
-    print(conteudo, "\n")
+    logger.debug("Resposta da IA (%d caracteres): %s", len(conteudo), redigir(conteudo))
 
     return json.loads(conteudo)
 
@@ -381,67 +856,88 @@ def calcular_economia_valor(energia_valor: str) -> tuple[str, str]:
 # PROCESSAMENTO PRINCIPAL
 # ===================================================================
 
-def processar_pdf(pdf_path: Union[str, Path, IO[bytes]], prompt_extra: str = "") -> Dict[str, Any]:
-    print("\n=========== PROCESSANDO PDF ===========")
-
-    texto = extrair_texto(pdf_path)
+def preparar_leitura(
+    documento: DocumentoPDF,
+    prompt_extra: str = "",
+    permitir_sem_ia: bool = False,
+) -> tuple[str, Dict[str, Any], bool]:
+    """
+    Etapas anteriores à IA: valida o texto, monta as dicas e decide se a IA
+    pode ser dispensada. Retorna (texto, hints, dispensa_ia).
+    """
+    texto = documento.texto
 
-    print("\n======= TEXTO EXTRAÍDO (preview) =======")
-    print(texto[:1500], "...\n")
+    logger.debug("Texto extraído (%d caracteres): %s", len(texto), redigir(texto))
 
     if not texto.strip():
         raise ValueError("Nenhum texto pôde ser extraído do PDF.")
 
-    # Hints via regex
-    nome_hint = extrair_nome(texto)
-    endereco_hint = extrair_endereco(texto)
-    uc_hint = extrair_uc(texto)
-    emissao_hint = extrair_data_emissao(texto)
-    vencimento_hint = extrair_data_vencimento(texto)
-    leitura_ant_hint, leitura_atual_hint = extrair_leituras(texto)
-    consumo_hint = extrair_consumo_kwh(texto)
-    preco_hint = extrair_preco_unitario(texto)
-    mes_referencia_hint = extrair_mes_referencia(texto)
-    saldo_acumulado_hint = extrair_saldo_acumulado(texto)
-    historico_hint = extrair_historico_consumo(texto)
+    with metricas.medir(metricas.ETAPA_HINTS):
+        hints = montar_hints(texto, documento)
+        confianca = {}
+        if permitir_sem_ia and prompt_sem_instrucoes_proprias(prompt_extra):
+            confianca = verificar_hints(hints, texto)
 
-    # Energia Atv Injetada – valor total (R$) via regex + kWh calculado
-    energia_valor_hint_float = extrair_energia_injetada_valor(texto)
-    energia_valor_hint = float_to_br(energia_valor_hint_float) if energia_valor_hint_float > 0 else ""
+    logger.debug(
+        "Dicas de regex: preenchidas=%s vazias=%s",
+        ",".join(campo for campo, valor in hints.items() if valor),
+        ",".join(campo for campo, valor in hints.items() if not valor),
+    )
 
-    preco_float = br_to_float(preco_hint)
-    if energia_valor_hint_float > 0 and preco_float > 0:
-        kwh_hint_float = energia_valor_hint_float / preco_float
-        energia_kwh_hint = float_to_br(kwh_hint_float)
-    else:
-        energia_kwh_hint = ""
+    if confianca and all(confianca.values()):
+        logger.info("Dicas completas e consistentes: IA dispensada")
+        return texto, hints, True
 
-    hints = {
-        "nome_do_cliente": nome_hint,
-        "endereco": endereco_hint,
-        "codigo_do_cliente_uc": uc_hint,
-        "data_de_emissao": emissao_hint,
-        "data_de_vencimento": vencimento_hint,
-        "leitura_anterior": leitura_ant_hint,
-        "leitura_atual": leitura_atual_hint,
-        "consumo_kwh": consumo_hint,
-        "preco_unitario": preco_hint,
-        "energia_atv_injetada_kwh": energia_kwh_hint,
-        "energia_atv_injetada_valor": energia_valor_hint,
-        "mes_referencia": mes_referencia_hint,
-        "saldo_acumulado": saldo_acumulado_hint,
-        "historico_de_consumo": historico_hint,
-    }
+    if confianca:
+        pendentes = [campo for campo, ok in confianca.items() if not ok]
+        logger.info("Dicas incompletas ou inconsistentes (%s): IA necessária", ", ".join(pendentes))
+    return texto, hints, False
 
-    print("===== HINTS (REGEX) =====")
-    print(json.dumps(hints, indent=2, ensure_ascii=False), "\n")
 
-    # Chamada da IA
-    ia = call_llm_fatura(texto, hints, prompt_extra=prompt_extra)
+def processar_pdf(
+    pdf_path: Union[str, Path, IO[bytes], None],
+    prompt_extra: str = "",
+    documento: DocumentoPDF | None = None,
+    permitir_sem_ia: bool = False,
+    politica: PoliticaCalculo | None = None,
+) -> Dict[str, Any]:
+    """
+    Extrai os dados da fatura (regex + IA).
+    Com `permitir_sem_ia`, a chamada à IA é dispensada quando todas as dicas
+    passam em `verificar_hints` e o cliente não tem diretrizes próprias.
+    `politica` calcula economia e valor_a_pagar (ver `consolidar_resultado`).
+    O caminho seguido fica em resultado["caminho_extracao"].
+    """
+    # Reaproveita o documento já extraído pelo orquestrador, se houver.
+    if documento is None:
+        documento = extrair_documento(pdf_path)
+
+    texto, hints, dispensa_ia = preparar_leitura(documento, prompt_extra, permitir_sem_ia)
+
+    if dispensa_ia:
+        caminho = CAMINHO_REGEX
+        ia = {}
+    else:
+        # Chamada da IA
+        caminho = CAMINHO_IA
+        ia = call_llm_fatura(texto, hints, prompt_extra=prompt_extra)
 
-    print("\n===== JSON BRUTO RECEBIDO DA IA =====")
-    print(json.dumps(ia, indent=2, ensure_ascii=False), "\n")
+    return consolidar_resultado(ia, hints, caminho, politica)
 
+
+@metricas.medir(metricas.ETAPA_POS_PROCESSAMENTO)
+def consolidar_resultado(
+    ia: Dict[str, Any],
+    hints: Dict[str, Any],
+    caminho: str = CAMINHO_IA,
+    politica: PoliticaCalculo | None = None,
+) -> Dict[str, Any]:
+    """
+    Combina a resposta da IA com as dicas de regex e aplica as garantias de
+    cálculo. Usado tanto após a chamada direta quanto na ingestão do modo offline.
+    Com `politica` (fórmulas compiladas do prompt do cliente), economia e
+    valor_a_pagar são calculados localmente e prevalecem sobre a IA.
+    """
     # ---------------- PÓS-PROCESSAMENTO / GARANTIAS -----------------
 
     def get_field(key: str, default: Any = "") -> Any:
@@ -453,39 +949,50 @@ def processar_pdf(pdf_path: Union[str, Path, IO[bytes]], prompt_extra: str = "")
         return default
 
     # Campos básicos: IA com fallback nos hints
-    nome_final = get_field("nome_do_cliente", nome_hint)
-    endereco_final = get_field("endereco", endereco_hint)
-    uc_final = get_field("codigo_do_cliente_uc", uc_hint)
-    emissao_final = get_field("data_de_emissao", emissao_hint)
-    vencimento_final = get_field("data_de_vencimento", vencimento_hint)
-    leitura_ant_final = get_field("leitura_anterior", leitura_ant_hint)
-    leitura_atual_final = get_field("leitura_atual", leitura_atual_hint)
-    consumo_final = get_field("consumo_kwh", consumo_hint)
-    preco_final = get_field("preco_unitario", preco_hint)
-    mes_ref_final = get_field("mes_referencia", mes_referencia_hint)
-    saldo_final = get_field("saldo_acumulado", saldo_acumulado_hint)
+    nome_final = get_field("nome_do_cliente", hints["nome_do_cliente"])
+    endereco_final = get_field("endereco", hints["endereco"])
+    uc_final = get_field("codigo_do_cliente_uc", hints["codigo_do_cliente_uc"])
+    emissao_final = get_field("data_de_emissao", hints["data_de_emissao"])
+    vencimento_final = get_field("data_de_vencimento", hints["data_de_vencimento"])
+    leitura_ant_final = get_field("leitura_anterior", hints["leitura_anterior"])
+    leitura_atual_final = get_field("leitura_atual", hints["leitura_atual"])
+    consumo_final = get_field("consumo_kwh", hints["consumo_kwh"])
+    preco_final = get_field("preco_unitario", hints["preco_unitario"])
+    mes_ref_final = get_field("mes_referencia", hints["mes_referencia"])
+    saldo_final = get_field("saldo_acumulado", hints["saldo_acumulado"])
 
     # Energia Atv Injetada – SEMPRE confiar no cálculo em Python se existir
-    energia_valor_final = energia_valor_hint or ia.get("energia_atv_injetada_valor", "")
+    energia_valor_final = hints["energia_atv_injetada_valor"] or ia.get("energia_atv_injetada_valor", "")
     if not energia_valor_final:
         energia_valor_final = ia.get("energia_atv_injetada_valor", "")
 
     # recalcula kWh final em cima do valor e do preço unitário
-    energia_kwh_final = energia_kwh_hint
+    energia_kwh_final = hints["energia_atv_injetada_kwh"]
     if energia_valor_final and preco_final:
         v = br_to_float(energia_valor_final)
         p = br_to_float(preco_final)
         if v > 0 and p > 0:
             energia_kwh_final = float_to_br(v / p)
 
+    historico_hint = hints["historico_de_consumo"]
     historico_final = ia.get("historico_de_consumo", historico_hint)
     if not isinstance(historico_final, list) or not historico_final:
         historico_final = historico_hint
 
-    # economia / valor_a_pagar – prioriza valores vindos da IA; calcula se faltar
+    # economia / valor_a_pagar – fórmulas do cliente compiladas; senão prioriza a IA e calcula se faltar
     economia_final = ia.get("economia", "") or ""
     valor_pagar_final = ia.get("valor_a_pagar", "") or ""
 
+    if politica is not None:
+        calculado = politica.calcular({
+            "energia_atv_injetada_valor": energia_valor_final,
+            "energia_atv_injetada_kwh": energia_kwh_final,
+            "consumo_kwh": consumo_final,
+            "preco_unitario": preco_final,
+        })
+        economia_final = calculado["economia"] or economia_final
+        valor_pagar_final = calculado["valor_a_pagar"] or valor_pagar_final
+
     if not economia_final or not valor_pagar_final:
         economia_calc, valor_pagar_calc = calcular_economia_valor(energia_valor_final)
         if economia_calc and not economia_final:
@@ -510,11 +1017,15 @@ def processar_pdf(pdf_path: Union[str, Path, IO[bytes]], prompt_extra: str = "")
         "mes_referencia": mes_ref_final,
         "saldo_acumulado": saldo_final,
         "historico_de_consumo": historico_final,
+        "caminho_extracao": caminho,
     }
 
-    print("\n====== RESULTADO FINAL CONSOLIDADO ======")
-    print(json.dumps(resultado, indent=2, ensure_ascii=False))
-    print("=================================\n")
+    metricas.incrementar(f"caminho_{caminho}")
+    logger.debug(
+        "Resultado consolidado (caminho=%s): %s",
+        caminho,
+        redigir(json.dumps(resultado, ensure_ascii=False)),
+    )
 
     return resultado
 
@@ -523,14 +1034,29 @@ def processar_pdf(pdf_path: Union[str, Path, IO[bytes]], prompt_extra: str = "")
 # PROCESSAMENTO ORQUESTRADO (compatível com serviço)
 # ===================================================================
 
-def processar(pdf_file: Any, cliente: Any, texto: str | None = None) -> Dict[str, Any]:
+def processar(
+    pdf_file: Any,
+    cliente: Any,
+    documento: DocumentoPDF | None = None,
+) -> Dict[str, Any]:
     """
     Wrapper utilizado pelo serviço de faturas para a Energisa.
-    Usa o pipeline completo (regex + IA) com o prompt do cliente.
+    Usa o pipeline completo (regex + IA) com o prompt do cliente; no modo
+    automático a IA só é chamada quando as dicas não bastam. As fórmulas do
+    prompt são calculadas localmente; só as instruções livres vão para a IA.
     """
-    texto = texto or extrair_texto(pdf_file)
-    prompt_extra = getattr(cliente, "prompt_template", "") or ""
-    dados = processar_pdf(pdf_file, prompt_extra=prompt_extra) or {}
+    documento = documento or extrair_documento(pdf_file)
+    texto = documento.texto
+    diretrizes = diretrizes_do_cliente(cliente)
+    prompt_extra = diretrizes.instrucoes_livres
+    permitir_sem_ia = getattr(cliente, "modo_extracao", "") == Cliente.MODO_EXTRACAO_AUTOMATICO
+    dados = processar_pdf(
+        pdf_file,
+        prompt_extra=prompt_extra,
+        documento=documento,
+        permitir_sem_ia=permitir_sem_ia,
+        politica=diretrizes.politica,
+    ) or {}
 
     template_fatura = getattr(cliente, "template_fatura", "") or "energisa_padrao.html"
     if getattr(cliente, "is_VIP", False) and getattr(cliente, "template_fatura", ""):
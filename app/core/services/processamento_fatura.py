@@ -1,29 +1,85 @@
 """Serviço de orquestração do processamento de faturas por concessionária."""
 
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Tuple
 
-from app.core.detectors.service import detect_concessionaria
+from django.conf import settings
+
+from app.core.detectors.service import REGISTRY, detect_concessionaria, looks_like_invoice
+from app.core.extratores.base import DocumentoPDF
+from app.core.extratores.factory import get_extrator
 from app.core.models import Cliente
-from app.core.services import processamento_cpfl, processamento_enel, processamento_energisa
+from app.core.services import metricas, processamento_cpfl, processamento_enel, processamento_energisa
+
+
+class PDFNaoReconhecido(ValueError):
+    """O PDF não parece uma fatura de energia; é recusado antes da extração completa."""
 
 
-def processar_fatura(pdf_file: Any, cliente: Cliente) -> Dict[str, Any]:
+def detectar_pela_primeira_pagina(pdf_file: Any) -> Tuple[str, float]:
     """
-    Orquestra detecção da concessionária e delega para o módulo específico.
-    - Energisa: mantém o pipeline completo em processamento_energisa.py (regex + IA).
-    - ENEL/CPFL: usam parsers dedicados e política de cálculo.
+    Extrai só a primeira página (com PDF_EXTRATOR_DETECCAO, por padrão o pdfium,
+    bem mais rápido) e detecta a concessionária pelos sinais do cabeçalho.
+    Retorna (concessionaria, pontuacao). Levanta PDFNaoReconhecido
+    quando a página tem texto, mas nenhum sinal de concessionária nem de conta de energia.
+    """
+    extrator = get_extrator(getattr(settings, "PDF_EXTRATOR_DETECCAO", ""))
+    with metricas.medir(metricas.ETAPA_DETECCAO):
+        texto = extrator.extrair(pdf_file, max_paginas=1).texto
+        concessionaria, pontuacao = REGISTRY.best(texto)
+    if texto.strip() and not pontuacao and not looks_like_invoice(texto):
+        metricas.incrementar("pdfs_recusados")
+        raise PDFNaoReconhecido("O PDF não parece uma fatura de energia (nenhuma concessionária reconhecida na primeira página).")
+    return concessionaria, pontuacao
+
+
+def extrair_e_detectar(pdf_file: Any) -> Tuple[DocumentoPDF, str]:
+    """
+    Detecta a concessionária pela primeira página e extrai o PDF inteiro uma
+    única vez, já com o backend configurado para ela. Se a primeira página não
+    tiver texto ou sinais de concessionária, a detecção é refeita no texto completo.
     """
     from app.core.services import processamento_energisa as processamento  # import local para evitar dependência circular
 
-    texto = processamento.extrair_texto(pdf_file)
-    concessionaria = detect_concessionaria(texto)
+    concessionaria, pontuacao = detectar_pela_primeira_pagina(pdf_file)
+    extrator = get_extrator(concessionaria=concessionaria)
+    documento = processamento.extrair_documento(pdf_file, extrator=extrator)
+    if pontuacao:
+        return documento, concessionaria
 
+    with metricas.medir(metricas.ETAPA_DETECCAO):
+        concessionaria = detect_concessionaria(documento.texto)
+    extrator_concessionaria = get_extrator(concessionaria=concessionaria)
+    if extrator_concessionaria.name != extrator.name:
+        documento = processamento.extrair_documento(pdf_file, extrator=extrator_concessionaria)
+    return documento, concessionaria
+
+
+def processador_da_concessionaria(concessionaria: str) -> Callable[..., Dict[str, Any]]:
+    """Função `processar` do módulo da concessionária; a Energisa atende as não reconhecidas."""
     processadores = {
         "ENERGISA": processamento_energisa.processar,
         "ENEL": processamento_enel.processar,
         "CPFL": processamento_cpfl.processar,
     }
-    processar = processadores.get(concessionaria, processamento_energisa.processar)
-    contexto = processar(pdf_file, cliente, texto=texto) or {}
+    return processadores.get(concessionaria, processamento_energisa.processar)
+
+
+def processar_fatura(
+    pdf_file: Any,
+    cliente: Cliente,
+    documento: DocumentoPDF | None = None,
+    concessionaria: str = "",
+) -> Dict[str, Any]:
+    """
+    Orquestra detecção da concessionária e delega para o módulo específico.
+    - Energisa: mantém o pipeline completo em processamento_energisa.py (regex + IA).
+    - ENEL/CPFL: usam parsers dedicados e política de cálculo.
+    O PDF é extraído uma única vez e o mesmo documento segue para todas as etapas.
+    """
+    if documento is None:
+        documento, concessionaria = extrair_e_detectar(pdf_file)
+
+    processar = processador_da_concessionaria(concessionaria)
+    contexto = processar(pdf_file, cliente, documento=documento) or {}
     contexto.setdefault("concessionaria", concessionaria)
     return contexto
@@ -0,0 +1,23 @@
+"""Redação de dados de clientes antes de irem para o log."""
+
+import re
+
+_RE_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+# Sequências de 2+ palavras em maiúsculas: nomes, endereços e cidades nas faturas.
+_RE_MAIUSCULAS = re.compile(r"\b[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,}(?:[ \t]+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]{2,})+\b")
+_RE_DIGITO = re.compile(r"\d")
+
+
+def redigir(texto: str, limite: int = 500) -> str:
+    """
+    Versão segura para log: e-mails, nomes/endereços em maiúsculas e todos os
+    dígitos (documentos, UC, datas, valores) são mascarados, e o texto é
+    cortado em `limite` caracteres. Os rótulos da fatura continuam legíveis.
+    """
+    texto = str(texto or "")
+    cortado = len(texto) > limite
+    texto = texto[:limite]
+    texto = _RE_EMAIL.sub("<email>", texto)
+    texto = _RE_MAIUSCULAS.sub("***", texto)
+    texto = _RE_DIGITO.sub("#", texto)
+    return texto + ("..." if cortado else "")
@@ -0,0 +1,191 @@
+"""Montagem do contexto e renderização do HTML das faturas processadas."""
+
+import logging
+import re
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from app.core.services import cache_ativos, metricas
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PADRAO = "core/modelo_fatura.html"
+
+
+class RenderizadorFatura:
+    """
+    Converte o JSON consolidado de uma fatura no HTML final do cliente.
+    Não depende de request: URLs absolutas são montadas a partir de `base_url`,
+    o que permite renderizar tanto na view quanto no worker de lotes.
+    """
+
+    def __init__(self, base_url: str = ''):
+        self.base_url = base_url or ''
+
+    def _build_absolute_uri(self, url: str) -> str:
+        if not self.base_url:
+            return url
+        return urljoin(self.base_url, url)
+
+    def _absolute_static(self, path: str) -> str:
+        """Retorna URL absoluta para um arquivo estático, preferindo a versão com hash."""
+        url = cache_ativos.url_estatica(path)
+        return self._build_absolute_uri(url) if url else ''
+
+    def _absolute_media(self, path: str) -> str:
+        """Retorna URL absoluta para um arquivo em MEDIA_URL."""
+        if not path:
+            return ''
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        base = settings.MEDIA_URL or '/media/'
+        url = f"{base}{path.lstrip('/')}"
+        try:
+            return self._build_absolute_uri(url)
+        except Exception:
+            return url
+
+    def _file_to_data_uri(self, path: str) -> str:
+        """Lê um arquivo local e retorna data URI (útil para garantir renderização offline)."""
+        return cache_ativos.data_uri(path)
+
+    def _build_historico(self, historico_raw):
+        historico = []
+        for item in historico_raw or []:
+            consumo = (item or {}).get('consumo', '')
+            mes = (item or {}).get('mes', '')
+            historico.append(
+                {
+                    'rotulo': mes,
+                    'mes': mes,
+                    'consumo_display': consumo or 'N/A',
+                    'has_consumo': bool(consumo),
+                }
+            )
+        return historico
+
+    def _fallback_consumo_atual(self, data):
+        """Tenta obter consumo atual; se vazio, usa primeiro valor do histórico."""
+        consumo = data.get('consumo_kwh') or data.get('consumo kwh', '')
+        if consumo:
+            return consumo
+        for item in data.get('historico_de_consumo') or data.get('historico de consumo') or []:
+            if not item:
+                continue
+            valor = item.get('consumo') or item.get('consumo kwh')
+            if valor:
+                return valor
+        return ''
+
+    def _simplify_endereco(self, endereco: str) -> str:
+        """
+        Remove partes detalhadas (ex.: quadra/lote) para deixar o endereÇõo mais limpo.
+        Exemplo: "RUA X, 123 - QD 58 LT 04 - 08 103 37 362000 - 79094550 Y"
+        vira "RUA X, 123 - 79094550 Y".
+        """
+        if not endereco:
+            return ''
+
+        parts = [p.strip() for p in endereco.split('-')]
+        filtered = []
+        for part in parts:
+            if not part:
+                continue
+            upper = part.upper()
+            if any(tag in upper for tag in ('QD', 'QUADRA', 'LT', 'LOTE')):
+                continue
+            if re.fullmatch(r'[\d\s]+', part):
+                continue
+            filtered.append(part)
+
+        cleaned = ' - '.join(filtered)
+        cleaned = re.sub(r'\s*\([^)]*\)', '', cleaned)  # remove parenteses extras (ex.: AG: 103)
+        cleaned = ' '.join(cleaned.split())
+        return cleaned.strip(' -')
+
+    def _build_invoice_context(self, data, cliente):
+        historico_raw = data.get('historico_de_consumo') or data.get('historico de consumo')
+        historico_consumo = self._build_historico(historico_raw)
+        consumo_atual = self._fallback_consumo_atual(data)
+        nome_cliente = data.get('nome_do_cliente') or data.get('nome do cliente', '')
+        codigo_uc = data.get('codigo_do_cliente_uc') or data.get('codigo do cliente - uc', '')
+        endereco = self._simplify_endereco(data.get('endereco', ''))
+        data_emissao = data.get('data_de_emissao') or data.get('data de emissao', '')
+        data_vencimento = data.get('data_de_vencimento') or data.get('data de vencimento', '')
+        valor_a_pagar = data.get('valor_a_pagar') or data.get('valor a pagar', '')
+        economia = data.get('economia') or data.get('Economia', '')
+        energia_injetada = data.get('energia_atv_injetada_kwh') or data.get('Energia Atv Injetada', '')
+        preco_unitario = data.get('preco_unitario') or data.get('preco unit com tributos', '')
+        saldo_acumulado = data.get('saldo_acumulado') or data.get('saldo acumulado', '')
+        mes_referencia = data.get('mes_referencia') or data.get('mes de referencia', '')
+        leitura_anterior = data.get('leitura_anterior') or data.get('leitura anterior', '')
+        pix_key = getattr(cliente, 'pix_key', None) or getattr(settings, 'PIX_KEY', 'alpsistemascg@gmail.com')
+        pix_qrcode_url = ''
+        try:
+            if getattr(cliente, 'pix_qrcode', None) and getattr(cliente.pix_qrcode, 'path', None):
+                pix_qrcode_url = self._file_to_data_uri(cliente.pix_qrcode.path)
+            elif getattr(cliente, 'pix_qrcode', None):
+                pix_qrcode_url = self._absolute_media(getattr(cliente.pix_qrcode, 'url', '') or '')
+        except Exception:
+            pix_qrcode_url = ''
+        leitura_atual = data.get('leitura_atual') or data.get('leitura atual', '')
+        return {
+            'logo_path': self._absolute_static('img/logomarca.png'),
+            'qrcode_path': pix_qrcode_url,
+            'pix_key': pix_key,
+            'mes_referencia': mes_referencia,
+            'cliente': {
+                'nome': nome_cliente or getattr(cliente, 'nome', ''),
+                'codigo_uc': codigo_uc,
+                'endereco': endereco,
+            },
+            'fatura': {
+                'data_emissao': data_emissao,
+                'data_vencimento': data_vencimento,
+                'saldo_acumulado_display': saldo_acumulado,
+                'valor_total_display': valor_a_pagar,
+                'leitura_anterior': leitura_anterior,
+                'leitura_atual': leitura_atual,
+                'codigo_barras': '',
+            },
+            'economia_display': economia,
+            'consumo_atual': consumo_atual,
+            'energia_ativa_display': energia_injetada,
+            'preco_unitario_display': preco_unitario,
+            'historico_consumo': historico_consumo,
+            'historico_resumo': '',
+        }
+
+    def _template_name(self, cliente) -> str:
+        template_name = TEMPLATE_PADRAO
+        template_attr = (getattr(cliente, "template_fatura", "") or "").strip()
+        if getattr(cliente, "is_VIP", False) and template_attr:
+            # VIP: usa o template customizado, exceto quando for o modelo padrão
+            if template_attr == "modelo_fatura.html":
+                template_name = TEMPLATE_PADRAO
+            else:
+                template_name = f"faturas/{template_attr}"
+        return template_name
+
+    @metricas.medir(metricas.ETAPA_RENDERIZACAO)
+    def renderizar(self, parsed, cliente):
+        """
+        Renderiza a fatura e retorna (html, nome_para_arquivo).
+        O nome vem do JSON extraído e é usado para nomear o arquivo e sugerir contatos.
+        """
+        context = self._build_invoice_context(parsed, cliente)
+        template_name = self._template_name(cliente)
+        # Força logo específico se o template customizado tiver uma logo própria.
+        if "boeira_padrao.html" in template_name:
+            context["logo_path"] = self._absolute_static("img/boeira_solucoes/boeira_logomarca.jpeg")
+            context["qrcode_path"] = self._absolute_static("img/boeira_solucoes/qrcode_boeira.jpeg")
+            context["pix_key"] = "Reginaldo Boeira Pereira"
+        try:
+            html = render_to_string(template_name, context)
+        except Exception:
+            logger.exception("Falha ao renderizar template %s; usando padrão", template_name)
+            html = render_to_string(TEMPLATE_PADRAO, context)
+        nome_para_arquivo = context.get('cliente', {}).get('nome') or getattr(cliente, 'nome', '')
+        return html, nome_para_arquivo
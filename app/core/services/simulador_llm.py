@@ -0,0 +1,243 @@
+"""
+Simulador local da API de chat da OpenAI, para testes de carga e de regressão.
+
+O simulador responde a `POST .../chat/completions` no formato da OpenAI e pode
+ser usado de duas formas:
+- dentro do processo, como transporte do httpx do cliente da IA (LLM_SIMULADOR=True);
+- como servidor HTTP (`python manage.py simulador_llm`), apontando LLM_BASE_URL para ele.
+
+As respostas são gravadas e reproduzidas por hash do prompt, um arquivo JSON por
+prompt em LLM_SIMULADOR_GRAVACOES. No modo 'gravar' cada requisição é repassada
+ao provedor real (LLM_SIMULADOR_UPSTREAM) e a resposta é salva; no modo
+'reproduzir' nada sai da máquina e prompts sem gravação recebem "{}" (o pipeline
+segue com as dicas de regex). Latência (mediana e p99, distribuição log-normal),
+erros 500 e respostas 429 de limite de taxa são simulados nas proporções configuradas.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODO_REPRODUZIR = "reproduzir"
+MODO_GRAVAR = "gravar"
+MODOS = (MODO_REPRODUZIR, MODO_GRAVAR)
+
+UPSTREAM_PADRAO = "https://api.openai.com/v1"
+# Quantil 0,99 da normal padrão: converte a razão p99/mediana no desvio da log-normal.
+_Z_P99 = 2.3263
+ESPERA_LIMITE_SEGUNDOS = 1
+
+Resposta = Tuple[int, Dict[str, str], bytes]
+Encaminhador = Callable[[bytes, Mapping[str, str]], Tuple[int, bytes]]
+
+
+def chave_prompt(requisicao: Dict[str, Any]) -> str:
+    """Hash das mensagens da requisição (papel + conteúdo), independente do modelo e dos parâmetros."""
+    mensagens = [
+        [mensagem.get("role", ""), mensagem.get("content", "")]
+        for mensagem in requisicao.get("messages") or []
+    ]
+    serializado = json.dumps(mensagens, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+def _json(status: int, dados: Dict[str, Any], cabecalhos: Dict[str, str] | None = None) -> Resposta:
+    corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+    return status, {"content-type": "application/json", **(cabecalhos or {})}, corpo
+
+
+def _erro(status: int, mensagem: str, tipo: str, cabecalhos: Dict[str, str] | None = None) -> Resposta:
+    return _json(status, {"error": {"message": mensagem, "type": tipo, "param": None, "code": tipo}}, cabecalhos)
+
+
+def encaminhar_upstream(upstream: str = "", timeout: float | None = None) -> Encaminhador:
+    """Repassa a requisição ao provedor real; usado no modo 'gravar'."""
+    from app.core.services.processamento_energisa import OPENAI_API_KEY
+
+    url = (upstream or UPSTREAM_PADRAO).rstrip("/") + "/chat/completions"
+    timeout = timeout or float(getattr(settings, "LLM_TIMEOUT", 80))
+
+    def encaminhar(corpo: bytes, cabecalhos: Mapping[str, str]) -> Tuple[int, bytes]:
+        autorizacao = f"Bearer {OPENAI_API_KEY}" if OPENAI_API_KEY else cabecalhos.get("authorization", "")
+        resposta = httpx.post(
+            url,
+            content=corpo,
+            headers={"authorization": autorizacao, "content-type": "application/json"},
+            timeout=timeout,
+        )
+        return resposta.status_code, resposta.content
+
+    return encaminhar
+
+
+class SimuladorLLM:
+    """
+    Gera as respostas do simulador. É seguro entre threads: o sorteio de
+    latência/falhas usa um gerador próprio protegido por lock e a espera
+    acontece fora dele, como em chamadas concorrentes ao provedor.
+    """
+
+    def __init__(
+        self,
+        gravacoes: Path | str,
+        modo: str = MODO_REPRODUZIR,
+        latencia_ms: float = 0.0,
+        latencia_p99_ms: float = 0.0,
+        taxa_erro: float = 0.0,
+        taxa_limite: float = 0.0,
+        semente: int | None = None,
+        encaminhar: Encaminhador | None = None,
+    ):
+        if modo not in MODOS:
+            raise ValueError(f"Modo do simulador inválido: {modo!r} (use {', '.join(MODOS)}).")
+        self.gravacoes = Path(gravacoes)
+        self.modo = modo
+        self.latencia_ms = max(0.0, latencia_ms)
+        self.latencia_p99_ms = max(self.latencia_ms, latencia_p99_ms)
+        self.taxa_erro = min(1.0, max(0.0, taxa_erro))
+        self.taxa_limite = min(1.0, max(0.0, taxa_limite))
+        self.encaminhar = encaminhar
+        if modo == MODO_GRAVAR and encaminhar is None:
+            self.encaminhar = encaminhar_upstream(getattr(settings, "LLM_SIMULADOR_UPSTREAM", ""))
+        self._sorteio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.estatisticas = dict.fromkeys(
+            ("requisicoes", "reproduzidas", "sem_gravacao", "gravadas", "erros_simulados", "limites_simulados"),
+            0,
+        )
+
+    @classmethod
+    def das_configuracoes(cls, **sobrescritas) -> "SimuladorLLM":
+        """Simulador com os parâmetros LLM_SIMULADOR_* do settings (sobrescrevíveis por argumento)."""
+        parametros = {
+            "gravacoes": settings.LLM_SIMULADOR_GRAVACOES,
+            "modo": settings.LLM_SIMULADOR_MODO,
+            "latencia_ms": settings.LLM_SIMULADOR_LATENCIA_MS,
+            "latencia_p99_ms": settings.LLM_SIMULADOR_LATENCIA_P99_MS,
+            "taxa_erro": settings.LLM_SIMULADOR_TAXA_ERRO,
+            "taxa_limite": settings.LLM_SIMULADOR_TAXA_LIMITE,
+            "semente": settings.LLM_SIMULADOR_SEMENTE,
+        }
+        parametros.update({nome: valor for nome, valor in sobrescritas.items() if valor is not None})
+        return cls(**parametros)
+
+    def _contar(self, nome: str) -> None:
+        with self._lock:
+            self.estatisticas[nome] += 1
+
+    def _sortear(self) -> Tuple[float, float, float]:
+        with self._lock:
+            limite, erro = self._sorteio.random(), self._sorteio.random()
+            if not self.latencia_ms:
+                return limite, erro, 0.0
+            sigma = math.log(self.latencia_p99_ms / self.latencia_ms) / _Z_P99
+            return limite, erro, self.latencia_ms * math.exp(self._sorteio.gauss(0.0, sigma))
+
+    def _caminho_gravacao(self, chave: str) -> Path:
+        return self.gravacoes / f"{chave}.json"
+
+    def _ler_gravacao(self, chave: str) -> str | None:
+        try:
+            return json.loads(self._caminho_gravacao(chave).read_text(encoding="utf-8"))["conteudo"]
+        except FileNotFoundError:
+            return None
+
+    def _gravar(self, chave: str, modelo: str, conteudo: str) -> None:
+        self.gravacoes.mkdir(parents=True, exist_ok=True)
+        destino = self._caminho_gravacao(chave)
+        temporario = destino.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temporario.write_text(
+            json.dumps({"modelo": modelo, "gravado_em": int(time.time()), "conteudo": conteudo}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        temporario.replace(destino)
+        self._contar("gravadas")
+
+    def _conclusao(self, modelo: str, conteudo: str, requisicao: Dict[str, Any]) -> Resposta:
+        tokens_prompt = sum(len(str(m.get("content", ""))) for m in requisicao.get("messages") or []) // 4
+        tokens_resposta = len(conteudo) // 4
+        return _json(200, {
+            "id": f"chatcmpl-sim-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": modelo,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": conteudo},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": tokens_prompt,
+                "completion_tokens": tokens_resposta,
+                "total_tokens": tokens_prompt + tokens_resposta,
+            },
+        })
+
+    def responder(self, caminho: str, corpo: bytes, cabecalhos: Mapping[str, str] | None = None) -> Resposta:
+        """Responde a uma requisição HTTP; retorna (status, cabeçalhos, corpo)."""
+        if not caminho.rstrip("/").endswith("/chat/completions"):
+            return _erro(404, f"Rota não suportada pelo simulador: {caminho}", "not_found")
+        try:
+            requisicao = json.loads(corpo or b"{}")
+        except ValueError:
+            return _erro(400, "Corpo da requisição não é um JSON válido.", "invalid_request_error")
+        self._contar("requisicoes")
+
+        limite, erro, espera_ms = self._sortear()
+        # O limite de taxa é recusado na hora, como faz o provedor; as demais respostas esperam a latência.
+        if limite < self.taxa_limite:
+            self._contar("limites_simulados")
+            return _erro(
+                429,
+                "Rate limit reached (simulado).",
+                "rate_limit_exceeded",
+                {"retry-after": str(ESPERA_LIMITE_SEGUNDOS)},
+            )
+        if espera_ms:
+            time.sleep(espera_ms / 1000)
+        if erro < self.taxa_erro:
+            self._contar("erros_simulados")
+            return _erro(500, "The server had an error while processing your request (simulado).", "server_error")
+
+        modelo = requisicao.get("model", "")
+        chave = chave_prompt(requisicao)
+        if self.modo == MODO_GRAVAR:
+            status, resposta = self.encaminhar(corpo, cabecalhos or {})
+            if status == 200:
+                self._gravar(chave, modelo, json.loads(resposta)["choices"][0]["message"]["content"])
+            return status, {"content-type": "application/json"}, resposta
+
+        conteudo = self._ler_gravacao(chave)
+        if conteudo is None:
+            self._contar("sem_gravacao")
+            logger.warning("Simulador da IA: prompt %s sem gravação; respondendo '{}'", chave[:12])
+            conteudo = "{}"
+        else:
+            self._contar("reproduzidas")
+        return self._conclusao(modelo, conteudo, requisicao)
+
+
+class TransporteSimulador(httpx.BaseTransport):
+    """Transporte do httpx que entrega as requisições do cliente da IA ao simulador, sem rede."""
+
+    def __init__(self, simulador: SimuladorLLM):
+        self.simulador = simulador
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        status, cabecalhos, corpo = self.simulador.responder(request.url.path, request.read(), request.headers)
+        return httpx.Response(status, headers=cabecalhos, content=corpo, request=request)
@@ -0,0 +1,128 @@
+"""
+ZIP das faturas processadas gerado em streaming.
+
+As entradas são lidas do banco uma a uma e comprimidas em blocos; cada bloco
+já comprimido é entregue à resposta assim que fica pronto, então a memória
+usada não depende da quantidade de faturas nem do tamanho do arquivo final.
+
+No modo de ativos compartilhados, o CSS embutido (<style>) e as imagens em
+data URI (QR code PIX) de cada fatura vão uma única vez para a pasta `ativos/`
+do ZIP, nomeados pelo hash do conteúdo, e o HTML passa a referenciá-los por
+caminho relativo.
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import re
+import time
+import zipfile
+from typing import Dict, Iterable, Iterator, Tuple
+
+from app.core.models import FaturaProcessada
+
+PASTA_ATIVOS = 'ativos'
+EXTENSOES = {'image/png': 'png', 'image/jpeg': 'jpg', 'image/gif': 'gif', 'image/svg+xml': 'svg', 'image/webp': 'webp'}
+
+_RE_ESTILO = re.compile(r'<style[^>]*>(.*?)</style>', re.IGNORECASE | re.DOTALL)
+_RE_DATA_URI = re.compile(r'data:(image/[\w.+-]+);base64,([A-Za-z0-9+/=\s]+)')
+
+
+class _SaidaStreaming(io.RawIOBase):
+    """Destino não posicionável do ZipFile: acumula só o que ainda não foi entregue."""
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, dados) -> int:
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def drenar(self) -> bytes:
+        dados = b''.join(self._partes)
+        self._partes.clear()
+        return dados
+
+
+def separar_ativos(html: str) -> Tuple[str, Dict[str, bytes]]:
+    """
+    Troca os blocos <style> e as imagens em data URI do HTML por referências a
+    `ativos/<hash>.<ext>`. Retorna o HTML resultante e {caminho: bytes} dos ativos.
+    """
+    ativos: Dict[str, bytes] = {}
+
+    def guardar(conteudo: bytes, extensao: str) -> str:
+        caminho = f'{PASTA_ATIVOS}/{hashlib.sha256(conteudo).hexdigest()[:16]}.{extensao}'
+        ativos[caminho] = conteudo
+        return caminho
+
+    def trocar_estilo(m) -> str:
+        return f'<link rel="stylesheet" href="{guardar(m.group(1).encode("utf-8"), "css")}" />'
+
+    def trocar_imagem(m) -> str:
+        try:
+            conteudo = base64.b64decode(m.group(2), validate=False)
+        except (binascii.Error, ValueError):
+            return m.group(0)
+        return guardar(conteudo, EXTENSOES.get(m.group(1).lower(), 'bin'))
+
+    html = _RE_ESTILO.sub(trocar_estilo, html)
+    html = _RE_DATA_URI.sub(trocar_imagem, html)
+    return html, ativos
+
+
+def _novo_info(nome: str) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(nome, date_time=time.localtime()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def gerar_zip_faturas(
+    arquivos: Iterable[Tuple[int, str]],
+    cliente,
+    remover_ao_final: bool = False,
+    ativos_compartilhados: bool = False,
+) -> Iterator[bytes]:
+    """
+    Gera o ZIP de (id, nome) das faturas do cliente, na ordem recebida.
+    Sem `seek`, o zipfile grava tamanhos e CRC em descritores após cada entrada.
+    Com `remover_ao_final`, as faturas são apagadas só depois do download completo.
+    Com `ativos_compartilhados`, CSS e imagens embutidos vão uma vez para `ativos/`
+    (ver `separar_ativos`); cada fatura é lida inteira, uma de cada vez.
+    """
+    ids = []
+    gravados = set()
+    saida = _SaidaStreaming()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for pk, nome in arquivos:
+            fatura = FaturaProcessada.objects.filter(pk=pk, cliente=cliente).only('conteudo').first()
+            if fatura is None:
+                continue
+            ids.append(pk)
+            if ativos_compartilhados:
+                html, ativos = separar_ativos(fatura.html)
+                for caminho, conteudo in ativos.items():
+                    if caminho not in gravados:
+                        gravados.add(caminho)
+                        zf.writestr(_novo_info(caminho), conteudo)
+                blocos = (html.encode('utf-8'),)
+            else:
+                blocos = fatura.html_em_blocos()
+            with zf.open(_novo_info(nome or 'fatura.html'), 'w') as destino:
+                for bloco in blocos:
+                    destino.write(bloco)
+                    dados = saida.drenar()
+                    if dados:
+                        yield dados
+            del fatura, blocos
+            dados = saida.drenar()
+            if dados:
+                yield dados
+    yield saida.drenar()
+
+    if remover_ao_final and ids:
+        FaturaProcessada.objects.filter(pk__in=ids, cliente=cliente).only('pk').delete()
@@ -1,3 +1,1130 @@
-from django.test import TestCase
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+import zipfile
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import pdfplumber
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from app.core.benchmarks.calculos import calcular_decimal, linhas_sinteticas
+from app.core.benchmarks.corpus import gerar_corpus, gerar_pdf
+from app.core.benchmarks.deteccao import deteccao_referencia, textos_corpus
+from app.core.benchmarks.hints import hints_por_funcoes, texto_sintetico
+from app.core.benchmarks.pipeline import ETAPAS, comparar_com_baseline, medir_pipeline
+from app.core.calculos.diretrizes import compilar_diretrizes
+from app.core.calculos.factory import get_politica
+from app.core.detectors.cpfl import CPFLDetector
+from app.core.detectors.enel import EnelDetector
+from app.core.detectors.energisa import EnergisaDetector
+from app.core.detectors.registry import FIRST_CHUNK_SIZE, DetectorRegistry
+from app.core.detectors.service import detect_concessionaria
+from app.core.extratores.base import DocumentoPDF
+from app.core.extratores.factory import get_extrator
+from app.core.extratores.layout import IndicePagina
+from app.core.extratores.pdfium import PdfiumExtrator
+from app.core.extratores.plumber import PdfplumberExtrator
+from app.core.models import (
+    ArquivoLote,
+    Cliente,
+    ClienteContato,
+    CreditHistory,
+    FaturaProcessada,
+    LoteProcessamento,
+    MetricasProcesso,
+)
+from app.core.provedores_lote.local import LocalProvedorLote
+from app.core.services import cache_ativos, cache_faturas, envio_email, lotes, metricas, processamento_energisa
+from app.core.services.processamento_fatura import PDFNaoReconhecido, extrair_e_detectar, processar_fatura
+from app.core.services.renderizacao import RenderizadorFatura
+from app.core.services.simulador_llm import MODO_GRAVAR, SimuladorLLM, chave_prompt
+from app.core.services.zip_faturas import gerar_zip_faturas
+
+
+FATURA_ENERGISA = [
+    [
+        "ENERGISA MATO GROSSO DO SUL DANF3E",
+        "FULANO DE TAL 10/09/2025",
+        "RUA DAS FLORES, 123 - 79000000 CAMPO GRANDE",
+        "UC 10/12345678-9 DATA DE EMISSÃO:10/09/2025",
+        "SETEMBRO / 2025 18/09/2025",
+        "Leitura Anterior:07/08/2025 Leitura Atual:09/09/2025",
+        "Itens da Fatura",
+        "Consumo em kWh KWH 385,00 1,108630 426,82",
+        "Energia Atv Injetada GDI KWH 335,00 1,108630 -371,39",
+        "Consumo dos últimos 13 meses",
+    ],
+    [
+        "SET/25 385,00 AGO/25 305,00 JUL/25 330,00",
+        "Saldo Acumulado 120,00",
+    ],
+]
+
+
+class ExtracaoUnicaTests(SimpleTestCase):
+    def test_processar_fatura_abre_o_pdf_uma_unica_vez(self):
+        pdf = io.BytesIO(gerar_pdf(FATURA_ENERGISA))
+        cliente = Cliente(nome="Teste", prompt_template="")
+
+        with mock.patch("pdfplumber.open", wraps=pdfplumber.open) as aberturas, \
+                mock.patch.object(processamento_energisa, "call_llm_fatura", return_value={}) as llm:
+            contexto = processar_fatura(pdf, cliente)
+
+        self.assertEqual(aberturas.call_count, 1)
+        self.assertEqual(contexto["concessionaria"], "ENERGISA")
+        texto_enviado = llm.call_args.args[0]
+        self.assertIn("Energia Atv Injetada", texto_enviado)
+        self.assertEqual(contexto["dados"]["codigo_do_cliente_uc"], "10/12345678-9")
+        self.assertEqual(contexto["dados"]["energia_atv_injetada_valor"], "371,39")
+
+    def test_documento_mantem_texto_por_pagina_e_palavras(self):
+        documento = processamento_energisa.extrair_documento(io.BytesIO(gerar_pdf(FATURA_ENERGISA)))
+
+        self.assertEqual(documento.num_paginas, 2)
+        self.assertEqual(len(documento.palavras), 2)
+        self.assertIn("x0", documento.palavras[0][0])
+        self.assertEqual(documento.texto, "\n".join(documento.paginas))
+        self.assertIn("DATA DE EMISSÃO:10/09/2025", documento.paginas[0])
+
+
+class ExtratoresTests(SimpleTestCase):
+    def test_pdfium_produz_as_mesmas_dicas_que_pdfplumber(self):
+        pdf = gerar_pdf(FATURA_ENERGISA)
+        referencia = PdfplumberExtrator().extrair(io.BytesIO(pdf))
+        rapido = PdfiumExtrator().extrair(io.BytesIO(pdf))
+
+        self.assertEqual(rapido.num_paginas, 2)
+        self.assertEqual(
+            processamento_energisa.montar_hints(rapido.texto),
+            processamento_energisa.montar_hints(referencia.texto),
+        )
+
+    @override_settings(PDF_EXTRATOR="pdfplumber", PDF_EXTRATOR_POR_CONCESSIONARIA={"ENERGISA": "pdfium"})
+    def test_backend_por_concessionaria(self):
+        self.assertEqual(get_extrator().name, "pdfplumber")
+        self.assertEqual(get_extrator(concessionaria="energisa").name, "pdfium")
+        self.assertEqual(get_extrator(concessionaria="CPFL").name, "pdfplumber")
+
+
+def _palavra(texto, x0, top):
+    return {"text": texto, "x0": x0, "x1": x0 + 6 * len(texto), "top": top, "bottom": top + 9}
+
+
+class LayoutTests(SimpleTestCase):
+    def test_indice_por_regiao(self):
+        indice = IndicePagina([
+            _palavra("Atual:09/09/2025", 100, 20.5),
+            _palavra("Leitura", 40, 20),
+            _palavra("Leitura", 40, 40),
+            _palavra("Anterior:", 90, 40),
+            _palavra("07/08/2025", 150, 41),
+            _palavra("rodapé", 40, 700),
+        ])
+
+        atual, = indice.rotulos("Leitura Atual:")
+        self.assertEqual(atual.resto, "09/09/2025")
+        anterior, = indice.rotulos("leitura anterior:")
+        self.assertEqual([p["text"] for p in indice.a_direita(anterior)], ["07/08/2025"])
+        self.assertEqual([p["text"] for p in indice.na_regiao(0, 30, 120, 60)], ["Leitura", "Anterior:"])
+        self.assertEqual([len(linha) for linha in indice.linhas_abaixo(atual)], [3, 1])
+        self.assertEqual(indice.rotulos("Saldo Acumulado"), [])
+
+    def test_dicas_por_regiao(self):
+        documento = PdfplumberExtrator().extrair(io.BytesIO(gerar_pdf(FATURA_ENERGISA)))
+        por_regiao = processamento_energisa.montar_hints(documento.texto, documento)
+        por_regex = processamento_energisa.montar_hints(documento.texto)
+        self.assertEqual(por_regiao.pop("energia_atv_injetada_kwh_itens"), 335.0)
+        self.assertEqual(por_regex.pop("energia_atv_injetada_kwh_itens"), 0.0)
+        self.assertEqual(por_regiao, por_regex)
+
+        # Descrição e colunas em linhas separadas: a linha de continuação é juntada à anterior.
+        paginas = [FATURA_ENERGISA[0][:8] + ["Energia Atv Injetada GDI", "KWH 335,00 1,108630 -371,39"] + FATURA_ENERGISA[0][9:]]
+        documento = PdfplumberExtrator().extrair(io.BytesIO(gerar_pdf(paginas + FATURA_ENERGISA[1:])))
+        self.assertEqual(
+            processamento_energisa.linhas_itens_layout(documento)[-1],
+            "Energia Atv Injetada GDI KWH 335,00 1,108630 -371,39",
+        )
+        with mock.patch.object(processamento_energisa, "extrair_leituras", side_effect=AssertionError("regex")), \
+                mock.patch.object(processamento_energisa, "extrair_saldo_acumulado", side_effect=AssertionError("regex")):
+            hints = processamento_energisa.montar_hints(documento.texto, documento)
+        self.assertEqual((hints["leitura_anterior"], hints["leitura_atual"]), ("07/08/2025", "09/09/2025"))
+        self.assertEqual(hints["energia_atv_injetada_valor"], "371,39")
+        self.assertEqual(hints["saldo_acumulado"], "120,00")
+
+
+class MontarHintsTests(SimpleTestCase):
+    def test_resultado_identico_a_implementacao_de_referencia(self):
+        textos = [
+            "\n".join(" ".join(pagina) for pagina in FATURA_ENERGISA),
+            texto_sintetico(0),
+            texto_sintetico(3),
+            texto_sintetico(8).replace("Consumo dos últimos 13 meses", "NOTA FISCAL"),
+            texto_sintetico().replace("SETEMBRO / 2025", "Referente a: SETEMBRO/2025"),
+            "",
+        ]
+        for texto in textos:
+            with self.subTest(texto=texto[:40]):
+                self.assertEqual(processamento_energisa.montar_hints(texto), hints_por_funcoes(texto))
+
+
+def documento_de(paginas):
+    return DocumentoPDF(paginas=[" ".join(linhas) for linhas in paginas])
+
+
+FATURA_ENERGISA_COMPLETA = [
+    [linha.replace("SETEMBRO / 2025 18/09/2025", "SETEMBRO / 2025 SET/2025 18/09/2025") for linha in FATURA_ENERGISA[0]],
+    FATURA_ENERGISA[1],
+]
+
+
+class CaminhoSemIATests(SimpleTestCase):
+    def processar(self, paginas, **campos_cliente):
+        campos_cliente.setdefault("modo_extracao", Cliente.MODO_EXTRACAO_AUTOMATICO)
+        cliente = Cliente(nome="Teste", **campos_cliente)
+        with mock.patch.object(processamento_energisa, "call_llm_fatura", return_value={}) as llm:
+            contexto = processamento_energisa.processar(None, cliente, documento=documento_de(paginas))
+        return contexto["dados"], llm
+
+    def test_dicas_consistentes_dispensam_a_ia(self):
+        dados, llm = self.processar(FATURA_ENERGISA_COMPLETA)
+
+        llm.assert_not_called()
+        self.assertEqual(dados["caminho_extracao"], processamento_energisa.CAMINHO_REGEX)
+        self.assertEqual(dados["data_de_vencimento"], "18/09/2025")
+        self.assertEqual(dados["energia_atv_injetada_kwh"], "335,00")
+        self.assertEqual(dados["economia"], "111,42")
+        self.assertEqual(dados["valor_a_pagar"], "259,97")
+
+    def test_quadro_de_itens_lido_uma_vez_e_fora_do_prompt(self):
+        with mock.patch.object(
+            processamento_energisa, "linhas_itens_layout", wraps=processamento_energisa.linhas_itens_layout
+        ) as linhas:
+            dados, _ = self.processar(FATURA_ENERGISA_COMPLETA)
+        linhas.assert_called_once()
+        self.assertEqual(dados["caminho_extracao"], processamento_energisa.CAMINHO_REGEX)
+
+        documento = documento_de(FATURA_ENERGISA_COMPLETA)
+        hints = processamento_energisa.montar_hints(documento.texto, documento)
+        prompt = processamento_energisa.montar_prompt(documento.texto, hints)
+        self.assertNotIn("energia_atv_injetada_kwh_itens", prompt)
+
+    def test_ia_e_chamada_quando_algo_nao_confere(self):
+        inconsistente = [
+            [linha.replace("-371,39", "-300,00") for linha in FATURA_ENERGISA_COMPLETA[0]],
+            FATURA_ENERGISA_COMPLETA[1],
+        ]
+        casos = {
+            "valor injetado diferente de kWh x preço": (inconsistente, {}),
+            "vencimento ausente": (FATURA_ENERGISA, {}),
+            "diretrizes próprias do cliente": (FATURA_ENERGISA_COMPLETA, {"prompt_template": "economia = 40%"}),
+            "modo sempre IA": (FATURA_ENERGISA_COMPLETA, {"modo_extracao": Cliente.MODO_EXTRACAO_IA}),
+        }
+        for descricao, (paginas, campos) in casos.items():
+            with self.subTest(descricao):
+                dados, llm = self.processar(paginas, **campos)
+                llm.assert_called_once()
+                self.assertEqual(dados["caminho_extracao"], processamento_energisa.CAMINHO_IA)
+
+
+@mock.patch.object(processamento_energisa, "_codificador", return_value=None)
+class RecorteTextoIATests(SimpleTestCase):
+    def test_fatura_longa_e_reduzida_as_secoes_relevantes(self, _codificador):
+        avisos = "Reservado ao fisco 5F2A.9C1E.77B3.0D44.A2C9 " * 150
+        texto = texto_sintetico(3).replace("Consumo dos últimos 13 meses", avisos + "Consumo dos últimos 13 meses")
+
+        with self.assertLogs(processamento_energisa.logger, "INFO") as logs:
+            recortado = processamento_energisa.recortar_texto_para_ia(texto, limite_tokens=600)
+
+        self.assertLessEqual(processamento_energisa.contar_tokens(recortado), 600)
+        self.assertIn(processamento_energisa.MARCADOR_RECORTE, recortado)
+        self.assertEqual(processamento_energisa.montar_hints(recortado), processamento_energisa.montar_hints(texto))
+        self.assertIn("antes do recorte", logs.output[0])
+
+    def test_texto_dentro_do_limite_nao_e_alterado(self, _codificador):
+        texto = texto_sintetico(1)
+        self.assertEqual(processamento_energisa.recortar_texto_para_ia(texto, limite_tokens=5000), texto)
+        self.assertEqual(processamento_energisa.recortar_texto_para_ia(texto, limite_tokens=0), texto)
+
+
+class ClienteLLMTests(SimpleTestCase):
+    def test_cliente_unico_compartilhado_entre_threads(self):
+        obtidos = []
+        with mock.patch.object(processamento_energisa, "_llm", None), \
+                mock.patch.object(processamento_energisa, "OPENAI_API_KEY", "sk-teste"):
+            threads = [
+                threading.Thread(target=lambda: obtidos.append(processamento_energisa.obter_llm()))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        clientes = {id(llm) for llm, _ in obtidos}
+        self.assertEqual(len(clientes), 1)
+        self.assertEqual(sum(1 for _, criado in obtidos if criado), 1)
+        self.assertIsInstance(obtidos[0][0].http_client, httpx.Client)
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "faturas": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "cache-testes"},
+})
+class CacheFaturasTests(SimpleTestCase):
+    def setUp(self):
+        caches["faturas"].clear()
+
+    def obter(self, pdf, prompt="", modo=Cliente.MODO_EXTRACAO_IA):
+        return cache_faturas.obter_ou_processar(io.BytesIO(pdf), prompt, self.produtor, modo_extracao=modo)
+
+    def test_pdf_identico_processado_uma_vez(self):
+        self.produtor = mock.Mock(return_value={"nome_do_cliente": "FULANO"})
+        antes = cache_faturas.estatisticas()
+
+        primeiro = self.obter(gerar_pdf(FATURA_ENERGISA))
+        segundo = self.obter(gerar_pdf(FATURA_ENERGISA))
+
+        self.produtor.assert_called_once_with()
+        self.assertEqual(primeiro, segundo)
+        depois = cache_faturas.estatisticas()
+        self.assertEqual((depois["misses"] - antes["misses"], depois["hits"] - antes["hits"]), (1, 1))
+
+    def test_prompt_modelo_ou_modo_diferente_processa_de_novo(self):
+        self.produtor = mock.Mock(return_value={})
+        pdf = gerar_pdf(FATURA_ENERGISA)
+        self.obter(pdf)
+        self.obter(pdf, prompt="Economia = consumo_kwh")
+        self.obter(pdf, modo=Cliente.MODO_EXTRACAO_AUTOMATICO)
+        with mock.patch.object(processamento_energisa, "OPENAI_MODEL", "outro-modelo"):
+            self.obter(pdf)
+        self.obter(pdf)
+
+        self.assertEqual(self.produtor.call_count, 4)
+
+
+class LotesTestCase(TestCase):
+    def setUp(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        self.diretorio_lotes = Path(pasta) / "lote_ia"
+        configuracao = override_settings(
+            MEDIA_ROOT=str(Path(pasta) / "media"),
+            CACHES={
+                "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+                "faturas": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "offline"},
+            },
+            LLM_LOTE_PROVEDOR="local",
+            LLM_LOTE_DIRETORIO=str(self.diretorio_lotes),
+            LLM_LOTE_INTERVALO_CONSULTA=0,
+        )
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        caches["faturas"].clear()
+
+        # As threads do pool gravam o andamento dos arquivos. Como no LiveServerTestCase, elas
+        # usam a conexão do teste: o banco em memória trava para outras conexões enquanto a
+        # transação do teste estiver aberta.
+        conexao = connections["default"]
+        conexao.inc_thread_sharing()
+        self.addCleanup(conexao.dec_thread_sharing)
+        extrair_dados = lotes._extrair_dados
+
+        def extrair_com_a_conexao_do_teste(*args):
+            connections["default"] = conexao
+            return extrair_dados(*args)
+
+        compartilhar = mock.patch.object(lotes, "_extrair_dados", side_effect=extrair_com_a_conexao_do_teste)
+        compartilhar.start()
+        self.addCleanup(compartilhar.stop)
+
+    def criar_lote(self, cliente, paginas_por_arquivo, **kwargs):
+        return lotes.criar_lote(
+            cliente,
+            [SimpleUploadedFile(f"fatura_{n}.pdf", gerar_pdf(paginas)) for n, paginas in enumerate(paginas_por_arquivo)],
+            **kwargs,
+        )
+
+
+class FilaLotesTests(LotesTestCase):
+    def test_worker_uma_vez_conclui_lote_pendente_debita_e_apaga_pdfs(self):
+        cliente = Cliente.objects.create(nome="Fila", email="fila@example.com", saldo_atual=Decimal("10"))
+        lote = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA, FATURA_ENERGISA])
+        caminhos = [arquivo.pdf.path for arquivo in lote.arquivos.all()]
+
+        with mock.patch.object(processamento_energisa, "call_llm_fatura", return_value={}):
+            call_command("processar_lotes", "--uma-vez", stdout=io.StringIO())
+
+        lote.refresh_from_db()
+        cliente.refresh_from_db()
+        self.assertEqual(lote.status, LoteProcessamento.STATUS_CONCLUIDO)
+        self.assertEqual(
+            list(lote.arquivos.order_by("ordem").values_list("status", flat=True)),
+            [ArquivoLote.STATUS_PROCESSADO] * 2,
+        )
+        self.assertEqual(cliente.saldo_atual, Decimal("8"))
+        self.assertEqual(CreditHistory.objects.get(cliente=cliente).amount, Decimal("-2"))
+        self.assertFalse(lote.arquivos.exclude(pdf="").exists())
+        self.assertFalse(any(os.path.exists(caminho) for caminho in caminhos))
+
+    def test_lote_reservado_por_outro_worker_nao_e_processado_de_novo(self):
+        cliente = Cliente.objects.create(nome="Fila", email="fila@example.com", saldo_atual=Decimal("10"))
+        lote = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA])
+
+        self.assertEqual(lotes.reservar_proximo_lote().pk, lote.pk)
+        self.assertIsNone(lotes.reservar_proximo_lote())
+        saida = io.StringIO()
+        call_command("processar_lotes", "--uma-vez", stdout=saida)
+
+        self.assertEqual(saida.getvalue(), "")
+        lote.refresh_from_db()
+        self.assertEqual(lote.status, LoteProcessamento.STATUS_PROCESSANDO)
+        self.assertEqual(lote.arquivos.get().status, ArquivoLote.STATUS_PENDENTE)
+
+    def test_falha_no_lote_nao_derruba_o_worker_e_encerra_o_lote(self):
+        cliente = Cliente.objects.create(nome="Fila", email="fila@example.com", saldo_atual=Decimal("10"))
+        com_falha = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA, FATURA_ENERGISA])
+        seguinte = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA])
+        processar_lote = lotes.processar_lote
+
+        def processar(lote):
+            if lote.pk == com_falha.pk:
+                raise RuntimeError("banco indisponível")
+            processar_lote(lote)
+
+        saida = io.StringIO()
+        with mock.patch("app.core.management.commands.processar_lotes.processar_lote", side_effect=processar), \
+                mock.patch.object(processamento_energisa, "call_llm_fatura", return_value={}), \
+                self.assertLogs("app.core", "ERROR"):
+            call_command("processar_lotes", "--uma-vez", stdout=saida)
+
+        self.assertIn(f"Lote {com_falha.pk} encerrado com erro.", saida.getvalue())
+        com_falha.refresh_from_db()
+        seguinte.refresh_from_db()
+        self.assertEqual((com_falha.status, seguinte.status), (LoteProcessamento.STATUS_CONCLUIDO,) * 2)
+        self.assertEqual(set(com_falha.arquivos.values_list("status", flat=True)), {ArquivoLote.STATUS_ERRO})
+        self.assertFalse(com_falha.arquivos.exclude(pdf="").exists())
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.saldo_atual, Decimal("9"))
+
+    @override_settings(LOTE_PROCESSAMENTO_TIMEOUT=600)
+    def test_lote_travado_em_processando_e_encerrado_apos_o_timeout(self):
+        cliente = Cliente.objects.create(nome="Fila", email="fila@example.com", saldo_atual=Decimal("10"))
+        travado = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA, FATURA_ENERGISA, FATURA_ENERGISA])
+        ativo = self.criar_lote(cliente, [FATURA_ENERGISA_COMPLETA])
+        # Worker morto no meio: uma fatura gerada, uma em andamento e uma pendente.
+        fatura = FaturaProcessada(cliente=cliente, nome="fatura_0.html", original_name="fatura_0.pdf")
+        fatura.html = "<html></html>"
+        fatura.save()
+        travado.arquivos.filter(ordem=0).update(status=ArquivoLote.STATUS_PROCESSADO, fatura=fatura)
+        travado.arquivos.filter(ordem=1).update(status=ArquivoLote.STATUS_PROCESSANDO)
+        antigo = timezone.now() - timedelta(minutes=30)
+        travado.arquivos.update(updated_at=antigo)
+        LoteProcessamento.objects.filter(pk=travado.pk).update(status=LoteProcessamento.STATUS_PROCESSANDO, iniciado_em=antigo)
+        # Mesmo começando há muito tempo, um lote com arquivos gravados há pouco segue com o seu worker.
+        LoteProcessamento.objects.filter(pk=ativo.pk).update(status=LoteProcessamento.STATUS_PROCESSANDO, iniciado_em=antigo)
+
+        saida = io.StringIO()
+        with self.assertLogs(lotes.logger, "WARNING"):
+            call_command("processar_lotes", "--uma-vez", stdout=saida)
+
+        self.assertIn("1 lote(s) travado(s) encerrado(s).", saida.getvalue())
+        self.assertEqual(lotes.recuperar_lotes_travados(), 0)
+        travado.refresh_from_db()
+        ativo.refresh_from_db()
+        self.assertEqual((travado.status, ativo.status), (LoteProcessamento.STATUS_CONCLUIDO, LoteProcessamento.STATUS_PROCESSANDO))
+        self.assertEqual(
+            list(travado.arquivos.order_by("ordem").values_list("status", flat=True)),
+            [ArquivoLote.STATUS_PROCESSADO, ArquivoLote.STATUS_ERRO, ArquivoLote.STATUS_ERRO],
+        )
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.saldo_atual, Decimal("9"))
+
+    def test_status_do_lote_por_arquivo_e_restrito_ao_dono(self):
+        usuarios = get_user_model().objects
+        dono = Cliente.objects.create(user=usuarios.create_user("dono", password="x"), nome="Dono", email="dono@example.com")
+        outro = Cliente.objects.create(user=usuarios.create_user("outro", password="x"), nome="Outro", email="outro@example.com")
+        lote = self.criar_lote(dono, [FATURA_ENERGISA_COMPLETA, FATURA_ENERGISA])
+        primeiro = lote.arquivos.get(ordem=0)
+        primeiro.status = ArquivoLote.STATUS_ERRO
+        primeiro.erro = "PDF ilegível"
+        primeiro.save()
+
+        self.client.force_login(dono.user)
+        dados = self.client.get(reverse("core:lote_status", args=[lote.pk])).json()
+        self.assertEqual((dados["status"], dados["total"], dados["finalizados"]), (LoteProcessamento.STATUS_PENDENTE, 2, 1))
+        self.assertEqual(
+            [(a["nome_original"], a["status"], a["erro"]) for a in dados["arquivos"]],
+            [("fatura_0.pdf", ArquivoLote.STATUS_ERRO, "PDF ilegível"), ("fatura_1.pdf", ArquivoLote.STATUS_PENDENTE, "")],
+        )
+
+        self.client.force_login(outro.user)
+        self.assertEqual(self.client.get(reverse("core:lote_status", args=[lote.pk])).status_code, 404)
+
+
+class LoteConcorrenteTests(LotesTestCase):
+    @override_settings(LLM_MAX_CONCORRENCIA=2)
+    def test_andamento_por_arquivo_e_erro_isolado_com_mais_arquivos_que_workers(self):
+        cliente = Cliente.objects.create(nome="Concorrente", email="concorrente@example.com", saldo_atual=Decimal("10"))
+        lote = self.criar_lote(cliente, [[[*FATURA_ENERGISA[0], f"ARQUIVO {n}"]] for n in range(5)])
+        inicio = threading.Barrier(2, timeout=5)
+        fotografado = threading.Event()
+        andamento = {}
+
+        def status():
+            return list(lote.arquivos.order_by("ordem").values_list("status", flat=True))
+
+        def processar(pdf, cliente):
+            nome = Path(pdf).stem
+            if nome.startswith(("fatura_0", "fatura_1")):
+                inicio.wait()
+            if nome.startswith("fatura_0"):
+                # Só os dois arquivos com worker estão em andamento; os demais esperam na fila.
+                andamento["no_inicio"] = status()
+                fotografado.set()
+                # O primeiro arquivo é o mais lento: os outros são gravados antes dele.
+                limite = time.monotonic() + 5
+                while status()[1:].count(ArquivoLote.STATUS_PENDENTE) + status()[1:].count(ArquivoLote.STATUS_PROCESSANDO):
+                    self.assertLess(time.monotonic(), limite)
+                    time.sleep(0.01)
+                andamento["antes_do_primeiro"] = status()
+            if nome.startswith("fatura_1"):
+                fotografado.wait(5)
+                raise ValueError("PDF corrompido")
+            return {"dados": {"nome_do_cliente": nome[:8].upper()}}
+
+        with mock.patch.object(lotes, "processar_fatura", side_effect=processar), self.assertLogs(lotes.logger, "ERROR"):
+            lotes.processar_lote(lote)
+
+        processado, erro = ArquivoLote.STATUS_PROCESSADO, ArquivoLote.STATUS_ERRO
+        self.assertEqual(andamento["no_inicio"], [ArquivoLote.STATUS_PROCESSANDO] * 2 + [ArquivoLote.STATUS_PENDENTE] * 3)
+        self.assertEqual(andamento["antes_do_primeiro"], [ArquivoLote.STATUS_PROCESSANDO, erro, processado, processado, processado])
+        arquivos = list(lote.arquivos.select_related("fatura").order_by("ordem"))
+        self.assertEqual([a.status for a in arquivos], [processado, erro, processado, processado, processado])
+        self.assertEqual(arquivos[1].erro, "PDF corrompido")
+        self.assertEqual(
+            [a.fatura.contact_name for a in arquivos if a.fatura],
+            ["FATURA_0", "FATURA_2", "FATURA_3", "FATURA_4"],
+        )
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.saldo_atual, Decimal("6"))
+
+
+class ModoOfflineTests(LotesTestCase):
+    def test_lote_offline_envia_so_o_que_precisa_da_ia_e_ingere_as_respostas(self):
+        cliente = Cliente.objects.create(
+            nome="Offline", email="offline@example.com", saldo_atual=Decimal("10"),
+            modo_extracao=Cliente.MODO_EXTRACAO_AUTOMATICO,
+        )
+        lote = lotes.criar_lote(
+            cliente,
+            [
+                SimpleUploadedFile("completa.pdf", gerar_pdf(FATURA_ENERGISA_COMPLETA)),
+                SimpleUploadedFile("sem_vencimento.pdf", gerar_pdf(FATURA_ENERGISA)),
+            ],
+            modo=LoteProcessamento.MODO_OFFLINE,
+        )
+
+        with mock.patch.object(processamento_energisa, "call_llm_fatura") as llm:
+            lotes.processar_lote(lote)
+        llm.assert_not_called()
+
+        lote.refresh_from_db()
+        completa, sem_vencimento = lote.arquivos.order_by("ordem")
+        self.assertEqual(lote.status, LoteProcessamento.STATUS_AGUARDANDO_IA)
+        self.assertEqual(completa.status, ArquivoLote.STATUS_PROCESSADO)
+        self.assertEqual(sem_vencimento.status, ArquivoLote.STATUS_PROCESSANDO)
+        with open(self.diretorio_lotes / lote.lote_ia_id / "input.jsonl", encoding="utf-8") as fh:
+            requisicoes = [json.loads(linha) for linha in fh]
+        self.assertEqual([r["custom_id"] for r in requisicoes], [str(sem_vencimento.pk)])
+        self.assertEqual(requisicoes[0]["url"], "/v1/chat/completions")
+
+        provedor = LocalProvedorLote(respondedor=lambda corpo: json.dumps({"data_de_vencimento": "18/09/2025"}))
+        with mock.patch.object(lotes, "get_provedor_lote", return_value=provedor):
+            self.assertEqual(lotes.coletar_lotes_offline(), 1)
+
+        lote.refresh_from_db()
+        sem_vencimento.refresh_from_db()
+        cliente.refresh_from_db()
+        self.assertEqual(lote.status, LoteProcessamento.STATUS_CONCLUIDO)
+        self.assertEqual(sem_vencimento.status, ArquivoLote.STATUS_PROCESSADO)
+        self.assertIsNone(sem_vencimento.dados_extracao)
+        self.assertEqual(cliente.saldo_atual, Decimal("8"))
+        chave = cache_faturas.chave_cache(
+            cache_faturas.sha256_pdf(io.BytesIO(gerar_pdf(FATURA_ENERGISA))),
+            cliente.prompt_template,
+            modo_extracao=cliente.modo_extracao,
+        )
+        resultado = cache_faturas.consultar(chave)
+        self.assertEqual(resultado["caminho_extracao"], processamento_energisa.CAMINHO_IA)
+        self.assertEqual(resultado["data_de_vencimento"], "18/09/2025")
+
+
+@override_settings(UPLOAD_FATURA_MAX_BYTES=4000, UPLOAD_LOTE_MAX_BYTES=10000)
+class FaturaUploadHandlerTests(SimpleTestCase):
+    def test_pdfs_vao_para_disco_com_hash_e_limites_sao_aplicados(self):
+        pdf = gerar_pdf(FATURA_ENERGISA)
+        grande = pdf + b"%" + b"0" * 5000
+        request = RequestFactory().post("/", {
+            "action": "process_files",
+            "invoice_files": [
+                SimpleUploadedFile("fatura.pdf", pdf),
+                SimpleUploadedFile("planilha.pdf", b"nome;valor\n"),
+                SimpleUploadedFile("grande.pdf", grande),
+            ],
+        })
+
+        arquivos = request.FILES.getlist("invoice_files")
+
+        self.assertEqual([f.name for f in arquivos], ["fatura.pdf"])
+        self.assertTrue(Path(arquivos[0].temporary_file_path()).exists())
+        self.assertEqual(arquivos[0].sha256, hashlib.sha256(pdf).hexdigest())
+        self.assertEqual(arquivos[0].read(), pdf)
+        self.assertEqual([nome for nome, _ in request.faturas_recusadas], ["planilha.pdf", "grande.pdf"])
+        self.assertEqual(request.POST["action"], "process_files")
+
+
+class SessaoFaturasTests(TestCase):
+    def setUp(self):
+        usuarios = get_user_model().objects
+        self.cliente = Cliente.objects.create(
+            user=usuarios.create_user("sessao", password="x"), nome="Sessao", email="sessao@example.com", is_VIP=True,
+        )
+        self.contato = ClienteContato.objects.create(cliente=self.cliente, nome="Ana", email="ana@example.com")
+        outro = Cliente.objects.create(user=usuarios.create_user("alheio", password="x"), nome="Alheio", email="alheio@example.com")
+        self.alheia = self.fatura(outro, "alheia")
+        self.client.force_login(self.cliente.user)
+
+    def fatura(self, cliente, nome, **campos):
+        fatura = FaturaProcessada(cliente=cliente, nome=f"{nome}.html", **campos)
+        fatura.html = f"<html>MARCA-{nome}</html>"
+        fatura.save()
+        return fatura
+
+    def test_sessao_guarda_so_ids_do_lote_concluido_e_html_fica_comprimido(self):
+        lote = LoteProcessamento.objects.create(cliente=self.cliente, status=LoteProcessamento.STATUS_CONCLUIDO)
+        faturas = [self.fatura(self.cliente, f"f{n}") for n in range(2)]
+        for ordem, fatura in enumerate(faturas):
+            ArquivoLote.objects.create(
+                lote=lote, ordem=ordem, nome_original=f"f{ordem}.pdf", status=ArquivoLote.STATUS_PROCESSADO, fatura=fatura,
+            )
+        self.client.get(reverse("core:processamento"))
+
+        sessao = self.client.session
+        self.assertEqual(sessao["processed_file_ids"], [f.pk for f in faturas])
+        self.assertNotIn("processed_files", sessao)
+        self.assertNotIn("MARCA", json.dumps(dict(sessao.items())))
+        self.assertEqual(zlib.decompress(bytes(FaturaProcessada.objects.get(pk=faturas[0].pk).conteudo)), b"<html>MARCA-f0</html>")
+
+    def test_lote_concluido_depois_da_sessao_expirar_e_coletado_pelo_banco(self):
+        offline = LoteProcessamento.objects.create(
+            cliente=self.cliente, modo=LoteProcessamento.MODO_OFFLINE, status=LoteProcessamento.STATUS_CONCLUIDO,
+        )
+        ArquivoLote.objects.create(
+            lote=offline, ordem=0, nome_original="f0.pdf", status=ArquivoLote.STATUS_PROCESSADO, fatura=self.fatura(self.cliente, "f0"),
+        )
+        ArquivoLote.objects.create(lote=offline, ordem=1, nome_original="f1.pdf", status=ArquivoLote.STATUS_ERRO, erro="PDF ilegível")
+        em_andamento = LoteProcessamento.objects.create(cliente=self.cliente, status=LoteProcessamento.STATUS_PROCESSANDO)
+        alheio = LoteProcessamento.objects.create(cliente=self.alheia.cliente, status=LoteProcessamento.STATUS_CONCLUIDO)
+        # Sessão nova (a do envio expirou): nada do lote fica na sessão.
+        self.client.logout()
+        self.client.force_login(self.cliente.user)
+
+        resposta = self.client.get(reverse("core:processamento"))
+
+        self.assertEqual(resposta.context["lote_em_andamento"], em_andamento)
+        self.assertEqual(
+            [str(mensagem) for mensagem in resposta.context["messages"]],
+            ["Erro ao processar f1.pdf: PDF ilegível", "1 fatura(s) pronta(s) para download."],
+        )
+        self.assertEqual(self.client.session["processed_file_ids"], [offline.arquivos.get(ordem=0).fatura_id])
+        self.assertEqual(
+            dict(LoteProcessamento.objects.values_list("pk", "coletado")),
+            {offline.pk: True, em_andamento.pk: False, alheio.pk: False},
+        )
+
+        with mock.patch.object(processamento_energisa, "ia_configurada", return_value=True):
+            resposta = self.client.post(
+                reverse("core:processamento"),
+                {"action": "process_files", "invoice_files": SimpleUploadedFile("nova.pdf", gerar_pdf(FATURA_ENERGISA))},
+                follow=True,
+            )
+        self.assertIn(
+            "Aguarde a conclusão do lote em processamento antes de enviar novas faturas.",
+            [str(mensagem) for mensagem in resposta.context["messages"]],
+        )
+
+    def test_download_e_envio_leem_as_faturas_do_proprio_cliente(self):
+        propria = [self.fatura(self.cliente, f"f{n}", suggested_contact_id=self.contato.pk) for n in range(2)]
+        sessao = self.client.session
+        sessao["processed_file_ids"] = [propria[0].pk, self.alheia.pk, propria[1].pk]
+        sessao.save()
+        url = reverse("core:processamento")
+
+        resposta = self.client.post(url, {"action": "download_file", "file_index": "1"})
+        self.assertEqual(resposta.content, b"<html>MARCA-f1</html>")
+
+        self.client.post(url, {"action": "send_all"})
+        self.assertEqual(len(mail.outbox), 1)
+        with zipfile.ZipFile(io.BytesIO(mail.outbox[0].attachments[0][1])) as zf:
+            self.assertEqual(sorted(zf.namelist()), ["f0.html", "f1.html"])
+
+        resposta = self.client.post(url, {"action": "download_all"})
+        with zipfile.ZipFile(io.BytesIO(b"".join(resposta.streaming_content))) as zf:
+            self.assertEqual({nome: zf.read(nome) for nome in zf.namelist()}, {
+                "f0.html": b"<html>MARCA-f0</html>",
+                "f1.html": b"<html>MARCA-f1</html>",
+            })
+        self.assertTrue(FaturaProcessada.objects.filter(pk=self.alheia.pk).exists())
+
+
+class ZipFaturasTests(TestCase):
+    def test_zip_de_500_faturas_com_memoria_limitada(self):
+        cliente = Cliente.objects.create(nome="Zip", email="zip@example.com")
+        faturas = []
+        for numero in range(500):
+            fatura = FaturaProcessada(cliente=cliente, nome=f"fatura_{numero}.html")
+            # Conteúdo pouco comprimível para o ZIP ficar grande (~20 MB de HTML).
+            fatura.html = f"<html>{numero}</html>" + os.urandom(20000).hex()
+            faturas.append(fatura)
+        FaturaProcessada.objects.bulk_create(faturas)
+        arquivos = list(FaturaProcessada.objects.filter(cliente=cliente).order_by("pk").values_list("pk", "nome"))
+
+        with tempfile.TemporaryFile() as destino:
+            tracemalloc.start()
+            try:
+                for bloco in gerar_zip_faturas(arquivos, cliente, remover_ao_final=True):
+                    destino.write(bloco)
+                _, pico = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            tamanho_zip = destino.tell()
+
+            destino.seek(0)
+            with zipfile.ZipFile(destino) as zf:
+                self.assertEqual(len(zf.namelist()), 500)
+                self.assertTrue(zf.read("fatura_499.html").startswith(b"<html>499</html>"))
+
+        self.assertGreater(tamanho_zip, 5 * 1024 * 1024)
+        self.assertLess(pico, 2 * 1024 * 1024)
+        self.assertFalse(FaturaProcessada.objects.filter(cliente=cliente).exists())
+
+    def test_zip_com_ativos_compartilhados_grava_css_e_qrcode_uma_vez(self):
+        cliente = Cliente.objects.create(nome="Zip", email="zip@example.com")
+        qrcode = "data:image/png;base64," + base64.b64encode(b"qr-png").decode()
+        estilo = "<style>.fatura { color: #123; }</style>"
+        faturas = []
+        for numero in range(3):
+            fatura = FaturaProcessada(cliente=cliente, nome=f"fatura_{numero}.html")
+            fatura.html = f'<html><head>{estilo}</head><body>{numero}<img src="{qrcode}" /></body></html>'
+            faturas.append(fatura)
+        FaturaProcessada.objects.bulk_create(faturas)
+        arquivos = list(FaturaProcessada.objects.filter(cliente=cliente).order_by("pk").values_list("pk", "nome"))
+
+        conteudo = b"".join(gerar_zip_faturas(arquivos, cliente, ativos_compartilhados=True))
+
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+            ativos = sorted((nome for nome in zf.namelist() if nome.startswith("ativos/")), key=lambda nome: nome[-3:])
+            self.assertEqual(len(zf.namelist()), 5)
+            css, png = ativos
+            self.assertTrue(css.endswith(".css") and png.endswith(".png"))
+            self.assertEqual(zf.read(png), b"qr-png")
+            self.assertEqual(
+                zf.read("fatura_2.html").decode(),
+                f'<html><head><link rel="stylesheet" href="{css}" /></head><body>2<img src="{png}" /></body></html>',
+            )
+
+
+class EnvioEmailTests(SimpleTestCase):
+    def envios(self, quantidade):
+        return [
+            envio_email.EnvioEmail(
+                contato_id=numero, contato_nome=f"Contato {numero}", email=f"c{numero}@example.com",
+                assunto="Fatura | Teste", corpo="Olá", anexo_nome="fatura.html", anexo="<html></html>",
+            )
+            for numero in range(quantidade)
+        ]
+
+    def test_uma_conexao_smtp_por_worker_e_resultado_por_contato(self):
+        conexoes = []
+
+        def conectar(**kwargs):
+            conexao = get_connection(**kwargs)
+            conexoes.append(conexao)
+            return conexao
+
+        with mock.patch.object(envio_email, "get_connection", side_effect=conectar):
+            resultados = envio_email.enviar_emails(self.envios(5), max_workers=2)
+
+        self.assertEqual(len(conexoes), 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"c{n}@example.com" for n in range(5)])
+        self.assertEqual([r.contato_id for r in resultados], list(range(5)))
+        self.assertTrue(all(r.enviado and r.canal == envio_email.CANAL_SMTP for r in resultados))
+
+    def test_smtp_indisponivel_usa_um_unico_cliente_sendgrid(self):
+        conexao = mock.Mock()
+        conexao.open.side_effect = OSError("sem rede")
+        sendgrid = mock.Mock()
+        with mock.patch.object(envio_email, "get_connection", return_value=conexao), \
+                mock.patch.dict(os.environ, {"SENDGRID_API_KEY": "sg-teste"}), \
+                mock.patch.dict("sys.modules", {"sendgrid": sendgrid, "sendgrid.helpers.mail": sendgrid.helpers.mail}):
+            resultados = envio_email.enviar_emails(self.envios(3), max_workers=3)
+
+        sendgrid.SendGridAPIClient.assert_called_once_with("sg-teste")
+        self.assertEqual(sendgrid.SendGridAPIClient.return_value.send.call_count, 3)
+        self.assertTrue(all(r.enviado and r.canal == envio_email.CANAL_SENDGRID and r.smtp_indisponivel for r in resultados))
+
+
+@override_settings(
+    METRICAS_INTERVALO_PUBLICACAO=0,
+    CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "faturas": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "metricas-testes"},
+    },
+)
+class MetricasTests(TestCase):
+    def setUp(self):
+        metricas.zerar()
+        self.addCleanup(metricas.zerar)
+
+    def test_etapas_medidas_por_fatura_e_logs_redigidos(self):
+        llm = mock.Mock()
+        llm.invoke.return_value = mock.Mock(content='{"nome_do_cliente": "FULANO DE TAL"}')
+        cliente = Cliente(nome="Teste", prompt_template="")
+
+        with mock.patch.object(processamento_energisa, "obter_llm", return_value=(llm, False)), \
+                mock.patch.object(processamento_energisa, "OPENAI_API_KEY", "sk-teste"), \
+                self.assertLogs("app", "DEBUG") as logs:
+            contexto = processar_fatura(io.BytesIO(gerar_pdf(FATURA_ENERGISA)), cliente)
+            RenderizadorFatura().renderizar(contexto["dados"], cliente)
+
+        duracoes = metricas.instantaneo()["duracoes"]
+        self.assertEqual({etapa: duracoes[etapa]["contagem"] for etapa in metricas.ETAPAS}, dict.fromkeys(metricas.ETAPAS, 1))
+        self.assertEqual(metricas.instantaneo()["contadores"]["caminho_ia"], 1)
+        saida = "\n".join(logs.output)
+        self.assertIn("Resposta da IA", saida)
+        for dado in ("FULANO", "12345678", "371,39", "RUA DAS FLORES"):
+            self.assertNotIn(dado, saida)
+
+    def test_qrcode_codificado_uma_vez_por_versao_do_arquivo(self):
+        cache_ativos.limpar()
+        self.addCleanup(cache_ativos.limpar)
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        qrcode = Path(pasta) / "pix.png"
+        qrcode.write_bytes(b"png-1")
+        cliente = Cliente(nome="Teste", pix_qrcode="pix.png")
+        renderizador = RenderizadorFatura()
+
+        with override_settings(MEDIA_ROOT=pasta):
+            contextos = [renderizador._build_invoice_context({}, cliente) for _ in range(3)]
+            qrcode.write_bytes(b"png-dois")
+            contextos.append(renderizador._build_invoice_context({}, cliente))
+
+        self.assertEqual({c["qrcode_path"] for c in contextos[:3]}, {"data:image/png;base64,cG5nLTE="})
+        self.assertEqual(contextos[3]["qrcode_path"], "data:image/png;base64,cG5nLWRvaXM=")
+        contadores = metricas.instantaneo()["contadores"]
+        # QR code: 2 versões lidas; logo: resolvida uma vez no manifesto.
+        self.assertEqual((contadores["cache_ativos_misses"], contadores["cache_ativos_hits"]), (3, 5))
+        self.assertEqual(cache_ativos.data_uri(str(Path(pasta) / "inexistente.png")), "")
+
+    @override_settings(METRICAS_INTERVALO_PUBLICACAO=30)
+    def test_cada_processo_publica_a_propria_linha_e_worker_ocioso_publica(self):
+        MetricasProcesso.objects.create(processo="encerrado:9", dados={"contadores": {"faturas_processadas": 99}})
+        MetricasProcesso.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        for processo, quantidade in (("web:1", 2), ("web:2", 3)):
+            metricas.zerar()
+            metricas.incrementar("faturas_processadas", quantidade)
+            with mock.patch.object(metricas, "_chave_processo", return_value=processo):
+                metricas.publicar()
+
+        metricas.zerar()
+        metricas.incrementar("faturas_processadas")
+        # Worker ocioso há mais de um intervalo: publica mesmo sem registrar durações.
+        with mock.patch.object(metricas, "_ultima_publicacao", time.monotonic() - 31):
+            call_command("processar_lotes", "--uma-vez", stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(MetricasProcesso.objects.values_list("processo", flat=True)),
+            sorted(["web:1", "web:2", metricas._chave_processo()]),
+        )
+        resumo = metricas.coletar()
+        self.assertEqual((resumo["processos"], resumo["contadores"]["faturas_processadas"]), (3, 6))
+
+    def test_endpoint_restrito_a_equipe(self):
+        usuarios = get_user_model().objects
+        metricas.registrar_duracao(metricas.ETAPA_IA, 1200)
+
+        self.client.force_login(usuarios.create_user("cliente@example.com", password="x"))
+        self.assertEqual(self.client.get(reverse("core:metricas")).status_code, 403)
+
+        self.client.force_login(usuarios.create_user("equipe@example.com", password="x", is_staff=True))
+        dados = self.client.get(reverse("core:metricas")).json()
+        self.assertEqual(dados["duracoes"]["ia"]["contagem"], 1)
+        self.assertEqual(dados["duracoes"]["ia"]["faixas_ms"]["<=2500"], 1)
+
+
+class CalculoLoteTests(SimpleTestCase):
+    def test_lote_igual_ao_calculo_exato_por_fatura(self):
+        linhas = linhas_sinteticas(2000) + [{}, None, {"energia_injetada_valor": 426.82}]
+        for nome in ("PADRAO", "VIP"):
+            politica = get_politica(nome)
+            with self.subTest(nome):
+                lote = politica.calcular_lote(linhas)
+                self.assertEqual(lote, [politica.calcular(dados) for dados in linhas])
+                self.assertEqual(lote[:2000], [calcular_decimal(dados, politica.fracao_economia) for dados in linhas[:2000]])
+
+    def test_arredonda_centavos_sem_erro_de_float(self):
+        politica = get_politica("PADRAO")
+        # 0,05 × 0,3 = 0,015 e 0,05 × 0,7 = 0,035: em float davam 0,01 e 0,03.
+        self.assertEqual(politica.calcular({"energia_injetada_valor": "0,05"}), {"economia": "0,02", "valor_a_pagar": "0,04"})
+        self.assertEqual(
+            politica.calcular({"energia_injetada_valor": "1.234,56"}),
+            {"economia": "370,37", "valor_a_pagar": "864,19"},
+        )
+        self.assertEqual(politica.calcular({"energia_injetada_valor": "-5,00"}), {"economia": "", "valor_a_pagar": ""})
+        self.assertEqual(
+            get_politica("VIP").calcular_lote([{"energia_injetada_valor": "12,345"}]),
+            [{"economia": "0,00", "valor_a_pagar": "12,35"}],
+        )
+
+
+class DiretrizesTests(TestCase):
+    def test_template_padrao_vira_politica_local_sem_instrucoes_livres(self):
+        diretrizes = compilar_diretrizes(Cliente.PROMPT_TEMPLATE_PADRAO)
+
+        self.assertEqual(diretrizes.instrucoes_livres, "")
+        self.assertEqual(
+            diretrizes.politica.calcular({"energia_atv_injetada_valor": "0,05"}),
+            {"economia": "0,02", "valor_a_pagar": "0,04"},
+        )
+
+    def test_linhas_que_nao_sao_formulas_seguras_ficam_para_a_ia(self):
+        diretrizes = compilar_diretrizes(
+            '"Economia" = (energia_atv_injetada_valor - 10) * 20%\n'
+            "valor a pagar = __import__('os').system('ls')\n"
+            "economia = 40%\n"
+            "Use o nome fantasia do cliente."
+        )
+
+        self.assertEqual(
+            diretrizes.instrucoes_livres.splitlines(),
+            ["valor a pagar = __import__('os').system('ls')", "economia = 40%", "Use o nome fantasia do cliente."],
+        )
+        self.assertEqual(
+            diretrizes.politica.calcular({"energia_injetada_valor": "1.010,00"}),
+            {"economia": "200,00", "valor_a_pagar": "707,00"},
+        )
+
+    def test_formulas_calculadas_localmente_e_cache_invalidado_ao_salvar(self):
+        usuario = get_user_model().objects.create_user(username="diretrizes", password="senha-forte-123")
+        cliente = Cliente.objects.create(
+            user=usuario, nome="Diretrizes", email="diretrizes@example.com",
+            modo_extracao=Cliente.MODO_EXTRACAO_AUTOMATICO,
+            prompt_template='"valor a pagar" = energia_atv_injetada_valor * 0,8\n"Economia" = energia_atv_injetada_valor * 0,2',
+        )
+        with mock.patch.object(processamento_energisa, "call_llm_fatura", return_value={"economia": "1,00"}) as llm:
+            dados = processamento_energisa.processar(None, cliente, documento=documento_de(FATURA_ENERGISA_COMPLETA))["dados"]
+        llm.assert_not_called()
+        self.assertEqual((dados["economia"], dados["valor_a_pagar"]), ("74,28", "297,11"))
+
+        self.client.force_login(usuario)
+        self.client.post(reverse("core:processamento"), {"action": "update_prompt", "prompt_template": "Economia = consumo_kwh"})
+        cliente.refresh_from_db()
+        self.assertEqual(get_politica("PADRAO", cliente).formulas["economia"].texto, "consumo_kwh")
+
+
+class BenchmarkPipelineTests(SimpleTestCase):
+    def test_mede_todas_as_etapas_e_acusa_regressao(self):
+        destino = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destino, True)
+        pdfs = gerar_corpus(destino, quantidade=2, paginas=(1,))
+
+        resultado = medir_pipeline(pdfs, repeticoes=1)
+
+        self.assertEqual(set(resultado["etapas"]), set(ETAPAS))
+        self.assertEqual(resultado["chamadas_ia"], 8)  # etapa "ia" e processamento completo, nas duas passadas
+        self.assertGreater(resultado["faturas_por_segundo"], 0)
+        self.assertEqual(comparar_com_baseline(resultado, resultado), [])
+
+        base = json.loads(json.dumps(resultado))
+        base["etapas"]["extracao"]["media_ms"] = resultado["etapas"]["extracao"]["media_ms"] / 2 - 1
+        base["faturas_por_segundo"] = resultado["faturas_por_segundo"] * 2
+        regressoes = comparar_com_baseline(resultado, base)
+        self.assertEqual(len(regressoes), 2)
+        self.assertTrue(regressoes[0].startswith("extracao:"))
+
+
+class SimuladorLLMTests(SimpleTestCase):
+    def setUp(self):
+        self.gravacoes = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.gravacoes, True)
+
+    def _requisicao(self, prompt):
+        return json.dumps({"model": "gpt-4.1", "messages": [{"role": "user", "content": prompt}]}).encode()
+
+    def test_grava_e_reproduz_pelo_cliente_da_ia(self):
+        encaminhadas = []
+
+        def provedor(corpo, cabecalhos):
+            encaminhadas.append(json.loads(corpo))
+            return 200, json.dumps({"choices": [{"message": {"content": '{"economia": "1,00"}'}}]}).encode()
+
+        gravador = SimuladorLLM(self.gravacoes, modo=MODO_GRAVAR, encaminhar=provedor)
+        status, _, _ = gravador.responder("/v1/chat/completions", self._requisicao("prompt gravado"))
+        self.assertEqual((status, len(encaminhadas)), (200, 1))
+        self.assertTrue((Path(self.gravacoes) / f"{chave_prompt(encaminhadas[0])}.json").exists())
+
+        with override_settings(LLM_SIMULADOR=True, LLM_SIMULADOR_GRAVACOES=self.gravacoes, LLM_SIMULADOR_MODO="reproduzir"), \
+                mock.patch.object(processamento_energisa, "_llm", None), \
+                mock.patch.object(processamento_energisa, "OPENAI_API_KEY", ""), \
+                mock.patch.object(processamento_energisa, "montar_prompt", return_value="prompt gravado"):
+            self.assertEqual(processamento_energisa.call_llm_fatura("texto", {}), {"economia": "1,00"})
+            simulador = processamento_energisa._llm.http_client._transport.simulador
+            processamento_energisa.montar_prompt.return_value = "prompt novo"
+            self.assertEqual(processamento_energisa.call_llm_fatura("texto", {}), {})
+
+        self.assertEqual(len(encaminhadas), 1)
+        self.assertEqual((simulador.estatisticas["reproduzidas"], simulador.estatisticas["sem_gravacao"]), (1, 1))
+
+    def test_simula_limite_de_taxa_e_erros(self):
+        limitado = SimuladorLLM(self.gravacoes, taxa_limite=1)
+        status, cabecalhos, corpo = limitado.responder("/v1/chat/completions", self._requisicao("x"))
+        self.assertEqual(status, 429)
+        self.assertIn("retry-after", cabecalhos)
+        self.assertEqual(json.loads(corpo)["error"]["code"], "rate_limit_exceeded")
+
+        com_erro = SimuladorLLM(self.gravacoes, taxa_erro=1, latencia_ms=5, latencia_p99_ms=20, semente=1)
+        inicio = time.perf_counter()
+        self.assertEqual(com_erro.responder("/v1/chat/completions", self._requisicao("x"))[0], 500)
+        self.assertGreater(time.perf_counter() - inicio, 0.001)
+        self.assertEqual(com_erro.estatisticas["erros_simulados"], 1)
+
+
+class DetectorRegistryTests(SimpleTestCase):
+    def test_mesma_resposta_que_a_implementacao_anterior(self):
+        for texto in textos_corpus() + ["", "energisa danf3e em minúsculas"]:
+            self.assertEqual(detect_concessionaria(texto), deteccao_referencia(texto))
+
+    def test_sinal_na_fronteira_do_bloco_e_saida_antecipada(self):
+        registro = DetectorRegistry([EnergisaDetector()])
+        texto = "x" * (FIRST_CHUNK_SIZE - 4) + "energisa danf3e energia atv injetada 10/12345678-9"
+        self.assertEqual(registro.scores(texto), {"ENERGISA": 1.0})
+        self.assertEqual(registro.scores(texto), {"ENERGISA": EnergisaDetector().score(texto)})
+
+        contador = mock.Mock(wraps=str.upper)
+        with mock.patch("app.core.detectors.registry.normalize_text", contador):
+            registro.scores("ENERGISA DANF3E ENERGIA ATV INJETADA 10/12345678-9 " + "aviso " * 10_000)
+        self.assertEqual(contador.call_count, 1)
+
+
+    def test_padrao_nao_casa_com_texto_cortado_na_fronteira(self):
+        detectores = [EnelDetector(), CPFLDetector()]
+        registro = DetectorRegistry(detectores, threshold=2.0)
+        fronteiras = (FIRST_CHUNK_SIZE, 3 * FIRST_CHUNK_SIZE)
+        # "ß" vira "SS" na normalização, deslocando o texto normalizado em relação ao original.
+        for preenchimento in (".", "ß."):
+            for fronteira in fronteiras:
+                for deslocamento in range(-6, 7):
+                    for trecho in ("ENELX CPFLX", "XENEL XCPFL", " ENEL CPFL "):
+                        texto = (preenchimento * fronteira)[:fronteira + deslocamento] + trecho + " fim" * 2000
+                        with self.subTest(preenchimento=preenchimento, fronteira=fronteira, deslocamento=deslocamento, trecho=trecho):
+                            self.assertEqual(
+                                registro.scores(texto),
+                                {detector.name: detector.score(texto) for detector in detectores},
+                            )
+
+
+class DeteccaoPrimeiraPaginaTests(SimpleTestCase):
+    def test_detecta_pela_primeira_pagina_e_extrai_uma_vez(self):
+        pdf = io.BytesIO(gerar_pdf(FATURA_ENERGISA))
+        with mock.patch.object(PdfiumExtrator, "extrair", autospec=True, side_effect=PdfiumExtrator.extrair) as sniff, \
+                mock.patch("pdfplumber.open", wraps=pdfplumber.open) as aberturas:
+            documento, concessionaria = extrair_e_detectar(pdf)
+
+        self.assertEqual(concessionaria, "ENERGISA")
+        self.assertEqual(sniff.call_args.kwargs, {"max_paginas": 1})
+        self.assertEqual(aberturas.call_count, 1)
+        self.assertEqual(documento.num_paginas, 2)
+
+    def test_recusa_pdf_que_nao_e_fatura_sem_extracao_completa(self):
+        pdf = io.BytesIO(gerar_pdf([["Curriculo de Fulano"], ["Experiencia profissional"]]))
+        with mock.patch("pdfplumber.open", wraps=pdfplumber.open) as aberturas:
+            with self.assertRaises(PDFNaoReconhecido):
+                extrair_e_detectar(pdf)
+        self.assertEqual(aberturas.call_count, 0)
+
+        # Contas de outras concessionárias, ainda sem detector próprio, seguem para o pipeline.
+        conta = io.BytesIO(gerar_pdf([["CONTA DE ENERGIA ELETRICA", "Consumo 300 kWh"]]))
+        self.assertEqual(extrair_e_detectar(conta)[1], "ENERGISA")
+
+
+FATURA_ENEL = [[
+    "Enel Distribuição São Paulo",
+    "NOTA FISCAL/CONTA DE ENERGIA ELÉTRICA DANF3E",
+    "MARIA DE TAL",
+    "AV PAULISTA, 100 - 01310100 SAO PAULO SP",
+    "Nº DA INSTALAÇÃO 058460313 Nº DO CLIENTE 3836752",
+    "REF: MÊS/ANO 09/2025 VENCIMENTO 20/10/2025",
+    "Itens de Fatura Unid. Quant. Preço unit. (R$) com tributos Valor (R$)",
+    "Consumo Uso Sistema [KWh]-TUSD KWH 500,000 0,39263000 196,32",
+    "Consumo - TE KWH 500,000 0,31040000 155,20",
+    "Energia Injetada TUSD KWH 400,000 0,39263000 -157,05",
+    "Energia Injetada TE KWH 400,000 0,31040000 -124,16",
+    "Adicional Bandeira Amarela KWH 500,000 0,01885000 9,43",
+    "www.enel.com.br",
+]]
+
+FATURA_CPFL = [[
+    "CPFL PAULISTA - Companhia Paulista de Força e Luz",
+    "DANF3E - DOCUMENTO AUXILIAR DA NOTA FISCAL DE ENERGIA ELÉTRICA ELETRÔNICA",
+    "JOSE DE TAL",
+    "Nº Instalação 4001234567 Seu Código 12345678",
+    "Referência SET/2025 Vencimento 15/10/2025",
+    "Descrição Unid. Quant. Tarifa c/ Tributos Valor",
+    "Consumo Uso Sistema [KWh]-TUSD KWH 500,000 0,39263000 196,32",
+    "Consumo - TE KWH 500,000 0,31040000 155,20",
+    "Energ Atv Inj. oUC mPT - TUSD KWH 400,000 0,39263000 157,05-",
+    "Energ Atv Inj. oUC mPT - TE KWH 400,000 0,31040000 124,16-",
+    "www.cpfl.com.br",
+]]
+
+
+class ParsersItensTests(SimpleTestCase):
+    def test_enel_e_cpfl_sem_ia(self):
+        cliente = Cliente(nome="Teste", prompt_template="")
+        esperados = {"ENEL": (FATURA_ENEL, "058460313", "09/2025"), "CPFL": (FATURA_CPFL, "4001234567", "SET/2025")}
+        for concessionaria, (paginas, uc, referencia) in esperados.items():
+            with self.subTest(concessionaria), \
+                    mock.patch.object(processamento_energisa, "call_llm_fatura", side_effect=AssertionError("IA chamada")):
+                contexto = processar_fatura(io.BytesIO(gerar_pdf(paginas)), cliente)
+
+            dados = contexto["dados"]
+            self.assertEqual(contexto["concessionaria"], concessionaria)
+            self.assertEqual(dados["consumo_kwh"], "500,00")
+            self.assertEqual(dados["preco_unitario"], "0,703030")
+            self.assertEqual(dados["energia_injetada_kwh"], "400,00")
+            self.assertEqual(dados["energia_injetada_valor"], "281,21")
+            self.assertEqual(dados["codigo_do_cliente_uc"], uc)
+            self.assertEqual(dados["mes_referencia"], referencia)
+            self.assertEqual(dados["caminho_extracao"], processamento_energisa.CAMINHO_REGEX)
@@ -0,0 +1,86 @@
+"""
+Upload handler das faturas em PDF.
+
+Cada arquivo do campo `invoice_files` é gravado uma única vez em um arquivo
+temporário enquanto chega, com o SHA-256 calculado no mesmo passo. Os limites
+de tamanho são aplicados durante o streaming: um arquivo acima do limite (ou
+que não começa como PDF) é descartado sem ser gravado por inteiro.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopFutureHandlers
+
+CAMPO_FATURAS = 'invoice_files'
+ASSINATURA_PDF = b'%PDF-'
+
+
+def _mb(quantidade: int) -> str:
+    return f'{quantidade / (1024 * 1024):.0f} MB'
+
+
+class FaturaUploadHandler(FileUploadHandler):
+    """
+    Trata apenas o campo de faturas; os demais arquivos seguem para os handlers
+    padrão do Django. O arquivo resultante é um TemporaryUploadedFile com o
+    atributo `sha256`, e o FileSystemStorage o move (sem copiar) para MEDIA_ROOT.
+    Arquivos recusados ficam em `request.faturas_recusadas` como (nome, motivo).
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_arquivo = int(getattr(settings, 'UPLOAD_FATURA_MAX_BYTES', 0) or 0)
+        self.max_lote = int(getattr(settings, 'UPLOAD_LOTE_MAX_BYTES', 0) or 0)
+        self.total_lote = 0
+        self.ativo = False
+        if request is not None:
+            request.faturas_recusadas = []
+
+    def _recusar(self, motivo: str):
+        if self.request is not None:
+            self.request.faturas_recusadas.append((self.file_name, motivo))
+        self.ativo = False
+        raise SkipFile(motivo)
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.ativo = field_name == CAMPO_FATURAS
+        if not self.ativo:
+            return
+
+        self.tamanho = 0
+        self.digest = hashlib.sha256()
+        self.file = TemporaryUploadedFile(file_name, content_type, 0, charset, content_type_extra)
+        if content_length and self.max_arquivo and content_length > self.max_arquivo:
+            self._recusar(f'arquivo maior que o limite de {_mb(self.max_arquivo)}.')
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.ativo:
+            return raw_data
+
+        # A especificação admite lixo antes do cabeçalho, desde que dentro do primeiro KB.
+        if start == 0 and ASSINATURA_PDF not in raw_data[:1024]:
+            self._recusar('o arquivo não é um PDF.')
+        self.tamanho += len(raw_data)
+        if self.max_arquivo and self.tamanho > self.max_arquivo:
+            self._recusar(f'arquivo maior que o limite de {_mb(self.max_arquivo)}.')
+        if self.max_lote and self.total_lote + self.tamanho > self.max_lote:
+            self._recusar(f'o envio ultrapassa o limite de {_mb(self.max_lote)} por lote.')
+
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.ativo:
+            return None
+
+        self.ativo = False
+        self.total_lote += file_size
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
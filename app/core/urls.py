@@ -5,6 +5,8 @@ from .views import (
     ContatoCrudView,
     LoginView,
     LogoutView,
+    LoteStatusView,
+    MetricasView,
     ProcessamentoView,
     QuemSomosView,
     TemplateViewsIndex,
@@ -21,5 +23,7 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
     path('processamento/', ProcessamentoView.as_view(), name='processamento'),
+    path('processamento/lotes/<int:pk>/status/', LoteStatusView.as_view(), name='lote_status'),
     path('contatos/', ContatoCrudView.as_view(), name='contatos'),
+    path('interno/metricas/', MetricasView.as_view(), name='metricas'),
 ]
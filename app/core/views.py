@@ -1,10 +1,5 @@
-import base64
-import io
 import logging
-import os
 import re
-import socket
-import zipfile
 from datetime import datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal
 from pathlib import Path
@@ -14,14 +9,12 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login, logout, update_session_auth_hash
 from django.contrib.auth.hashers import identify_hasher, make_password
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db import IntegrityError, models
 from django.db import transaction
-from django.core.mail import EmailMessage, get_connection
-from django.contrib.staticfiles.storage import staticfiles_storage
-from django.http import HttpResponse, JsonResponse
+from django.core.mail import EmailMessage
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.text import slugify
@@ -29,9 +22,13 @@ from django.views import View
 from django.views.generic import TemplateView
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
-from app.core.models import Cliente, ClienteContato, CreditHistory
+from app.core.calculos.factory import invalidar_diretrizes
+from app.core.models import ArquivoLote, Cliente, ClienteContato, FaturaProcessada, LoteProcessamento
 from django.contrib.auth.password_validation import validate_password, password_validators_help_text_html
-from app.core.services.processamento_energisa import processar_pdf
+from app.core.services import metricas, processamento_energisa as processamento
+from app.core.services.envio_email import EnvioEmail, enviar_emails
+from app.core.services.lotes import coletar_lotes_offline, criar_lote, processar_lote
+from app.core.services.zip_faturas import gerar_zip_faturas
 
 logger = logging.getLogger(__name__)
 
@@ -440,6 +437,11 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
         request.session['cliente_nome'] = cliente.nome
         return super().dispatch(request, *args, **kwargs)
 
+    def get(self, request, *args, **kwargs):
+        cliente = getattr(request.user, 'cliente', None)
+        self.lote_em_andamento = self._collect_finished_batch(request, cliente)
+        return super().get(request, *args, **kwargs)
+
     def post(self, request, *args, **kwargs):
         cliente = getattr(request.user, 'cliente', None)
         if not cliente:
@@ -522,164 +524,32 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
         prompt = request.POST.get('prompt_template', '').strip()
         cliente.prompt_template = prompt
         cliente.save(update_fields=['prompt_template'])
+        invalidar_diretrizes(cliente.pk)
         messages.success(request, 'Diretrizes para IA atualizadas com sucesso.')
         return redirect('core:processamento')
 
-    def _absolute_static(self, path: str) -> str:
-        """Retorna URL absoluta para um arquivo estático, preferindo a versão com hash."""
-        try:
-            url = staticfiles_storage.url(path)
-        except Exception:
-            url = f"{settings.STATIC_URL}{path}" if settings.STATIC_URL else ''
-        return self.request.build_absolute_uri(url) if url else ''
-
-    def _absolute_media(self, path: str) -> str:
-        """Retorna URL absoluta para um arquivo em MEDIA_URL."""
-        if not path:
-            return ''
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = settings.MEDIA_URL or '/media/'
-        url = f"{base}{path.lstrip('/')}"
-        try:
-            return self.request.build_absolute_uri(url)
-        except Exception:
-            return url
-
-    def _file_to_data_uri(self, path: str) -> str:
-        """Lê um arquivo local e retorna data URI (útil para garantir renderização offline)."""
-        if not path or not os.path.exists(path):
-            return ''
-        mime = 'image/jpeg'
-        ext = os.path.splitext(path)[1].lower()
-        if ext in ('.png',):
-            mime = 'image/png'
-        try:
-            with open(path, 'rb') as fh:
-                encoded = base64.b64encode(fh.read()).decode('ascii')
-            return f"data:{mime};base64,{encoded}"
-        except Exception:
-            return ''
-
-    def _build_historico(self, historico_raw):
-        historico = []
-        for item in historico_raw or []:
-            consumo = (item or {}).get('consumo', '')
-            mes = (item or {}).get('mes', '')
-            historico.append(
-                {
-                    'rotulo': mes,
-                    'mes': mes,
-                    'consumo_display': consumo or 'N/A',
-                    'has_consumo': bool(consumo),
-                }
-            )
-        return historico
-
-    def _fallback_consumo_atual(self, data):
-        """Tenta obter consumo atual; se vazio, usa primeiro valor do histórico."""
-        consumo = data.get('consumo_kwh') or data.get('consumo kwh', '')
-        if consumo:
-            return consumo
-        for item in data.get('historico_de_consumo') or data.get('historico de consumo') or []:
-            if not item:
-                continue
-            valor = item.get('consumo') or item.get('consumo kwh')
-            if valor:
-                return valor
-        return ''
-
-    def _simplify_endereco(self, endereco: str) -> str:
-        """
-        Remove partes detalhadas (ex.: quadra/lote) para deixar o endereÇõo mais limpo.
-        Exemplo: "RUA X, 123 - QD 58 LT 04 - 08 103 37 362000 - 79094550 Y"
-        vira "RUA X, 123 - 79094550 Y".
-        """
-        if not endereco:
-            return ''
-
-        parts = [p.strip() for p in endereco.split('-')]
-        filtered = []
-        for part in parts:
-            if not part:
-                continue
-            upper = part.upper()
-            if any(tag in upper for tag in ('QD', 'QUADRA', 'LT', 'LOTE')):
-                continue
-            if re.fullmatch(r'[\d\s]+', part):
-                continue
-            filtered.append(part)
-
-        cleaned = ' - '.join(filtered)
-        cleaned = re.sub(r'\s*\([^)]*\)', '', cleaned)  # remove parenteses extras (ex.: AG: 103)
-        cleaned = ' '.join(cleaned.split())
-        return cleaned.strip(' -')
-
-    def _build_invoice_context(self, data, cliente):
-        historico_raw = data.get('historico_de_consumo') or data.get('historico de consumo')
-        historico_consumo = self._build_historico(historico_raw)
-        consumo_atual = self._fallback_consumo_atual(data)
-        nome_cliente = data.get('nome_do_cliente') or data.get('nome do cliente', '')
-        codigo_uc = data.get('codigo_do_cliente_uc') or data.get('codigo do cliente - uc', '')
-        endereco = self._simplify_endereco(data.get('endereco', ''))
-        data_emissao = data.get('data_de_emissao') or data.get('data de emissao', '')
-        data_vencimento = data.get('data_de_vencimento') or data.get('data de vencimento', '')
-        valor_a_pagar = data.get('valor_a_pagar') or data.get('valor a pagar', '')
-        economia = data.get('economia') or data.get('Economia', '')
-        energia_injetada = data.get('energia_atv_injetada_kwh') or data.get('Energia Atv Injetada', '')
-        preco_unitario = data.get('preco_unitario') or data.get('preco unit com tributos', '')
-        saldo_acumulado = data.get('saldo_acumulado') or data.get('saldo acumulado', '')
-        mes_referencia = data.get('mes_referencia') or data.get('mes de referencia', '')
-        leitura_anterior = data.get('leitura_anterior') or data.get('leitura anterior', '')
-        pix_key = getattr(cliente, 'pix_key', None) or getattr(settings, 'PIX_KEY', 'alpsistemascg@gmail.com')
-        pix_qrcode_url = ''
-        try:
-            if getattr(cliente, 'pix_qrcode', None) and getattr(cliente.pix_qrcode, 'path', None):
-                pix_qrcode_url = self._file_to_data_uri(cliente.pix_qrcode.path)
-            elif getattr(cliente, 'pix_qrcode', None):
-                pix_qrcode_url = self._absolute_media(getattr(cliente.pix_qrcode, 'url', '') or '')
-        except Exception:
-            pix_qrcode_url = ''
-        leitura_atual = data.get('leitura_atual') or data.get('leitura atual', '')
-        return {
-            'logo_path': self._absolute_static('img/logomarca.png'),
-            'qrcode_path': pix_qrcode_url,
-            'pix_key': pix_key,
-            'mes_referencia': mes_referencia,
-            'cliente': {
-                'nome': nome_cliente or getattr(cliente, 'nome', ''),
-                'codigo_uc': codigo_uc,
-                'endereco': endereco,
-            },
-            'fatura': {
-                'data_emissao': data_emissao,
-                'data_vencimento': data_vencimento,
-                'saldo_acumulado_display': saldo_acumulado,
-                'valor_total_display': valor_a_pagar,
-                'leitura_anterior': leitura_anterior,
-                'leitura_atual': leitura_atual,
-                'codigo_barras': '',
-            },
-            'economia_display': economia,
-            'consumo_atual': consumo_atual,
-            'energia_ativa_display': energia_injetada,
-            'preco_unitario_display': preco_unitario,
-            'historico_consumo': historico_consumo,
-            'historico_resumo': '',
-        }
-
     def _handle_process_files(self, request, cliente):
         files = request.FILES.getlist('invoice_files')
+        for nome, motivo in getattr(request, 'faturas_recusadas', []):
+            messages.error(request, f'{nome} não foi enviado: {motivo}')
         if not files:
             messages.error(request, 'Envie pelo menos um PDF para processar.')
             return redirect('core:processamento')
 
-        api_key = os.getenv('OPENAI_API_KEY', '').strip()
-        if not api_key:
+        if not processamento.ia_configurada():
             messages.error(request, 'Defina a variável OPENAI_API_KEY para processar faturas.')
             return redirect('core:processamento')
 
+        if self._collect_finished_batch(request, cliente):
+            messages.error(request, 'Aguarde a conclusão do lote em processamento antes de enviar novas faturas.')
+            return redirect('core:processamento')
+
         credit_available = Decimal(getattr(cliente, 'saldo_atual', None) or 0)
+        # Arquivos ainda na fila já comprometem o saldo, mesmo antes do débito.
+        credit_available -= ArquivoLote.objects.filter(
+            lote__cliente=cliente,
+            status__in=[ArquivoLote.STATUS_PENDENTE, ArquivoLote.STATUS_PROCESSANDO],
+        ).count()
         file_count = len(files)
         if credit_available < file_count:
             max_allowed = int(credit_available)
@@ -696,80 +566,81 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
                 )
             return redirect('core:processamento')
 
-        outputs = []
-        for f in files:
-            try:
-                prompt_extra = cliente.prompt_template or ""
-                parsed = processar_pdf(f, prompt_extra=prompt_extra)
-                context = self._build_invoice_context(parsed, cliente)
-                default_template = "core/modelo_fatura.html"
-                template_name = default_template
-                template_attr = (getattr(cliente, "template_fatura", "") or "").strip()
-                if getattr(cliente, "is_VIP", False) and template_attr:
-                    # VIP: usa o template customizado, exceto quando for o modelo padrão
-                    if template_attr == "modelo_fatura.html":
-                        template_name = default_template
-                    else:
-                        template_name = f"faturas/{template_attr}"
-                # Força logo específico se o template customizado tiver uma logo própria.
-                if "boeira_padrao.html" in template_name:
-                    context["logo_path"] = self._absolute_static("img/boeira_solucoes/boeira_logomarca.jpeg")
-                    context["qrcode_path"] = self._absolute_static("img/boeira_solucoes/qrcode_boeira.jpeg")
-                    context["pix_key"] = "Reginaldo Boeira Pereira"
-                try:
-                    html = render_to_string(template_name, context)
-                except Exception:
-                    logger.exception("Falha ao renderizar template %s; usando padrão", template_name)
-                    html = render_to_string("core/modelo_fatura.html", context)
-                nome_para_arquivo = context.get('cliente', {}).get('nome') or getattr(cliente, 'nome', '')
-                raw_file_name = Path(f.name).name or 'fatura.pdf'
-                outputs.append((Path(f.name).stem or 'fatura', html, nome_para_arquivo, raw_file_name))
-            except Exception as exc:
-                logger.exception('Erro ao processar fatura %s', f.name)
-                messages.error(request, f'Erro ao processar {f.name}: {exc}')
-
-        if not outputs:
+        modo_offline = request.POST.get('modo_offline') == 'on'
+        modo = LoteProcessamento.MODO_OFFLINE if modo_offline else LoteProcessamento.MODO_INTERATIVO
+        lote = criar_lote(cliente, files, base_url=request.build_absolute_uri('/'), modo=modo)
+
+        if not getattr(settings, 'PROCESSAMENTO_EM_SEGUNDO_PLANO', True):
+            processar_lote(lote)
+            if not modo_offline:
+                return redirect('core:processamento')
+
+        if modo_offline:
+            messages.info(
+                request,
+                f'{file_count} fatura(s) enviada(s) no modo offline. O resultado pode levar até 24 horas; '
+                'acompanhe o andamento abaixo.'
+            )
             return redirect('core:processamento')
+        messages.info(request, f'{file_count} fatura(s) enviada(s) para processamento. Acompanhe o andamento abaixo.')
+        return redirect('core:processamento')
+
+    def _collect_finished_batch(self, request, cliente):
+        """
+        Converte os lotes concluídos e ainda não coletados do cliente na lista de
+        faturas prontas, reportando os erros por arquivo na ordem de envio, e
+        retorna o lote ainda em andamento, se houver. Os lotes vêm do banco, não
+        da sessão: um lote offline pode terminar depois de a sessão expirar.
+        """
+        nao_coletados = LoteProcessamento.objects.filter(cliente=cliente, coletado=False).order_by('created_at')
+        if not getattr(settings, 'PROCESSAMENTO_EM_SEGUNDO_PLANO', True) and nao_coletados.filter(
+            status=LoteProcessamento.STATUS_AGUARDANDO_IA,
+        ).exists():
+            # Sem worker, a própria página consulta o provedor (respeitando o intervalo entre consultas).
+            coletar_lotes_offline()
+
+        em_andamento = None
+        faturas = []
+        for lote in nao_coletados:
+            if lote.status != LoteProcessamento.STATUS_CONCLUIDO:
+                em_andamento = em_andamento or lote
+                continue
+            # UPDATE condicional: duas requisições simultâneas não coletam o mesmo lote.
+            coletado = LoteProcessamento.objects.filter(pk=lote.pk, coletado=False).update(
+                coletado=True, updated_at=timezone.now(),
+            )
+            if not coletado:
+                continue
+            for arquivo in lote.arquivos.select_related('fatura').order_by('ordem'):
+                if arquivo.status != ArquivoLote.STATUS_PROCESSADO:
+                    messages.error(request, f'Erro ao processar {arquivo.nome_original}: {arquivo.erro}')
+                    continue
+                # Sem a fatura, ela já passou do período de retenção (FATURAS_PROCESSADAS_RETENCAO_DIAS).
+                if arquivo.fatura:
+                    faturas.append(arquivo.fatura)
+
+        if not faturas:
+            return em_andamento
 
-        processed = []
         contatos_cache = list(ClienteContato.objects.filter(cliente=cliente)) if cliente.is_VIP else []
-        for idx, (name, html, nome_para_arquivo, raw_file_name) in enumerate(outputs, start=1):
+        for fatura in faturas:
+            raw_file_name = fatura.original_name or 'fatura.pdf'
+            nome_para_arquivo = fatura.contact_name
             if cliente.is_VIP:
                 base_name = Path(raw_file_name).stem or (slugify(nome_para_arquivo) or slugify(cliente.nome) or 'cliente')
                 safe_name = base_name
                 contact_match = self._match_contact_by_name(contatos_cache, nome_para_arquivo)
             else:
-                safe_name = Path(raw_file_name).stem or (slugify(name) or 'fatura')
+                safe_name = Path(raw_file_name).stem or 'fatura'
                 contact_match = None
-            processed.append({
-                'name': f'{safe_name}.html',
-                'content': html,
-                'status': 'processado',
-                'contact_name': nome_para_arquivo,
-                'suggested_contact_id': contact_match.id if contact_match else None,
-                'suggested_contact_name': contact_match.nome if contact_match else '',
-                'original_name': raw_file_name,
-            })
+            fatura.nome = f'{safe_name}.html'
+            fatura.suggested_contact_id = contact_match.id if contact_match else None
+            fatura.suggested_contact_name = contact_match.nome if contact_match else ''
+            fatura.save(update_fields=['nome', 'suggested_contact_id', 'suggested_contact_name', 'updated_at'])
 
-        # Debita os créditos apenas pelas faturas geradas
-        try:
-            debit = Decimal(len(processed))
-            cliente.saldo_atual = (credit_available - debit)
-            cliente.saldo_final = cliente.saldo_atual
-            cliente.valor_credito = Decimal('0')
-            cliente.save(update_fields=['saldo_atual', 'saldo_final', 'valor_credito'])
-            CreditHistory.objects.create(
-                cliente=cliente,
-                amount=-debit,
-                balance_after=cliente.saldo_atual,
-                description=f'Débito por processamento de {len(processed)} fatura(s)',
-            )
-        except Exception:
-            logger.exception('Falha ao debitar créditos do cliente %s', cliente.id)
-
-        self._set_processed_files(request, processed)
-        messages.success(request, f'{len(processed)} fatura(s) pronta(s) para download.')
-        return redirect('core:processamento')
+        self._set_processed_files(request, [fatura.pk for fatura in faturas])
+        messages.success(request, f'{len(faturas)} fatura(s) pronta(s) para download.')
+        return em_andamento
 
     def _handle_download_file(self, request):
         processed = self._get_processed_files(request)
@@ -784,7 +655,7 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
             return redirect('core:processamento')
 
         item = processed[idx]
-        response = HttpResponse(item.get('content', ''), content_type='text/html')
+        response = HttpResponse(self._get_processed_content(request, item), content_type='text/html')
         response['Content-Disposition'] = f'attachment; filename="{item.get("name", "fatura.html")}"'
         return response
 
@@ -794,16 +665,18 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
             messages.error(request, 'Não há faturas processadas para baixar.')
             return redirect('core:processamento')
 
-        buffer = io.BytesIO()
-        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-            for item in processed:
-                zf.writestr(item.get('name', 'fatura.html'), item.get('content', ''))
-        buffer.seek(0)
+        cliente = getattr(request.user, 'cliente', None)
+        arquivos = [(item.get('id'), item.get('name', 'fatura.html')) for item in processed]
+        ativos_compartilhados = request.POST.get('formato') == 'compartilhado'
 
-        # Limpa após o download zipado para ocultar o card
-        self._set_processed_files(request, [])
+        # Limpa a sessão para ocultar o card; as faturas só são apagadas pelo gerador
+        # depois que o ZIP termina de ser enviado.
+        self._set_processed_files(request, [], excluir_anteriores=False)
 
-        response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+        response = StreamingHttpResponse(
+            gerar_zip_faturas(arquivos, cliente, remover_ao_final=True, ativos_compartilhados=ativos_compartilhados),
+            content_type='application/zip',
+        )
         response['Content-Disposition'] = 'attachment; filename="faturas.zip"'
         return response
 
@@ -815,6 +688,9 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
         processed = self._get_processed_files(self.request)
         context['processed_files'] = processed
         context['has_processed_files'] = bool(processed)
+        lote = getattr(self, 'lote_em_andamento', None)
+        context['lote_em_andamento'] = lote
+        context['lote_arquivos'] = list(lote.arquivos.order_by('ordem')) if lote else []
         context['is_vip'] = bool(getattr(cliente, 'is_VIP', False))
         if getattr(cliente, 'is_VIP', False):
             contatos_lista = list(cliente.contatos.order_by('nome'))
@@ -902,13 +778,34 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
         if last_link:
             self.request.session.modified = True
         context['last_whatsapp_link'] = last_link
+        envio_resultados = self.request.session.pop('envio_resultados', [])
+        if envio_resultados:
+            self.request.session.modified = True
+        context['envio_resultados'] = envio_resultados
         return context
 
     def _get_processed_files(self, request):
-        return request.session.get('processed_files', [])
+        """Metadados das faturas prontas (sem o HTML), na ordem guardada na sessão."""
+        ids = request.session.get('processed_file_ids', [])
+        if not ids:
+            return []
+        cliente = getattr(request.user, 'cliente', None)
+        faturas = FaturaProcessada.objects.filter(pk__in=ids, cliente=cliente).defer('conteudo').in_bulk()
+        return [faturas[pk].as_item() for pk in ids if pk in faturas]
 
-    def _set_processed_files(self, request, files):
-        request.session['processed_files'] = files
+    def _get_processed_content(self, request, item):
+        """Lê o HTML de uma fatura processada do armazenamento."""
+        cliente = getattr(request.user, 'cliente', None)
+        fatura = FaturaProcessada.objects.filter(pk=item.get('id'), cliente=cliente).first()
+        return fatura.html if fatura else ''
+
+    def _set_processed_files(self, request, file_ids, excluir_anteriores=True):
+        cliente = getattr(request.user, 'cliente', None)
+        previous = set(request.session.get('processed_file_ids', [])) - set(file_ids)
+        if previous and excluir_anteriores:
+            FaturaProcessada.objects.filter(pk__in=previous, cliente=cliente).delete()
+        request.session['processed_file_ids'] = list(file_ids)
+        request.session.pop('processed_files', None)
         request.session.modified = True
 
     # --------------------------- VIP: Contatos + envio ----------------------
@@ -1053,8 +950,9 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
             return redirect('core:processamento')
 
         contatos_cache = list(ClienteContato.objects.filter(cliente=cliente))
-        success = 0
         skipped = 0
+        # Faturas do mesmo contato seguem juntas, num só e-mail.
+        por_contato = {}
         for item in processed:
             contato = None
             if item.get('suggested_contact_id'):
@@ -1064,16 +962,43 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
             if not contato:
                 skipped += 1
                 continue
-            sent, _ = self._send_invoice_to_contact(contato, item, cliente)
-            if sent:
-                success += 1
+            por_contato.setdefault(contato.id, (contato, []))[1].append(item)
+
+        grupos = list(por_contato.values())
+        envios = [self._email_for_contact(contato, itens, cliente) for contato, itens in grupos]
+        resultados = iter(enviar_emails([envio for envio in envios if envio]))
+
+        success = 0
+        smtp_indisponivel = False
+        resumo = []
+        for (contato, itens), envio in zip(grupos, envios):
+            resultado = next(resultados) if envio else None
+            whatsapp_link = self._whatsapp_link(contato, cliente)
+            enviado = bool(resultado and resultado.enviado)
+            if enviado:
+                success += len(itens)
+            smtp_indisponivel = smtp_indisponivel or bool(resultado and resultado.smtp_indisponivel and not enviado)
+            resumo.append({
+                'contato': contato.nome,
+                'faturas': len(itens),
+                'email_enviado': enviado,
+                'canal': resultado.canal if resultado else '',
+                'erro': '; '.join(resultado.erros) if resultado else ('' if contato.email else 'Sem e-mail cadastrado'),
+                'whatsapp_link': whatsapp_link,
+            })
 
         if success:
             messages.success(request, f'{success} fatura(s) enviada(s) automaticamente.')
+        falhas = [r['contato'] for r in resumo if not r['email_enviado']]
+        if falhas:
+            messages.warning(request, f'E-mail não enviado para: {", ".join(falhas)}. Conclua pelo WhatsApp.')
+        if smtp_indisponivel:
+            messages.warning(request, 'Servidor de e-mail indisponível. Conclua pelo WhatsApp.')
         if skipped:
             messages.info(request, f'{skipped} fatura(s) sem correspondência de contato. Use a busca para enviar manualmente.')
-        if not success and not skipped:
+        if not resumo and not skipped:
             messages.info(request, 'Nenhuma fatura enviada.')
+        request.session['envio_resultados'] = resumo
         request.session.modified = True
         return redirect('core:processamento')
 
@@ -1094,78 +1019,63 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
                 return c
         return None
 
-    def _send_invoice_to_contact(self, contato: ClienteContato, item, cliente: Cliente):
-        file_name = item.get('name', 'fatura.html')
-        html_body = item.get('content', '')
-
-        email_sent = False
-        whatsapp_link = ''
-        subject = f'Fatura | {cliente.nome}'
-        body_txt = (
-            f'Olá {contato.nome},\n\n'
-            f'Segue a fatura processada do cliente {cliente.nome}.\n'
-            f'Este e-mail foi enviado automaticamente pelo painel VIP.'
+    def _invoice_attachment(self, itens, cliente: Cliente):
+        """
+        (nome, conteúdo, tipo) do anexo: a fatura em HTML autocontido ou, com
+        várias faturas, um ZIP com CSS e imagens compartilhados em ativos/.
+        """
+        if len(itens) == 1:
+            item = itens[0]
+            return item.get('name', 'fatura.html'), self._get_processed_content(self.request, item), 'text/html'
+        arquivos = [(item.get('id'), item.get('name', 'fatura.html')) for item in itens]
+        conteudo = b''.join(gerar_zip_faturas(arquivos, cliente, ativos_compartilhados=True))
+        return 'faturas.zip', conteudo, 'application/zip'
+
+    def _email_for_contact(self, contato: ClienteContato, itens, cliente: Cliente):
+        """EnvioEmail com as faturas do contato, ou None se ele não tem e-mail."""
+        if not contato.email:
+            return None
+        file_name, anexo, mimetype = self._invoice_attachment(itens, cliente)
+        resumo = (
+            f'Segue a fatura processada do cliente {cliente.nome}.\n' if len(itens) == 1
+            else f'Seguem {len(itens)} faturas processadas do cliente {cliente.nome}, em um arquivo ZIP.\n'
+        )
+        return EnvioEmail(
+            contato_id=contato.id,
+            contato_nome=contato.nome,
+            email=contato.email,
+            assunto=f'Fatura | {cliente.nome}',
+            corpo=(
+                f'Olá {contato.nome},\n\n'
+                f'{resumo}'
+                f'Este e-mail foi enviado automaticamente pelo painel VIP.'
+            ),
+            anexo_nome=file_name,
+            anexo=anexo,
+            anexo_tipo=mimetype,
         )
-        if contato.email:
-            try:
-                connection = get_connection(timeout=5)
-                email_message = EmailMessage(
-                    subject=subject,
-                    body=body_txt,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    to=[contato.email],
-                    connection=connection,
-                )
-                email_message.attach(file_name, html_body, 'text/html')
-                email_message.send(fail_silently=False)
-                email_sent = True
-            except (socket.gaierror, socket.timeout, OSError) as exc:
-                # SMTP indisponível: não bloquear o fluxo, apenas avisar
-                logger.warning('SMTP indisponível para contato %s: %s', contato.id, exc)
-                messages.warning(self.request, 'Servidor de e-mail indisponível. Conclua pelo WhatsApp.')
-            except BaseException as exc:
-                # Captura SystemExit (gunicorn aborta worker) e demais erros de SMTP, mas não deixa pendurar
-                logger.exception('Erro ao enviar fatura por e-mail para contato %s', contato.id)
-                messages.error(self.request, f'Não foi possível enviar o e-mail para {contato.nome}: {exc}')
-            if not email_sent:
-                api_key = os.getenv('SENDGRID_API_KEY', '').strip()
-                from_email = os.getenv('SENDGRID_FROM_EMAIL', '').strip() or settings.DEFAULT_FROM_EMAIL
-                if api_key:
-                    try:
-                        from sendgrid import SendGridAPIClient  # type: ignore
-                        from sendgrid.helpers.mail import Mail, Attachment, FileContent, FileName, FileType, Disposition  # type: ignore
-
-                        message = Mail(
-                            from_email=from_email,
-                            to_emails=contato.email,
-                            subject=subject,
-                            html_content=body_txt.replace('\n', '<br>'),
-                        )
-                        encoded_file = base64.b64encode(html_body.encode('utf-8')).decode()
-                        attachment = Attachment(
-                            FileContent(encoded_file),
-                            FileName(file_name),
-                            FileType('text/html'),
-                            Disposition('attachment'),
-                        )
-                        message.attachment = attachment
-                        sg = SendGridAPIClient(api_key)
-                        sg.send(message)
-                        email_sent = True
-                    except ImportError:
-                        logger.warning('SendGrid não instalado; adicione sendgrid ao requirements.')
-                    except Exception as exc:
-                        logger.exception('Erro ao enviar fatura via SendGrid para contato %s', contato.id)
-                        messages.warning(self.request, f'Não foi possível enviar via SendGrid: {exc}')
 
+    def _whatsapp_link(self, contato: ClienteContato, cliente: Cliente) -> str:
         telefone_digits = re.sub(r'\D+', '', contato.telefone or '')
-        if telefone_digits:
-            mensagem = (
-                f'Olá {contato.nome}, segue a fatura do cliente {cliente.nome}. '
-                f'O arquivo foi enviado para seu e-mail: {contato.email or "sem e-mail cadastrado"}.'
-            )
-            whatsapp_link = f'https://wa.me/{telefone_digits}?text={quote(mensagem)}'
+        if not telefone_digits:
+            return ''
+        mensagem = (
+            f'Olá {contato.nome}, segue a fatura do cliente {cliente.nome}. '
+            f'O arquivo foi enviado para seu e-mail: {contato.email or "sem e-mail cadastrado"}.'
+        )
+        return f'https://wa.me/{telefone_digits}?text={quote(mensagem)}'
 
+    def _send_invoice_to_contact(self, contato: ClienteContato, item, cliente: Cliente):
+        envio = self._email_for_contact(contato, [item], cliente)
+        resultado = enviar_emails([envio], max_workers=1)[0] if envio else None
+        email_sent = bool(resultado and resultado.enviado)
+        if resultado and not email_sent:
+            if resultado.smtp_indisponivel:
+                messages.warning(self.request, 'Servidor de e-mail indisponível. Conclua pelo WhatsApp.')
+            for erro in resultado.erros:
+                messages.error(self.request, f'Não foi possível enviar o e-mail para {contato.nome}: {erro}')
+
+        whatsapp_link = self._whatsapp_link(contato, cliente)
         if whatsapp_link:
             msg = 'Clique no botão do WhatsApp para completar o envio.'
             if email_sent:
@@ -1198,6 +1108,45 @@ class ProcessamentoView(LoginRequiredMixin, TemplateView):
         return redirect('core:processamento')
 
 
+class LoteStatusView(LoginRequiredMixin, View):
+    """Endpoint leve consultado pela página de processamento para exibir o andamento do lote."""
+    login_url = 'core:login'
+
+    def get(self, request, pk, *args, **kwargs):
+        cliente = getattr(request.user, 'cliente', None)
+        lote = LoteProcessamento.objects.filter(pk=pk, cliente=cliente).first() if cliente else None
+        if not lote:
+            return JsonResponse({'success': False, 'message': 'Lote não encontrado.'}, status=404)
+
+        arquivos = list(
+            lote.arquivos.order_by('ordem').values('nome_original', 'status', 'erro')
+        )
+        finalizados = sum(
+            1 for a in arquivos
+            if a['status'] in (ArquivoLote.STATUS_PROCESSADO, ArquivoLote.STATUS_ERRO)
+        )
+        return JsonResponse({
+            'success': True,
+            'status': lote.status,
+            'concluido': lote.status == LoteProcessamento.STATUS_CONCLUIDO,
+            'total': len(arquivos),
+            'finalizados': finalizados,
+            'arquivos': arquivos,
+        })
+
+
+class MetricasView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Tempos por etapa e contadores do processamento, somados entre o servidor web e os workers. Só para a equipe."""
+    login_url = 'core:login'
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(metricas.coletar())
+
+
 class LogoutView(View):
     def post(self, request, *args, **kwargs):
         logout(request)